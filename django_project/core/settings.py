@@ -188,7 +188,7 @@ REST_FRAMEWORK = {
         "rest_framework.renderers.BrowsableAPIRenderer",
     ),
     "TEST_REQUEST_DEFAULT_FORMAT": "json",
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
+    "DEFAULT_PAGINATION_CLASS": "storemgr.pagination.StoreMgrPagination",
     "PAGE_SIZE": 100,
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
@@ -295,6 +295,22 @@ CACHES = {
     'OPTIONS': {
         'MAX_ENTRIES': 1000
     }
+  },
+# autocomplete generations and deltas; at most STOREMGR_AUTOCOMPLETE_MAX_DELTAS deltas per source are kept, so
+# MAX_ENTRIES stays above 4 sources x 200 deltas and is never culled, while each set lists a small directory
+'storemgr_autocomplete': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': env.str("STOREMGR_AUTOCOMPLETE_CACHE_LOCATION", '/dev/shm/storemgr_autocomplete'),
+    'TIMEOUT': None,
+    'OPTIONS': {
+        'MAX_ENTRIES': 1000
+    }
+  },
+# model generations behind the REST ETags; must be shared by every host and never evict, see storemgr.caching
+'storemgr_versions': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': env.str("STOREMGR_VERSION_CACHE_LOCATION", '/dev/shm/storemgr_versions'),
+    'TIMEOUT': None,
   }
 }
 
@@ -305,3 +321,32 @@ PROJECT_VERSION = env.str("PROJECT_VERSION", "0.0.1")
 PROJECT_SOURCE = "https://github.com/davidslusser/shopmate"
 
 PYGWALKER_THEME = "light"
+
+
+# storemgr configuration
+STOREMGR_ID_ALLOCATOR = env.str("STOREMGR_ID_ALLOCATOR", "storemgr.sequences.BlockIdAllocator")
+STOREMGR_ID_BLOCK_SIZE = env.int("STOREMGR_ID_BLOCK_SIZE", 50)
+STOREMGR_BULK_BATCH_SIZE = env.int("STOREMGR_BULK_BATCH_SIZE", 1000)
+STOREMGR_COUNTER_FOLD_THRESHOLD = env.int("STOREMGR_COUNTER_FOLD_THRESHOLD", 1000)
+STOREMGR_BULK_MAX_ITEMS = env.int("STOREMGR_BULK_MAX_ITEMS", 10000)
+STOREMGR_BATCH_MAX_KEYS = env.int("STOREMGR_BATCH_MAX_KEYS", 5000)
+STOREMGR_EXPORT_CHUNK_SIZE = env.int("STOREMGR_EXPORT_CHUNK_SIZE", 2000)
+STOREMGR_VALUES_SERIALIZATION = env.bool("STOREMGR_VALUES_SERIALIZATION", True)
+STOREMGR_RESPONSE_CACHE = env.bool("STOREMGR_RESPONSE_CACHE", True)
+STOREMGR_RESPONSE_CACHE_ALIAS = env.str("STOREMGR_RESPONSE_CACHE_ALIAS", "default")
+STOREMGR_VERSION_CACHE_ALIAS = env.str("STOREMGR_VERSION_CACHE_ALIAS", "storemgr_versions")
+STOREMGR_RESPONSE_CACHE_TIMEOUT = env.int("STOREMGR_RESPONSE_CACHE_TIMEOUT", 300)
+STOREMGR_RESPONSE_CACHE_STATS_INTERVAL = env.int("STOREMGR_RESPONSE_CACHE_STATS_INTERVAL", 60)
+STOREMGR_DEFER_COLUMNS = env.bool("STOREMGR_DEFER_COLUMNS", True)
+STOREMGR_EXACT_COUNT_THRESHOLD = env.int("STOREMGR_EXACT_COUNT_THRESHOLD", 10000)
+STOREMGR_COUNT_CACHE_TIMEOUT = env.int("STOREMGR_COUNT_CACHE_TIMEOUT", 300)
+STOREMGR_EXISTS_FILTERS = env.bool("STOREMGR_EXISTS_FILTERS", True)
+STOREMGR_SEARCH_BATCH_SIZE = env.int("STOREMGR_SEARCH_BATCH_SIZE", 10)
+STOREMGR_SEARCH_MAX_BATCH_SIZE = env.int("STOREMGR_SEARCH_MAX_BATCH_SIZE", 100)
+STOREMGR_SEARCH_RANK_WINDOW = env.int("STOREMGR_SEARCH_RANK_WINDOW", 500)
+STOREMGR_AUTOCOMPLETE_CACHE_ALIAS = env.str("STOREMGR_AUTOCOMPLETE_CACHE_ALIAS", "storemgr_autocomplete")
+STOREMGR_AUTOCOMPLETE_DELTA_TIMEOUT = env.int("STOREMGR_AUTOCOMPLETE_DELTA_TIMEOUT", 3600)
+STOREMGR_AUTOCOMPLETE_MAX_DELTAS = env.int("STOREMGR_AUTOCOMPLETE_MAX_DELTAS", 200)
+STOREMGR_AUTOCOMPLETE_MAX_LIMIT = env.int("STOREMGR_AUTOCOMPLETE_MAX_LIMIT", 50)
+STOREMGR_FRAGMENT_CACHE_TIMEOUT = env.int("STOREMGR_FRAGMENT_CACHE_TIMEOUT", 600)
+STOREMGR_TABLE_MAX_PAGE_SIZE = env.int("STOREMGR_TABLE_MAX_PAGE_SIZE", 500)
@@ -9,8 +9,19 @@ from storemgr.models import (ProductAttribute,
                              Order,
                              Invoice, 
                              Manufacturer,
+                             IdSequence,
                              )
 
+# import search
+from storemgr.search import search
+
+
+class FullTextAdminSearchMixin:
+    """ run the admin search box through the full-text search index rather than OR-ed icontains lookups """
+
+    def get_search_results(self, request, queryset, search_term):
+        return search(queryset, search_term), False
+
 
 class ProductAttributeAdmin(admin.ModelAdmin):
     list_display = ['id', 'key', 'value', 'created_at', 'updated_at']
@@ -30,7 +41,7 @@ class BrandAdmin(admin.ModelAdmin):
     list_filter = ['enabled', 'manufacturer']
 
 
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(FullTextAdminSearchMixin, admin.ModelAdmin):
     list_display = ['sku', 'brand', 'description', 'enabled', 'created_at', 'updated_at']
     search_fields = ['sku', 'description']
     list_filter = ['brand', 'enabled']
@@ -42,13 +53,13 @@ class OrderStatusAdmin(admin.ModelAdmin):
     list_filter = []
 
 
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(FullTextAdminSearchMixin, admin.ModelAdmin):
     list_display = ['customer_id', 'first_name', 'last_name', 'email', 'created_at', 'updated_at']
     search_fields = ['customer_id', 'first_name', 'last_name', 'email']
     list_filter = []
 
 
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(FullTextAdminSearchMixin, admin.ModelAdmin):
     list_display = ['order_id', 'status', 'customer', 'created_at', 'updated_at']
     search_fields = ['order_id']
     list_filter = ['status', 'customer']
@@ -60,6 +71,12 @@ class InvoiceAdmin(admin.ModelAdmin):
     list_filter = ['order', 'product']
 
 
+class IdSequenceAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'last_value', 'created_at', 'updated_at']
+    search_fields = ['id', 'name']
+    list_filter = []
+
+
 # register models
 admin.site.register(ProductAttribute, ProductAttributeAdmin)
 admin.site.register(Brand, BrandAdmin)
@@ -69,3 +86,4 @@ admin.site.register(Customer, CustomerAdmin)
 admin.site.register(Order, OrderAdmin)
 admin.site.register(Invoice, InvoiceAdmin)
 admin.site.register(Manufacturer, ManufacturerAdmin)
+admin.site.register(IdSequence, IdSequenceAdmin)
@@ -0,0 +1,300 @@
+""" in-memory sorted prefix indexes backing the autocomplete endpoint: SKUs, order ids, brand and customer names """
+
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+
+# import models
+from storemgr.models import Brand, Customer, Order, Product
+
+from storemgr.caching import KEY_PREFIX
+
+
+class AutocompleteSource:
+    """
+    An autocompleted column set of a model: rows are read as values_list(pk, *field_list); get_keys(*row) gives the
+    texts a row is found by the prefix of, and get_label(*row) the text it is suggested as, with its pk as value.
+    """
+
+    def __init__(self, model, field_list, get_keys, get_label):
+        self.model = model
+        self.field_list = field_list
+        self.get_keys = get_keys
+        self.get_label = get_label
+
+    def get_rows(self):
+        """iterate (pk, *field_list) rows of every instance"""
+        chunk_size = getattr(settings, "STOREMGR_EXPORT_CHUNK_SIZE", 2000)
+        return self.model.objects.order_by().values_list("pk", *self.field_list).iterator(chunk_size=chunk_size)
+
+    def get_row(self, instance):
+        """get the (pk, *field_list) row of instance"""
+        return (instance.pk, *(getattr(instance, i) for i in self.field_list))
+
+    def get_entries(self, row):
+        """get the (lowercase key, value, label) index entries of a row"""
+        value = str(row[0])
+        label = self.get_label(*row)
+        return [(key, value, label) for key in dict.fromkeys(i.strip().lower() for i in self.get_keys(*row)) if key]
+
+
+AUTOCOMPLETE_SOURCES = {
+    "brand": AutocompleteSource(Brand, ["name"], lambda pk, name: (name,), lambda pk, name: name),
+    "customer": AutocompleteSource(
+        Customer,
+        ["first_name", "last_name"],
+        lambda pk, first, last: (f"{first} {last}", f"{last} {first}", pk),
+        lambda pk, first, last: f"{first} {last} ({pk})",
+    ),
+    "order_id": AutocompleteSource(Order, [], lambda pk: (pk,), lambda pk: pk),
+    "sku": AutocompleteSource(Product, [], lambda pk: (pk,), lambda pk: pk),
+}
+
+
+def get_cache():
+    """
+    get the cache backend holding the autocomplete generations and deltas; its alias should not cull entries, since a
+    culled generation or delta makes every worker reload its indexes
+    """
+    return caches[getattr(settings, "STOREMGR_AUTOCOMPLETE_CACHE_ALIAS", "default")]
+
+
+def get_sequence_key(name):
+    """get the cache key numbering the generations of an autocomplete source"""
+    return f"{KEY_PREFIX}:autocomplete:{name}:sequence"
+
+
+def get_generation_key(name):
+    """get the cache key holding the last published generation of an autocomplete source"""
+    return f"{KEY_PREFIX}:autocomplete:{name}:generation"
+
+
+def get_delta_key(name, generation):
+    """get the cache key holding the changes a generation of an autocomplete source made"""
+    return f"{KEY_PREFIX}:autocomplete:{name}:delta:{generation}"
+
+
+def reserve_generation(name):
+    """
+    number the next generation of an autocomplete source with the cache's incr; a lost sequence restarts at the
+    current time in microseconds, above any generation numbered before, so loaded indexes reload instead of missing
+    changes
+    """
+    cache = get_cache()
+    key = get_sequence_key(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns() // 1000, timeout=None)
+        return cache.incr(key)
+
+
+def get_generation(name):
+    """get the last published generation of an autocomplete source; when the cache has lost it, a new one"""
+    cache = get_cache()
+    generation = cache.get(get_generation_key(name))
+    if generation is None:
+        cache.add(get_generation_key(name), reserve_generation(name), timeout=None)
+        generation = cache.get(get_generation_key(name))
+    return generation
+
+
+def publish(name, op_list):
+    """
+    Record changes to the rows of an autocomplete source, as ("set", row) or ("delete", pk) tuples, under a new
+    generation; every worker's index applies them on its next lookup.
+
+    The delta is stored with add(), so when a backend whose incr is not atomic (such as the file cache) numbers two
+    publishes alike, the second takes the next number. The delta STOREMGR_AUTOCOMPLETE_MAX_DELTAS generations back is
+    dropped, since an index that far behind reloads instead; the cache then holds at most that many deltas per source.
+    The cached generation is raised to the new one once its delta is stored; when two workers publish at once it may
+    be left at the lower of the two, and the higher one is then picked up with the next change published.
+    """
+    cache = get_cache()
+    timeout = getattr(settings, "STOREMGR_AUTOCOMPLETE_DELTA_TIMEOUT", 3600)
+    generation = reserve_generation(name)
+    while not cache.add(get_delta_key(name, generation), op_list, timeout):
+        generation = reserve_generation(name)
+    cache.delete(get_delta_key(name, generation - getattr(settings, "STOREMGR_AUTOCOMPLETE_MAX_DELTAS", 200)))
+    if (cache.get(get_generation_key(name)) or 0) < generation:
+        cache.set(get_generation_key(name), generation, timeout=None)
+
+
+def publish_on_commit(name, op_list):
+    """publish changes once the current transaction commits, so rolled back changes are never published"""
+    transaction.on_commit(lambda: publish(name, op_list))
+
+
+def get_source_fields(model):
+    """get the fields the autocomplete sources of model read besides the pk"""
+    return sorted({i for source in AUTOCOMPLETE_SOURCES.values() if source.model is model for i in source.field_list})
+
+
+def publish_instances(model, instance_list, deleted=False, previous_list=None):
+    """
+    Publish the changes to instance_list, saved or deleted rows of model, to every source of model.
+
+    previous_list holds the stored values each save replaced, as a dictionary or model instance, or None for a created
+    row; without it every row counts as created. A saved row is published to the sources reading a field it changed,
+    so sources reading only the pk (order ids, SKUs) publish creates and deletes only.
+    """
+    if previous_list is None:
+        previous_list = [None] * len(instance_list)
+    for name, source in AUTOCOMPLETE_SOURCES.items():
+        if source.model is not model:
+            continue
+        if deleted:
+            op_list = [("delete", i.pk) for i in instance_list]
+        else:
+            op_list = [
+                ("set", source.get_row(instance))
+                for instance, previous in zip(instance_list, previous_list)
+                if previous is None or any(get_value(previous, i) != getattr(instance, i) for i in source.field_list)
+            ]
+        if op_list:
+            publish_on_commit(name, op_list)
+
+
+def get_value(previous, name):
+    """get a field value of stored values given as a dictionary or model instance"""
+    return previous.get(name) if isinstance(previous, dict) else getattr(previous, name)
+
+
+class PrefixIndex:
+    """
+    The entries of one autocomplete source as a sorted list of (key, value, label) tuples; a prefix lookup is a binary
+    search to the first key at or after the prefix and a scan while keys start with it. The index is loaded on first
+    use in each worker, then kept current from the deltas published by the signals of any worker.
+
+    Lookups read the current (generation, entries, value_map) snapshot, which is never changed in place. A refresh
+    builds the next snapshot from a copy of the current one with the deltas applied and swaps it in; meanwhile
+    lookups in other threads go on with the current one. When the deltas are too many or gone, the index reloads
+    every row in a background thread, and lookups keep the current snapshot until it is done; only the first load
+    is waited on.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.source = AUTOCOMPLETE_SOURCES[name]
+        self.snapshot = None
+        self.refresh_lock = threading.Lock()
+
+    @property
+    def generation(self):
+        """the generation of the current snapshot; None before the first load"""
+        return self.snapshot[0] if self.snapshot else None
+
+    def load(self, generation):
+        """build a snapshot from every row of the source"""
+        entries = []
+        value_map = {}
+        for row in self.source.get_rows():
+            row_entries = self.source.get_entries(row)
+            entries += row_entries
+            value_map[str(row[0])] = row_entries
+        entries.sort()
+        return generation, entries, value_map
+
+    @staticmethod
+    def remove(entries, value_map, value):
+        """remove the entries of a row"""
+        for entry in value_map.pop(str(value), []):
+            index = bisect.bisect_left(entries, entry)
+            if index < len(entries) and entries[index] == entry:
+                del entries[index]
+
+    def apply(self, entries, value_map, op_list):
+        """apply published changes"""
+        for op, data in op_list:
+            if op == "delete":
+                self.remove(entries, value_map, data)
+                continue
+            self.remove(entries, value_map, data[0])
+            row_entries = self.source.get_entries(data)
+            for entry in row_entries:
+                bisect.insort(entries, entry)
+            value_map[str(data[0])] = row_entries
+
+    def update(self, generation, snapshot):
+        """build the snapshot of generation from a copy of snapshot with the deltas since applied; None to reload"""
+        if generation - snapshot[0] > getattr(settings, "STOREMGR_AUTOCOMPLETE_MAX_DELTAS", 200):
+            return None
+        keys = [get_delta_key(self.name, i) for i in range(snapshot[0] + 1, generation + 1)]
+        deltas = get_cache().get_many(keys)
+        if len(deltas) < len(keys):
+            return None
+        entries, value_map = list(snapshot[1]), dict(snapshot[2])
+        for key in keys:
+            self.apply(entries, value_map, deltas[key])
+        return generation, entries, value_map
+
+    def reload(self, generation):
+        """load the snapshot of generation in a background thread and swap it in, then release the refresh lock"""
+        try:
+            self.snapshot = self.load(generation)
+        finally:
+            connection.close()
+            self.refresh_lock.release()
+
+    def refresh(self):
+        """
+        get a snapshot of the current generation; while another thread builds it, and while a reload runs in the
+        background, the current snapshot
+        """
+        generation = get_generation(self.name)
+        snapshot = self.snapshot
+        if snapshot is not None and generation <= snapshot[0]:
+            return snapshot
+        if not self.refresh_lock.acquire(blocking=snapshot is None):
+            return snapshot
+        reloading = False
+        try:
+            snapshot = self.snapshot
+            if snapshot is None:
+                snapshot = self.snapshot = self.load(generation)
+            elif generation > snapshot[0]:
+                updated = self.update(generation, snapshot)
+                if updated is None:
+                    threading.Thread(target=self.reload, args=(generation,), daemon=True).start()
+                    reloading = True
+                else:
+                    snapshot = self.snapshot = updated
+        finally:
+            if not reloading:
+                self.refresh_lock.release()
+        return snapshot
+
+    def lookup(self, prefix, limit=10):
+        """get up to limit {"value", "label"} suggestions whose keys start with prefix, in key order"""
+        prefix = prefix.strip().lower()
+        _, entries, _ = self.refresh()
+        index = bisect.bisect_left(entries, (prefix,))
+        result = {}
+        while index < len(entries) and len(result) < limit and entries[index][0].startswith(prefix):
+            _, value, label = entries[index]
+            result.setdefault(value, dict(value=value, label=label))
+            index += 1
+        return list(result.values())
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(name):
+    """get this worker's index of an autocomplete source, created on first use"""
+    with _indexes_lock:
+        if name not in _indexes:
+            _indexes[name] = PrefixIndex(name)
+        return _indexes[name]
+
+
+def autocomplete(name, prefix, limit=10):
+    """get up to limit suggestions of an autocomplete source for prefix; a blank prefix suggests nothing"""
+    if not prefix.strip():
+        return []
+    return get_index(name).lookup(prefix, limit)
@@ -0,0 +1,270 @@
+""" response and page fragment caches for storemgr, invalidated per model through table version bumps """
+
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date
+from rest_flex_fields import EXPAND_PARAM
+from rest_framework.response import Response
+
+
+KEY_PREFIX = "storemgr:response_cache"
+
+
+def get_cache():
+    """get the cache backend used for responses"""
+    return caches[getattr(settings, "STOREMGR_RESPONSE_CACHE_ALIAS", "default")]
+
+
+def get_version_cache():
+    """
+    Get the cache backend holding the model generations.
+
+    The generations are the ETag and Last-Modified of the REST responses (see storemgr.conditional), so every host
+    must read the same ones and none may be evicted: in a deployment of several hosts, point
+    STOREMGR_VERSION_CACHE_ALIAS at a shared cache that does not evict, such as Redis with maxmemory-policy noeviction.
+    It holds one key per model, so the default file cache never reaches MAX_ENTRIES and culls.
+    """
+    return caches[getattr(settings, "STOREMGR_VERSION_CACHE_ALIAS", "storemgr_versions")]
+
+
+def get_generation_key(model):
+    """get the cache key holding the current generation of a model"""
+    return f"{KEY_PREFIX}:generation:{model._meta.label_lower}"
+
+
+def get_versions(cache, keys):
+    """
+    Get the current value of each version key of cache in one cache read.
+
+    A missing version (never set, expired or culled) is started at the current time rather than 0, so entries
+    cached under an earlier version can never match again.
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key) or time.time_ns()
+    return [versions[key] for key in keys]
+
+
+def get_generations(model_list):
+    """get the current generation of each model in one cache read"""
+    return get_versions(get_version_cache(), [get_generation_key(model) for model in model_list])
+
+
+def _start_generations(model_list):
+    """start a new generation for each model"""
+    cache = get_version_cache()
+    cache.set_many({get_generation_key(model): time.time_ns() for model in model_list}, timeout=None)
+
+
+def invalidate_models(*model_list):
+    """drop every cached response built from any of model_list; again on commit so no stale entry outlives the change"""
+    _start_generations(model_list)
+    transaction.on_commit(lambda: _start_generations(model_list))
+
+
+def get_object_version_key(model, pk):
+    """get the cache key holding the current version of the rows related to an object"""
+    return f"{KEY_PREFIX}:object_version:{model._meta.label_lower}:{pk}"
+
+
+def invalidate_objects(model, pk_list):
+    """
+    start a new version of the related rows of each object of model in pk_list, once the current transaction commits,
+    so fragments built from them are rendered again
+    """
+    keys = [get_object_version_key(model, pk) for pk in set(pk_list) if pk is not None]
+    if keys:
+        transaction.on_commit(lambda: get_cache().set_many({key: time.time_ns() for key in keys}, timeout=None))
+
+
+def get_fragment_versions(fragment_models, instance=None, fragment_related=()):
+    """
+    get a dictionary of fragment name: version for a dictionary of fragment name: models it is built from, in one read
+    of each cache; the version changes whenever any of those models does, and for the fragments in fragment_related, whenever
+    the related rows of instance do (see invalidate_objects)
+    """
+    model_list = list(dict.fromkeys(model for model_list in fragment_models.values() for model in model_list))
+    generations = dict(zip(model_list, get_generations(model_list)))
+    fragment_versions = {
+        name: "-".join(str(generations[i]) for i in model_list) for name, model_list in fragment_models.items()
+    }
+    if fragment_related:
+        (version,) = get_versions(get_cache(), [get_object_version_key(type(instance), instance.pk)])
+        for name in fragment_related:
+            fragment_versions[name] = f"{fragment_versions.get(name, '')}-{version}"
+    return fragment_versions
+
+
+class FragmentCacheMixin:
+    """
+    Provide the context of {% cache %} fragments on a detail page. Templates key each fragment on the object's pk and
+    updated_at, which change with the object itself, and on fragment_versions.<name>. That version changes with any
+    model in fragment_models[name], for changes anywhere in a table, and, for the fragments named in fragment_related,
+    with the object's own related rows, which the signals handlers start a new version of (see invalidate_objects).
+    Unchanged fragments are served from the cache without running their queries; a STOREMGR_FRAGMENT_CACHE_TIMEOUT of
+    0 turns the cache off.
+    """
+
+    fragment_models = {}
+    fragment_related = ()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["fragment_versions"] = get_fragment_versions(self.fragment_models, self.object, self.fragment_related)
+        context["fragment_cache_timeout"] = getattr(settings, "STOREMGR_FRAGMENT_CACHE_TIMEOUT", 600)
+        return context
+
+
+_pending_stats = Counter()
+_pending_stats_lock = threading.Lock()
+_stats_flushed_at = time.monotonic()
+
+
+def get_stats_key(endpoint, outcome):
+    """get the cache key holding the hit or miss count of an endpoint"""
+    return f"{KEY_PREFIX}:stats:{endpoint}:{outcome}"
+
+
+def record(endpoint, outcome):
+    """
+    count a cache hit or miss for an endpoint; counts are kept in process memory and added to the shared counters at
+    most once every STOREMGR_RESPONSE_CACHE_STATS_INTERVAL seconds, so serving a response does not write to the cache
+    """
+    global _stats_flushed_at
+    with _pending_stats_lock:
+        _pending_stats[(endpoint, outcome)] += 1
+        if time.monotonic() - _stats_flushed_at < getattr(settings, "STOREMGR_RESPONSE_CACHE_STATS_INTERVAL", 60):
+            return
+    flush_stats()
+
+
+def flush_stats():
+    """add the counts recorded by this process to the shared counters"""
+    global _stats_flushed_at
+    with _pending_stats_lock:
+        pending = dict(_pending_stats)
+        _pending_stats.clear()
+        _stats_flushed_at = time.monotonic()
+    cache = get_cache()
+    for (endpoint, outcome), count in pending.items():
+        key = get_stats_key(endpoint, outcome)
+        if not cache.add(key, count, timeout=None):
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                cache.set(key, count, timeout=None)
+
+
+def get_stats(endpoint_list):
+    """get a dictionary of endpoint: {"hit": n, "miss": n} for endpoint_list, from every process that has flushed"""
+    flush_stats()
+    keys = {get_stats_key(i, j): (i, j) for i in endpoint_list for j in ("hit", "miss")}
+    values = get_cache().get_many(keys)
+    stats = {i: {"hit": 0, "miss": 0} for i in endpoint_list}
+    for key, value in values.items():
+        endpoint, outcome = keys[key]
+        stats[endpoint][outcome] = value
+    return stats
+
+
+def reset_stats(endpoint_list):
+    """zero the hit and miss counters of endpoint_list"""
+    with _pending_stats_lock:
+        for key in [i for i in _pending_stats if i[0] in endpoint_list]:
+            del _pending_stats[key]
+    get_cache().delete_many([get_stats_key(i, j) for i in endpoint_list for j in ("hit", "miss")])
+
+
+def normalize_query(query_params):
+    """get a canonical form of the query parameters; parameter order and the order of expanded fields do not matter"""
+    items = []
+    for key, values in sorted(query_params.lists()):
+        if key == EXPAND_PARAM:
+            values = [",".join(sorted(set(",".join(values).split(","))))]
+        items.append((key, sorted(values)))
+    return items
+
+
+def get_permission_scope(request):
+    """get the permission scope of the requesting user; users sharing a scope share cache entries"""
+    user = request.user
+    if not user or not user.is_authenticated:
+        return "anonymous"
+    groups = ",".join(sorted(user.groups.values_list("name", flat=True)))
+    return f"superuser:{groups}" if user.is_superuser else f"user:{groups}"
+
+
+class ResponseCacheMixin:
+    """
+    Cache list and retrieve responses. Entries are keyed by scheme, host, path, normalized query string, format,
+    permission scope and the generation of every model the response depends on; saving or deleting one of those models starts a new
+    generation (see invalidate_models), so stale entries are never served.
+
+    The response models are those of get_conditional_models() plus cache_models, for models a response depends on
+    only indirectly. Cached responses keep their ETag and Last-Modified and still answer conditional requests.
+    """
+
+    cache_models = []
+
+    def get_cache_models(self):
+        """get the models whose changes invalidate this viewset's cached responses"""
+        return self.get_conditional_models() + list(self.cache_models)
+
+    def get_cache_key(self, request):
+        """build the cache key of the current request; hyperlinks in the response carry its scheme and host"""
+        variant = repr(
+            (
+                request.scheme,
+                request.get_host(),
+                request.path,
+                normalize_query(request.query_params),
+                request.accepted_renderer.format,
+                get_permission_scope(request),
+                get_generations(self.get_cache_models()),
+            )
+        )
+        return f"{KEY_PREFIX}:{self.basename}:{hashlib.md5(variant.encode('utf-8')).hexdigest()}"
+
+    def get_cached_response(self, request, handler, *args, **kwargs):
+        """serve the response from the cache, or call handler and cache a successful response"""
+        if not getattr(settings, "STOREMGR_RESPONSE_CACHE", True):
+            return handler(request, *args, **kwargs)
+        cache = get_cache()
+        key = self.get_cache_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            record(self.basename, "miss")
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200 and isinstance(response, Response):
+                entry = dict(data=response.data, etag=response.get("ETag"), last_modified=response.get("Last-Modified"))
+                cache.set(key, entry, getattr(settings, "STOREMGR_RESPONSE_CACHE_TIMEOUT", 300))
+            response["X-Cache"] = "MISS"
+            return response
+
+        record(self.basename, "hit")
+        last_modified = entry["last_modified"]
+        response = get_conditional_response(
+            request, etag=entry["etag"], last_modified=parse_http_date(last_modified) if last_modified else None
+        )
+        if response is None:
+            response = Response(entry["data"])
+        for header, value in (("ETag", entry["etag"]), ("Last-Modified", last_modified)):
+            if value:
+                response[header] = value
+        response["X-Cache"] = "HIT"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(request, super().retrieve, *args, **kwargs)
@@ -0,0 +1,35 @@
+""" build the chart.js series rendered by handyhelpers/report/chartjs templates """
+
+from django.db.models import Count
+from handyhelpers.views.report import get_colors
+
+
+def get_chart(chart_id, row_list, list_view, chart_type="bar"):
+    """get the chart data of a list of (label, value) rows; list_view is the list url each label is appended to"""
+    return dict(
+        id=chart_id,
+        type=chart_type,
+        label_list=[label for label, _ in row_list],
+        value_list=[value for _, value in row_list],
+        list_view=list_view,
+        color_list=get_colors(len(row_list)),
+    )
+
+
+def count_by(queryset, label_field, count_field="pk"):
+    """
+    get (label, count) rows of queryset grouped by label_field, counting distinct count_field values, in label order;
+    one GROUP BY query whatever the number of labels
+    """
+    return list(
+        queryset.order_by()
+        .values_list(label_field)
+        .annotate(qty=Count(count_field, distinct=True))
+        .values_list(label_field, "qty")
+        .order_by(label_field)
+    )
+
+
+def get_count_chart(chart_id, queryset, label_field, list_view, count_field="pk", chart_type="bar"):
+    """get the chart data of the distinct count_field values of queryset per label_field, in one query"""
+    return get_chart(chart_id, count_by(queryset, label_field, count_field), list_view, chart_type)
@@ -0,0 +1,58 @@
+""" conditional GET (ETag / Last-Modified) support for the storemgr REST viewsets """
+
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from storemgr.caching import get_generations
+
+
+def get_validators(model_list, variant):
+    """
+    Get the (etag, last_modified) of a response built from model_list, without a query.
+
+    Both come from the cache generations of model_list (see storemgr.caching.invalidate_models), which start anew, at
+    the time of the change, whenever a row of one of the models is saved or deleted. The generations are kept in their
+    own cache, which is never culled and is shared by every host (see storemgr.caching.get_version_cache). The ETag
+    covers the generations and variant, which identifies the representation (path, query string and format).
+    """
+    generations = get_generations(model_list)
+    fingerprint = repr((generations, variant))
+    return f'W/"{hashlib.md5(fingerprint.encode("utf-8")).hexdigest()}"', max(generations) // 10**9
+
+
+class ConditionalGetMixin:
+    """
+    Add ETag and Last-Modified headers to list and retrieve responses, and answer 304 Not Modified when the client's
+    If-None-Match or If-Modified-Since still holds, without serializing anything.
+
+    conditional_models lists the models each response is built from besides the viewset model, such as the source of a
+    StringRelatedField or expandable field; their cache generations are part of the ETag. Validators are per table: a
+    change to any row of those models changes the validators of every list and detail response built from them.
+    """
+
+    conditional_models = []
+
+    def get_conditional_models(self):
+        """get the models whose changes invalidate this viewset's responses"""
+        return [self.get_queryset().model] + list(self.conditional_models)
+
+    def get_conditional_response(self, request, handler, *args, **kwargs):
+        """return a 304 if the validators of the response match the request, otherwise handler's response"""
+        variant = (request.get_full_path(), request.accepted_renderer.format)
+        etag, last_modified = get_validators(self.get_conditional_models(), variant)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(request, super().retrieve, *args, **kwargs)
@@ -0,0 +1,190 @@
+"""
+read and rebuild the AggregateCounter store used by the storemgr dashboard
+
+Writers never update a counter row: AggregateCounter.bump appends CounterDelta rows, which readers add to the
+counter values and fold_deltas moves into the counters in batches. bump_many runs a fold after the commit of every
+STOREMGR_COUNTER_FOLD_THRESHOLD deltas, so a read sums at most about that many pending rows; the fold_counters command
+folds the rest, e.g. from a periodic job after an idle period.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+# import models
+from storemgr.models import (
+    AggregateCounter,
+    Brand,
+    Customer,
+    CounterDelta,
+    Invoice,
+    Manufacturer,
+    Order,
+    OrderStatus,
+    Product,
+)
+
+
+BUILT_MARKER = ("meta", "built")
+
+
+def get_pending_deltas(queryset):
+    """get (dimension, key, sum of deltas) for the CounterDelta rows of queryset"""
+    queryset = queryset.order_by().values_list("dimension", "key").annotate(total=Sum("delta"))
+    return queryset.values_list("dimension", "key", "total")
+
+
+def get_counters(dimension):
+    """get a dictionary of key: value for all counters in a dimension, pending deltas included"""
+    return get_all_counters(dimension).get(dimension, {})
+
+
+def get_all_counters(dimension=None):
+    """
+    get a dictionary of dimension: {key: value} for every counter, pending deltas included, in two queries; the deltas
+    are bounded by the folds bump_many runs
+    """
+    counters = AggregateCounter.objects.all()
+    deltas = CounterDelta.objects.all()
+    if dimension is not None:
+        counters = counters.filter(dimension=dimension)
+        deltas = deltas.filter(dimension=dimension)
+    data = {}
+    for dimension, key, value in counters.values_list("dimension", "key", "value"):
+        data.setdefault(dimension, {})[key] = value
+    for dimension, key, total in get_pending_deltas(deltas):
+        values = data.setdefault(dimension, {})
+        values[key] = values.get(key, 0) + total
+    return data
+
+
+class FoldConflict(Exception):
+    """another fold took some of the delta rows a fold read"""
+
+
+def fold_deltas():
+    """
+    Add the pending CounterDelta rows to their counters and delete them; returns the number of counters changed.
+
+    The delta rows are locked and read first, and exactly those rows are summed and deleted, so deltas committed
+    meanwhile are left to the next fold and folds running at once never count a delta twice: one waits for the other's
+    locks, and then no longer reads the rows it deleted. Where select_for_update locks nothing (SQLite), a fold that
+    finds some of its rows already deleted rolls back and changes nothing.
+    """
+    batch_size = getattr(settings, "STOREMGR_BULK_BATCH_SIZE", 1000)
+    try:
+        with transaction.atomic():
+            delta_list = list(
+                CounterDelta.objects.select_for_update().order_by("pk").values_list("pk", "dimension", "key", "delta")
+            )
+            pk_list = [i[0] for i in delta_list]
+            deleted = 0
+            for start in range(0, len(pk_list), batch_size):
+                deleted += CounterDelta.objects.filter(pk__in=pk_list[start : start + batch_size]).delete()[0]
+            if deleted != len(pk_list):
+                raise FoldConflict()
+
+            totals = {}
+            for _, dimension, key, delta in delta_list:
+                totals[(dimension, key)] = totals.get((dimension, key), 0) + delta
+            totals = {i: total for i, total in totals.items() if total}
+            if not totals:
+                return 0
+            counter_list = list(
+                AggregateCounter.objects.filter(
+                    dimension__in={i[0] for i in totals}, key__in={i[1] for i in totals}
+                ).select_for_update()
+            )
+            changed = []
+            for counter in counter_list:
+                total = totals.pop((counter.dimension, counter.key), None)
+                if total is not None:
+                    counter.value += total
+                    counter.updated_at = timezone.now()
+                    changed.append(counter)
+            AggregateCounter.objects.bulk_update(changed, ["value", "updated_at"])
+            AggregateCounter.objects.bulk_create(
+                [
+                    AggregateCounter(dimension=dimension, key=key, value=total)
+                    for (dimension, key), total in totals.items()
+                ]
+            )
+    except FoldConflict:
+        return 0
+    return len(changed) + len(totals)
+
+
+def count_totals():
+    """count the dashboard totals from the source tables"""
+    return {
+        "manufacturer": Manufacturer.objects.filter(enabled=True).count(),
+        "brand": Brand.objects.filter(enabled=True).count(),
+        "customer": Customer.objects.count(),
+        "product": Product.objects.filter(enabled=True).count(),
+        "order": Order.objects.count(),
+    }
+
+
+def count_orders_by_brand(brand_ids=None):
+    """count distinct orders per brand from the invoice table; optionally limited to brand_ids"""
+    queryset = Invoice.objects.all()
+    if brand_ids is not None:
+        queryset = queryset.filter(product__brand_id__in=brand_ids)
+    counts = dict(
+        queryset.order_by()
+        .values_list("product__brand_id")
+        .annotate(qty=Count("order_id", distinct=True))
+        .values_list("product__brand_id", "qty")
+    )
+    if brand_ids is not None:
+        counts.update({i: 0 for i in brand_ids if i not in counts})
+    return counts
+
+
+def count_orders_by_status():
+    """count orders per status from the order table"""
+    return dict(
+        Order.objects.order_by().values_list("status_id").annotate(qty=Count("pk")).values_list("status_id", "qty")
+    )
+
+
+def set_counters(dimension, counts, replace=False):
+    """write absolute values for counters in a dimension; replace removes counters not in counts"""
+    with transaction.atomic():
+        for model in (AggregateCounter, CounterDelta):
+            if replace:
+                model.objects.filter(dimension=dimension).delete()
+            else:
+                model.objects.filter(dimension=dimension, key__in=[str(i) for i in counts]).delete()
+        AggregateCounter.objects.bulk_create(
+            [AggregateCounter(dimension=dimension, key=str(key), value=value) for key, value in counts.items()]
+        )
+
+
+def rebuild_counters():
+    """recompute every counter from the source tables"""
+    with transaction.atomic():
+        set_counters("total", count_totals(), replace=True)
+        set_counters("orders_by_brand", count_orders_by_brand(), replace=True)
+        set_counters("orders_by_status", count_orders_by_status(), replace=True)
+        set_counters(BUILT_MARKER[0], {BUILT_MARKER[1]: 1}, replace=True)
+
+
+def ensure_counters():
+    """build the counters if they have never been built"""
+    if not AggregateCounter.objects.filter(dimension=BUILT_MARKER[0], key=BUILT_MARKER[1]).exists():
+        rebuild_counters()
+
+
+def drop_counter(dimension, key):
+    """delete a counter and its pending deltas, as when the row it counts for is deleted"""
+    AggregateCounter.objects.filter(dimension=dimension, key=str(key)).delete()
+    CounterDelta.objects.filter(dimension=dimension, key=str(key)).delete()
+
+
+def refresh_orders_by_brand(brand_ids):
+    """recompute orders_by_brand counters for the given brands, once the current transaction commits"""
+    brand_ids = [i for i in brand_ids if i is not None]
+    if brand_ids:
+        transaction.on_commit(lambda: set_counters("orders_by_brand", count_orders_by_brand(brand_ids)))
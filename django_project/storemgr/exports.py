@@ -0,0 +1,170 @@
+""" streaming, constant-memory exports of filtered querysets as CSV, NDJSON or Parquet """
+
+import csv
+import datetime
+import json
+
+from django.conf import settings
+from django.db import models
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def format_value(value):
+    """format a value the way the DRF JSON renderer does"""
+    if isinstance(value, datetime.datetime):
+        value = timezone.localtime(value).isoformat() if timezone.is_aware(value) else value.isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+    return value
+
+
+def iter_chunks(queryset, lookup_list, chunk_size):
+    """iterate a queryset as lists of value tuples, streaming rows from the database chunk_size at a time"""
+    chunk = []
+    for row in queryset.values_list(*lookup_list).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Echo:
+    """an object that implements just the write method of the file-like interface"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, chunks):
+    """yield CSV text, one block per chunk"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for chunk in chunks:
+        yield "".join(writer.writerow([format_value(i) for i in row]) for row in chunk)
+
+
+def stream_ndjson(header, chunks):
+    """yield newline-delimited JSON, one block per chunk"""
+    for chunk in chunks:
+        yield "".join(json.dumps(dict(zip(header, [format_value(i) for i in row]))) + "\n" for row in chunk)
+
+
+class ChunkSink:
+    """write-only file object collecting the bytes pyarrow writes so they can be yielded as they are produced"""
+
+    closed = False
+
+    def __init__(self):
+        self.position = 0
+        self.buffer = []
+
+    def write(self, data):
+        self.buffer.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        """return and forget the bytes written so far"""
+        data = b"".join(self.buffer)
+        self.buffer = []
+        return data
+
+
+def get_arrow_type(model, lookup):
+    """get the pyarrow type for a (possibly related) field lookup"""
+    field = None
+    for name in lookup.split("__"):
+        field = model._meta.get_field(name)
+        if field.is_relation:
+            model = field.related_model
+    if isinstance(field, models.ForeignKey):
+        field = field.target_field
+    if isinstance(field, models.DateTimeField):
+        return pyarrow.timestamp("us", tz="UTC")
+    if isinstance(field, models.BooleanField):
+        return pyarrow.bool_()
+    if isinstance(field, (models.AutoField, models.IntegerField)):
+        return pyarrow.int64()
+    return pyarrow.string()
+
+
+def stream_parquet(header, chunks, model, lookup_list):
+    """yield a Parquet file, one row group per chunk"""
+    schema = pyarrow.schema([(name, get_arrow_type(model, lookup)) for name, lookup in zip(header, lookup_list)])
+    sink = ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(pyarrow.PythonFile(sink, mode="w"), schema)
+    for chunk in chunks:
+        columns = list(zip(*chunk))
+        writer.write_table(pyarrow.table(dict(zip(header, columns)), schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+class ExportMixin:
+    """
+    Add an `export` list action to a viewset streaming the filtered queryset as CSV, NDJSON or Parquet.
+
+    Viewsets define export_fields as a list of (column name, values() lookup) tuples. Rows are read with a chunked
+    iterator and written as they arrive, so memory use does not depend on the number of rows exported.
+    """
+
+    export_fields = []
+
+    @action(detail=False, methods=["get"])
+    def export(self, request, *args, **kwargs):
+        """stream all rows matching the filter parameters; select the format with ?export_format=csv|ndjson|parquet"""
+        export_format = request.query_params.get("export_format", "csv")
+        if export_format not in EXPORT_CONTENT_TYPES:
+            return Response(
+                f"Unsupported export_format; choose one of: {', '.join(EXPORT_CONTENT_TYPES)}",
+                status.HTTP_400_BAD_REQUEST,
+            )
+        if export_format == "parquet" and pyarrow is None:
+            return Response("Parquet export requires pyarrow", status.HTTP_400_BAD_REQUEST)
+
+        header = [name for name, _ in self.export_fields]
+        lookup_list = [lookup for _, lookup in self.export_fields]
+        chunks = iter_chunks(
+            self.filter_queryset(self.get_queryset()),
+            lookup_list,
+            getattr(settings, "STOREMGR_EXPORT_CHUNK_SIZE", 2000),
+        )
+        if export_format == "csv":
+            content = stream_csv(header, chunks)
+        elif export_format == "ndjson":
+            content = stream_ndjson(header, chunks)
+        else:
+            content = stream_parquet(header, chunks, self.get_queryset().model, lookup_list)
+
+        response = StreamingHttpResponse(content, content_type=EXPORT_CONTENT_TYPES[export_format])
+        filename = f"{self.get_queryset().model._meta.model_name}s.{export_format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
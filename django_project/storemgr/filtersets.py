@@ -1,17 +1,123 @@
 """ filtersets for applicable app models """
 
-from rest_framework_filters.filters import RelatedFilter, BooleanFilter
-from rest_framework_filters.filterset import FilterSet
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.db.models.constants import LOOKUP_SEP
+from django_filters.constants import EMPTY_VALUES
+from rest_framework_filters.filters import RelatedFilter, BooleanFilter, CharFilter
+from rest_framework_filters.filterset import FilterSet, related
 
 # import models
 from storemgr.models import Brand, Customer, Invoice, Order, OrderStatus, Product, ProductAttribute
 
-
-class BrandFilterSet(FilterSet):
+# import search
+from storemgr.search import search
+
+
+def use_exists():
+    """determine if to-many relation filters are compiled to EXISTS subqueries and semi-joins rather than JOINs"""
+    return getattr(settings, "STOREMGR_EXISTS_FILTERS", True)
+
+
+def get_outer_lookup(model, field_name):
+    """get the lookup from the related model of the to-many relation field_name of model back to model"""
+    field = model._meta.get_field(field_name)
+    return field.field.name if field.auto_created and not field.concrete else field.related_query_name()
+
+
+def get_exists(model, field_name, related_queryset):
+    """
+    Get a correlated EXISTS subquery testing for a row of related_queryset related to the outer model row through the
+    to-many relation field_name, a reverse foreign key or a many-to-many field of model.
+    """
+    return Exists(related_queryset.filter(**{get_outer_lookup(model, field_name): OuterRef("pk")}))
+
+
+def get_semijoin(model, field_name, related_queryset):
+    """
+    Get a pk IN (subquery) semi-join condition matching the model rows related to any row of related_queryset through
+    the to-many relation field_name. The subquery is not correlated, so a selective related filter is evaluated once.
+    """
+    return Q(pk__in=Subquery(related_queryset.order_by().values(get_outer_lookup(model, field_name))))
+
+
+def get_has_related(model, field_name):
+    """
+    Get a correlated EXISTS subquery testing for any row related through the to-many relation field_name of model;
+    many-to-many relations only read their through table.
+    """
+    field = model._meta.get_field(field_name)
+    if not field.many_to_many:
+        return get_exists(model, field_name, field.related_model._default_manager.all())
+    m2m_field = field if field.concrete else field.field
+    lookup = m2m_field.m2m_field_name() if field.concrete else m2m_field.m2m_reverse_field_name()
+    return Exists(m2m_field.remote_field.through._default_manager.filter(**{lookup: OuterRef("pk")}))
+
+
+def is_to_many(model, field_name):
+    """determine if field_name is a reverse foreign key or many-to-many relation of model"""
+    field = model._meta.get_field(field_name)
+    return field.one_to_many or field.many_to_many
+
+
+class ExistsFilter(BooleanFilter):
+    """
+    Filter on whether any row exists across a to-many relation (has_* filters) with a correlated EXISTS subquery
+    rather than a JOIN with isnull, which multiplies and then de-duplicates rows. Honors exclude and the ! negation.
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        if not use_exists():
+            return super().filter(qs, value)
+        exists = get_has_related(qs.model, self.field_name)
+        # exclude(field__isnull=value) keeps the rows with related rows when value is True
+        return qs.filter(exists if value == self.exclude else ~exists)
+
+
+class FullTextFilter(CharFilter):
+    """
+    Filter on the full-text search index (?search=); each word matches a word prefix of the indexed fields, so
+    "smi" matches "Smith" and "OR-00" matches "OR-000123".
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        return search(qs, value)
+
+
+class StoreMgrFilterSet(FilterSet):
+    """
+    FilterSet applying RelatedFilters across to-many relations (reverse foreign keys and many-to-many fields) as
+    pk IN (subquery) semi-joins on the related table, so each row matches at most once and no JOIN fans out over the
+    related table; to-one relations keep the foreign key IN (subquery) semi-join.
+    """
+
+    def filter_related_filtersets(self, queryset):
+        if not use_exists():
+            return super().filter_related_filtersets(queryset)
+        for related_name, related_filterset in self.related_filtersets.items():
+            # related filtersets are only applied if they had data
+            prefix = f"{related(self, related_name)}{LOOKUP_SEP}"
+            if not any(value.startswith(prefix) for value in self.data):
+                continue
+            field_name = self.filters[related_name].field_name
+            if is_to_many(queryset.model, field_name):
+                queryset = queryset.filter(get_semijoin(queryset.model, field_name, related_filterset.qs))
+            else:
+                queryset = queryset.filter(
+                    **{f"{field_name}__in": Subquery(related_filterset.qs.order_by().values("pk"))}
+                )
+        return queryset
+
+
+class BrandFilterSet(StoreMgrFilterSet):
     """filterset class for Brand"""
 
     product = RelatedFilter("ProductFilterSet", field_name="product", queryset=Product.objects.all())
-    has_product = BooleanFilter(field_name="product", lookup_expr="isnull", exclude=True)
+    has_product = ExistsFilter(field_name="product", lookup_expr="isnull", exclude=True)
 
     class Meta:
         """Metaclass to define filterset model and fields"""
@@ -26,11 +132,12 @@ class BrandFilterSet(FilterSet):
         }
 
 
-class CustomerFilterSet(FilterSet):
+class CustomerFilterSet(StoreMgrFilterSet):
     """filterset class for Customer"""
 
     order = RelatedFilter("OrderFilterSet", field_name="order", queryset=Order.objects.all())
-    has_order = BooleanFilter(field_name="order", lookup_expr="isnull", exclude=True)
+    has_order = ExistsFilter(field_name="order", lookup_expr="isnull", exclude=True)
+    search = FullTextFilter(label="Search")
 
     class Meta:
         """Metaclass to define filterset model and fields"""
@@ -46,7 +153,7 @@ class CustomerFilterSet(FilterSet):
         }
 
 
-class InvoiceFilterSet(FilterSet):
+class InvoiceFilterSet(StoreMgrFilterSet):
     """filterset class for Invoice"""
 
     order = RelatedFilter("OrderFilterSet", field_name="order", queryset=Order.objects.all())
@@ -65,15 +172,16 @@ class InvoiceFilterSet(FilterSet):
         }
 
 
-class OrderFilterSet(FilterSet):
+class OrderFilterSet(StoreMgrFilterSet):
     """filterset class for Order"""
 
     customer = RelatedFilter("CustomerFilterSet", field_name="customer", queryset=Customer.objects.all())
     status = RelatedFilter("OrderStatusFilterSet", field_name="status", queryset=OrderStatus.objects.all())
     invoice = RelatedFilter("InvoiceFilterSet", field_name="invoice", queryset=Invoice.objects.all())
-    has_invoice = BooleanFilter(field_name="invoice", lookup_expr="isnull", exclude=True)
+    has_invoice = ExistsFilter(field_name="invoice", lookup_expr="isnull", exclude=True)
     products = RelatedFilter("ProductFilterSet", field_name="products", queryset=Product.objects.all())
-    has_products = BooleanFilter(field_name="products", lookup_expr="isnull", exclude=True)
+    has_products = ExistsFilter(field_name="products", lookup_expr="isnull", exclude=True)
+    search = FullTextFilter(label="Search")
 
     class Meta:
         """Metaclass to define filterset model and fields"""
@@ -88,11 +196,11 @@ class OrderFilterSet(FilterSet):
         }
 
 
-class OrderStatusFilterSet(FilterSet):
+class OrderStatusFilterSet(StoreMgrFilterSet):
     """filterset class for OrderStatus"""
 
     order = RelatedFilter("OrderFilterSet", field_name="order", queryset=Order.objects.all())
-    has_order = BooleanFilter(field_name="order", lookup_expr="isnull", exclude=True)
+    has_order = ExistsFilter(field_name="order", lookup_expr="isnull", exclude=True)
 
     class Meta:
         """Metaclass to define filterset model and fields"""
@@ -106,18 +214,19 @@ class OrderStatusFilterSet(FilterSet):
         }
 
 
-class ProductFilterSet(FilterSet):
+class ProductFilterSet(StoreMgrFilterSet):
     """filterset class for Product"""
 
     brand = RelatedFilter("BrandFilterSet", field_name="brand", queryset=Brand.objects.all())
     invoice = RelatedFilter("InvoiceFilterSet", field_name="invoice", queryset=Invoice.objects.all())
-    has_invoice = BooleanFilter(field_name="invoice", lookup_expr="isnull", exclude=True)
+    has_invoice = ExistsFilter(field_name="invoice", lookup_expr="isnull", exclude=True)
     order = RelatedFilter("OrderFilterSet", field_name="order", queryset=Order.objects.all())
-    has_order = BooleanFilter(field_name="order", lookup_expr="isnull", exclude=True)
+    has_order = ExistsFilter(field_name="order", lookup_expr="isnull", exclude=True)
     attributes = RelatedFilter(
         "ProductAttributeFilterSet", field_name="attributes", queryset=ProductAttribute.objects.all()
     )
-    has_attributes = BooleanFilter(field_name="attributes", lookup_expr="isnull", exclude=True)
+    has_attributes = ExistsFilter(field_name="attributes", lookup_expr="isnull", exclude=True)
+    search = FullTextFilter(label="Search")
 
     class Meta:
         """Metaclass to define filterset model and fields"""
@@ -133,11 +242,11 @@ class ProductFilterSet(FilterSet):
         }
 
 
-class ProductAttributeFilterSet(FilterSet):
+class ProductAttributeFilterSet(StoreMgrFilterSet):
     """filterset class for ProductAttribute"""
 
     product = RelatedFilter("ProductFilterSet", field_name="product", queryset=Product.objects.all())
-    has_product = BooleanFilter(field_name="product", lookup_expr="isnull", exclude=True)
+    has_product = ExistsFilter(field_name="product", lookup_expr="isnull", exclude=True)
 
     class Meta:
         """Metaclass to define filterset model and fields"""
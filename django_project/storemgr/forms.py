@@ -1,7 +1,10 @@
 from django import forms
 
 # import models
-from storemgr.models import (Brand, OrderStatus, Product)
+from storemgr.models import OrderStatus
+
+# import widgets
+from storemgr.widgets import AutocompleteWidget
 
 
 class FilterProductForm(forms.Form):
@@ -10,15 +13,9 @@ class FilterProductForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super(FilterProductForm, self).__init__(*args, **kwargs)
 
-    sku__icontains = forms.CharField(
-        widget=forms.TextInput(attrs={"class": "form-control"}), required=False, label="Sku"
-    )
-    brand = forms.ModelChoiceField(
-        queryset=Brand.objects.all(),
-        widget=forms.Select(attrs={"class": "form-control"}),
-        required=False,
-        label="Brand",
-    )
+    search = forms.CharField(widget=forms.TextInput(attrs={"class": "form-control"}), required=False, label="Search")
+    sku__icontains = forms.CharField(widget=AutocompleteWidget("sku", free_text=True), required=False, label="Sku")
+    brand = forms.CharField(widget=AutocompleteWidget("brand"), required=False, label="Brand")
     description__icontains = forms.CharField(
         widget=forms.TextInput(attrs={"class": "form-control"}), required=False, label="Description"
     )
@@ -33,15 +30,12 @@ class FilterOrderForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super(FilterOrderForm, self).__init__(*args, **kwargs)
 
+    search = forms.CharField(widget=forms.TextInput(attrs={"class": "form-control"}), required=False, label="Search")
     order_id__icontains = forms.CharField(
-        widget=forms.TextInput(attrs={"class": "form-control"}), required=False, label="Order ID"
+        widget=AutocompleteWidget("order_id", free_text=True), required=False, label="Order ID"
     )
     status = forms.ModelChoiceField(
         queryset=OrderStatus.objects.all(), widget=forms.Select(attrs={"class": "form-control"}), required=False
     )
-    products = forms.ModelChoiceField(
-        queryset=Product.objects.all(),
-        widget=forms.Select(attrs={"class": "form-control"}),
-        required=False,
-        label="Product",
-    )
+    customer = forms.CharField(widget=AutocompleteWidget("customer"), required=False, label="Customer")
+    products = forms.CharField(widget=AutocompleteWidget("sku"), required=False, label="Product")
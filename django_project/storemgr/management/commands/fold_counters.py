@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from storemgr.counters import fold_deltas
+
+
+class Command(BaseCommand):
+    help = ("Fold the pending counter deltas written by inserts into the dashboard counters; writes fold them every "
+            "STOREMGR_COUNTER_FOLD_THRESHOLD deltas, run this periodically (e.g. from cron) to fold the remainder")
+
+    def handle(self, *args, **options):
+        """ command entry point """
+        self.stdout.write(f"{fold_deltas()} counters updated")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from storemgr.counters import get_all_counters, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard counters (totals, orders by brand, orders by status) from the source tables"
+
+    def handle(self, *args, **options):
+        """ command entry point """
+        rebuild_counters()
+        counters = get_all_counters()
+        for dimension in ("total", "orders_by_brand", "orders_by_status"):
+            self.stdout.write(f"{dimension}: {len(counters.get(dimension, {}))} counters rebuilt")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from storemgr.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of products, customers and orders from the source tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000, help="rows indexed per batch")
+
+    def handle(self, *args, **options):
+        """ command entry point """
+        for label, count in rebuild_index(chunk_size=options["chunk_size"]).items():
+            self.stdout.write(f"{label}: {count} rows indexed")
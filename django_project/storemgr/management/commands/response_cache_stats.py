@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from storemgr.caching import get_stats, reset_stats
+from storemgr.urls.rest import router
+
+
+class Command(BaseCommand):
+    help = "Show the REST response cache hit and miss counts per endpoint"
+
+    def add_arguments(self, parser):
+        """ define command arguments """
+        parser.add_argument("--reset", action="store_true", required=False,
+                            help="zero the counters after showing them")
+
+    def handle(self, *args, **options):
+        """ command entry point """
+        endpoint_list = [basename for _, _, basename in router.registry]
+        for endpoint, counts in get_stats(endpoint_list).items():
+            total = counts["hit"] + counts["miss"]
+            ratio = f"{counts['hit'] / total:.1%}" if total else "-"
+            self.stdout.write(f"{endpoint}: {counts['hit']} hits, {counts['miss']} misses, hit ratio {ratio}")
+        if options["reset"]:
+            reset_stats(endpoint_list)
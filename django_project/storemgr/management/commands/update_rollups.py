@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from storemgr.rollups import ROLLUP_MODELS, update_rollups
+
+
+class Command(BaseCommand):
+    help = "Roll up rows created per day, since the last rolled-up day, for the annual report views"
+
+    def add_arguments(self, parser):
+        """ define command arguments """
+        parser.add_argument("--full", action="store_true", required=False,
+                            help="discard existing rollups and rebuild them from the first row")
+
+    def handle(self, *args, **options):
+        """ command entry point """
+        for model in ROLLUP_MODELS:
+            days = update_rollups(model, full=options["full"])
+            self.stdout.write(f"{model._meta.label_lower}: {days} days rolled up")
@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("storemgr", "0003_aggregatecounter"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("model_name", models.CharField(max_length=64)),
+                ("day", models.DateField()),
+                ("created", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "unique_together": {("model_name", "day")},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("storemgr", "0004_dailyrollup"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="brand",
+            index=models.Index(fields=["created_at", "id"], name="brand_created_at_pk_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="customer",
+            index=models.Index(fields=["created_at", "customer_id"], name="customer_created_at_pk_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="invoice",
+            index=models.Index(fields=["created_at", "id"], name="invoice_created_at_pk_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(fields=["created_at", "order_id"], name="order_created_at_pk_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["created_at", "sku"], name="product_created_at_pk_idx"),
+        ),
+    ]
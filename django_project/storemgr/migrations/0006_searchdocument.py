@@ -0,0 +1,106 @@
+# Generated by Django 4.2 on 2026-10-18 19:13
+
+from django.db import migrations, models
+
+
+SQLITE_SQL = [
+    "CREATE VIRTUAL TABLE storemgr_searchdocument_fts USING fts5("
+    "body, content='storemgr_searchdocument', content_rowid='id')",
+    "CREATE TRIGGER storemgr_searchdocument_ai AFTER INSERT ON storemgr_searchdocument BEGIN "
+    "INSERT INTO storemgr_searchdocument_fts(rowid, body) VALUES (new.id, new.body); END",
+    "CREATE TRIGGER storemgr_searchdocument_ad AFTER DELETE ON storemgr_searchdocument BEGIN "
+    "INSERT INTO storemgr_searchdocument_fts(storemgr_searchdocument_fts, rowid, body) "
+    "VALUES ('delete', old.id, old.body); END",
+    "CREATE TRIGGER storemgr_searchdocument_au AFTER UPDATE ON storemgr_searchdocument BEGIN "
+    "INSERT INTO storemgr_searchdocument_fts(storemgr_searchdocument_fts, rowid, body) "
+    "VALUES ('delete', old.id, old.body); "
+    "INSERT INTO storemgr_searchdocument_fts(rowid, body) VALUES (new.id, new.body); END",
+]
+
+SQLITE_REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS storemgr_searchdocument_au",
+    "DROP TRIGGER IF EXISTS storemgr_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS storemgr_searchdocument_ai",
+    "DROP TABLE IF EXISTS storemgr_searchdocument_fts",
+]
+
+POSTGRESQL_SQL = [
+    "ALTER TABLE storemgr_searchdocument ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', body)) STORED",
+    "CREATE INDEX storemgr_searchdocument_vector_idx ON storemgr_searchdocument USING GIN (search_vector)",
+]
+
+POSTGRESQL_REVERSE_SQL = [
+    "DROP INDEX IF EXISTS storemgr_searchdocument_vector_idx",
+    "ALTER TABLE storemgr_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+# fields indexed per model when the index is first built; see storemgr.search.SEARCH_FIELDS
+SEARCH_FIELDS = {
+    "Product": ["sku", "description"],
+    "Customer": ["customer_id", "first_name", "last_name", "email"],
+    "Order": ["order_id"],
+}
+
+
+def run_sql(schema_editor, sql_map):
+    """run the statements for the database vendor, if any"""
+    for statement in sql_map.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_index(apps, schema_editor):
+    """create the full-text index and index the existing rows"""
+    run_sql(schema_editor, {"sqlite": SQLITE_SQL, "postgresql": POSTGRESQL_SQL})
+    SearchDocument = apps.get_model("storemgr", "SearchDocument")
+    for model_name, field_list in SEARCH_FIELDS.items():
+        model = apps.get_model("storemgr", model_name)
+        label = f"storemgr.{model_name.lower()}"
+        for row_list in iter_rows(model.objects.values_list("pk", *field_list)):
+            SearchDocument.objects.bulk_create(
+                [
+                    SearchDocument(model_label=label, object_pk=row[0], body=" ".join(str(i) for i in row[1:] if i))
+                    for row in row_list
+                ]
+            )
+
+
+def iter_rows(queryset, chunk_size=2000):
+    """iterate a queryset as lists of rows"""
+    row_list = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        row_list.append(row)
+        if len(row_list) >= chunk_size:
+            yield row_list
+            row_list = []
+    if row_list:
+        yield row_list
+
+
+def drop_index(apps, schema_editor):
+    """drop the full-text index"""
+    run_sql(schema_editor, {"sqlite": SQLITE_REVERSE_SQL, "postgresql": POSTGRESQL_REVERSE_SQL})
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("storemgr", "0005_created_at_pk_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchDocument",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("model_label", models.CharField(max_length=64)),
+                ("object_pk", models.CharField(max_length=64)),
+                ("body", models.TextField()),
+            ],
+            options={
+                "unique_together": {("model_label", "object_pk")},
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2 on 2026-10-18 19:40
+
+from django.db import migrations
+
+
+# the FTS5 index gains a model_label column so a label filter is resolved inside the index
+SQLITE_SQL = [
+    "DROP TRIGGER storemgr_searchdocument_au",
+    "DROP TRIGGER storemgr_searchdocument_ad",
+    "DROP TRIGGER storemgr_searchdocument_ai",
+    "DROP TABLE storemgr_searchdocument_fts",
+    "CREATE VIRTUAL TABLE storemgr_searchdocument_fts USING fts5("
+    "body, model_label, content='storemgr_searchdocument', content_rowid='id')",
+    "CREATE TRIGGER storemgr_searchdocument_ai AFTER INSERT ON storemgr_searchdocument BEGIN "
+    "INSERT INTO storemgr_searchdocument_fts(rowid, body, model_label) VALUES (new.id, new.body, new.model_label); END",
+    "CREATE TRIGGER storemgr_searchdocument_ad AFTER DELETE ON storemgr_searchdocument BEGIN "
+    "INSERT INTO storemgr_searchdocument_fts(storemgr_searchdocument_fts, rowid, body, model_label) "
+    "VALUES ('delete', old.id, old.body, old.model_label); END",
+    "CREATE TRIGGER storemgr_searchdocument_au AFTER UPDATE ON storemgr_searchdocument BEGIN "
+    "INSERT INTO storemgr_searchdocument_fts(storemgr_searchdocument_fts, rowid, body, model_label) "
+    "VALUES ('delete', old.id, old.body, old.model_label); "
+    "INSERT INTO storemgr_searchdocument_fts(rowid, body, model_label) VALUES (new.id, new.body, new.model_label); END",
+    "INSERT INTO storemgr_searchdocument_fts(storemgr_searchdocument_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE_SQL = [
+    "DROP TRIGGER storemgr_searchdocument_au",
+    "DROP TRIGGER storemgr_searchdocument_ad",
+    "DROP TRIGGER storemgr_searchdocument_ai",
+    "DROP TABLE storemgr_searchdocument_fts",
+    "CREATE VIRTUAL TABLE storemgr_searchdocument_fts USING fts5("
+    "body, content='storemgr_searchdocument', content_rowid='id')",
+    "CREATE TRIGGER storemgr_searchdocument_ai AFTER INSERT ON storemgr_searchdocument BEGIN "
+    "INSERT INTO storemgr_searchdocument_fts(rowid, body) VALUES (new.id, new.body); END",
+    "CREATE TRIGGER storemgr_searchdocument_ad AFTER DELETE ON storemgr_searchdocument BEGIN "
+    "INSERT INTO storemgr_searchdocument_fts(storemgr_searchdocument_fts, rowid, body) "
+    "VALUES ('delete', old.id, old.body); END",
+    "CREATE TRIGGER storemgr_searchdocument_au AFTER UPDATE ON storemgr_searchdocument BEGIN "
+    "INSERT INTO storemgr_searchdocument_fts(storemgr_searchdocument_fts, rowid, body) "
+    "VALUES ('delete', old.id, old.body); "
+    "INSERT INTO storemgr_searchdocument_fts(rowid, body) VALUES (new.id, new.body); END",
+    "INSERT INTO storemgr_searchdocument_fts(storemgr_searchdocument_fts) VALUES ('rebuild')",
+]
+
+# fields indexed per model added to the search index; see storemgr.search.SEARCH_FIELDS
+SEARCH_FIELDS = {
+    "Brand": ["name"],
+    "Manufacturer": ["name"],
+}
+
+
+def run_sql(schema_editor, sql_map):
+    """run the statements for the database vendor, if any"""
+    for statement in sql_map.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def index_rows(apps, schema_editor):
+    """add the model_label column to the full-text index and index the existing brands and manufacturers"""
+    run_sql(schema_editor, {"sqlite": SQLITE_SQL})
+    SearchDocument = apps.get_model("storemgr", "SearchDocument")
+    for model_name, field_list in SEARCH_FIELDS.items():
+        model = apps.get_model("storemgr", model_name)
+        label = f"storemgr.{model_name.lower()}"
+        SearchDocument.objects.bulk_create(
+            [
+                SearchDocument(model_label=label, object_pk=row[0], body=" ".join(str(i) for i in row[1:] if i))
+                for row in model.objects.values_list("pk", *field_list).iterator(chunk_size=2000)
+            ],
+            batch_size=2000,
+        )
+
+
+def unindex_rows(apps, schema_editor):
+    """remove the brand and manufacturer documents and the model_label column of the full-text index"""
+    SearchDocument = apps.get_model("storemgr", "SearchDocument")
+    SearchDocument.objects.filter(model_label__in=[f"storemgr.{i.lower()}" for i in SEARCH_FIELDS]).delete()
+    run_sql(schema_editor, {"sqlite": SQLITE_REVERSE_SQL})
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("storemgr", "0006_searchdocument"),
+    ]
+
+    operations = [
+        migrations.RunPython(index_rows, unindex_rows),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+def drop_table_versions(apps, schema_editor):
+    """table versions now live in the cache generations; see storemgr.conditional"""
+    apps.get_model("storemgr", "AggregateCounter").objects.filter(dimension="table_version").delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("storemgr", "0007_global_search"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_table_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("storemgr", "0008_drop_table_version_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CounterDelta",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("dimension", models.CharField(max_length=32)),
+                ("key", models.CharField(max_length=64)),
+                ("delta", models.BigIntegerField()),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
@@ -1,8 +1,80 @@
-from django.db import models
+import functools
+
+from django.conf import settings
+from django.db import models, transaction
 from django.urls import reverse
 from auditlog.registry import auditlog
 from handyhelpers.models import HandyHelperBaseModel
-from handyhelpers.views.report import get_colors
+
+from storemgr.caching import invalidate_models, invalidate_objects
+from storemgr.charts import get_count_chart
+from storemgr.sequences import next_id
+
+
+def memoize(method):
+    """
+    cache the result of a model method taking no arguments on the instance, so a detail page calling it from several
+    places runs its query once; querysets returned keep their result cache between calls
+    """
+
+    @functools.wraps(method)
+    def wrapper(self):
+        memo = self.__dict__.setdefault("_memo", {})
+        if method.__name__ not in memo:
+            memo[method.__name__] = method(self)
+        return memo[method.__name__]
+
+    return wrapper
+
+
+class AggregateCounter(HandyHelperBaseModel):
+    """incrementally maintained count used in reports; see storemgr.counters"""
+    dimension = models.CharField(max_length=32)
+    key = models.CharField(max_length=64)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = (("dimension", "key"),)
+
+    def __str__(self) -> str:
+        return f"{self.dimension}:{self.key}"
+
+    @classmethod
+    def bump(cls, dimension, key, delta=1):
+        """add delta to a counter; see bump_many"""
+        cls.bump_many([(dimension, key, delta)])
+
+    @staticmethod
+    def bump_many(delta_list):
+        """
+        add each (dimension, key, delta) of delta_list to its counter in one INSERT of CounterDelta rows; the counter
+        rows themselves are not touched, so concurrent writers do not queue on them. Once every
+        STOREMGR_COUNTER_FOLD_THRESHOLD deltas, the pending deltas are folded into the counters when the transaction
+        commits (see storemgr.counters)
+        """
+        from storemgr.counters import fold_deltas  # pylint: disable=import-outside-toplevel
+
+        delta_objs = CounterDelta.objects.bulk_create(
+            [
+                CounterDelta(dimension=dimension, key=str(key), delta=delta)
+                for dimension, key, delta in delta_list
+                if delta
+            ]
+        )
+        threshold = getattr(settings, "STOREMGR_COUNTER_FOLD_THRESHOLD", 1000)
+        pk_list = [i.pk for i in delta_objs if i.pk is not None]
+        if threshold and pk_list and (min(pk_list) - 1) // threshold != max(pk_list) // threshold:
+            transaction.on_commit(fold_deltas)
+
+
+class CounterDelta(HandyHelperBaseModel):
+    """pending change of an AggregateCounter, appended by writers and folded into the counter; see storemgr.counters"""
+    dimension = models.CharField(max_length=32)
+    key = models.CharField(max_length=64)
+    delta = models.BigIntegerField()
+
+    def __str__(self) -> str:
+        return f"{self.dimension}:{self.key}:{self.delta:+d}"
 
 
 class Brand(HandyHelperBaseModel):
@@ -12,6 +84,7 @@ class Brand(HandyHelperBaseModel):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [models.Index(fields=["created_at", "id"], name="brand_created_at_pk_idx")]
 
     def __str__(self) -> str:
         return self.name
@@ -19,7 +92,8 @@ class Brand(HandyHelperBaseModel):
     def disable(self):
         """disable this brand and all of its products"""
         self.enabled = False
-        self.product_set.update(enabled=False)
+        AggregateCounter.bump("total", "product", -self.product_set.filter(enabled=True).update(enabled=False))
+        invalidate_models(Product)
         self.save()
 
     def get_absolute_url(self) -> str:
@@ -29,32 +103,32 @@ class Brand(HandyHelperBaseModel):
     def get_icon() -> str:
         return """<i class="fa-solid fa-language"></i>"""
 
+    @memoize
     def get_products(self):
         return self.product_set.all()
-    
+
+    @memoize
     def get_orders(self):
-        return Order.objects.filter(products__brand=self).select_related("status")
+        return Order.objects.filter(
+            pk__in=Invoice.objects.filter(product__brand=self).values("order_id")
+        ).select_related("status")
 
     def get_orders_by_product(self):
-        order_qs = self.get_orders().values('products__sku').annotate(qty=models.Count('products__sku'))
-        return dict(
-            id="orders_by_product",
-            type="bar",
-            label_list=[i['products__sku'] for i in order_qs],
-            value_list=[i['qty'] for i in order_qs],
-            list_view=f"/storemgr/list_orders?products__brand__name={self.name}&products__sku=",
-            color_list=get_colors(order_qs.count()),
+        return get_count_chart(
+            "orders_by_product",
+            Invoice.objects.filter(product__brand=self),
+            "product_id",
+            f"/storemgr/list_orders?products__brand__name={self.name}&products__sku=",
+            count_field="order_id",
         )
 
     def get_orders_by_status(self):
-        order_qs = self.get_orders().values('status__name').annotate(qty=models.Count('status__name'))
-        return dict(
-            id="orders_by_status",
-            type="bar",
-            label_list=[i['status__name'] for i in order_qs],
-            value_list=[i['qty'] for i in order_qs],
-            list_view=f"/storemgr/list_orders?products__brand__name={self.name}&status__name=",
-            color_list=get_colors(order_qs.count()),
+        return get_count_chart(
+            "orders_by_status",
+            Invoice.objects.filter(product__brand=self),
+            "order__status__name",
+            f"/storemgr/list_orders?products__brand__name={self.name}&status__name=",
+            count_field="order_id",
         )
 
 
@@ -66,6 +140,7 @@ class Customer(HandyHelperBaseModel):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [models.Index(fields=["created_at", "customer_id"], name="customer_created_at_pk_idx")]
 
     def __str__(self) -> str:
         return self.customer_id
@@ -75,10 +150,7 @@ class Customer(HandyHelperBaseModel):
 
     def save(self, *args, **kwargs):
         if not self.pk:
-            if Customer.objects.count() < 1:
-                self.customer_id = "CU-" + "1".zfill(8)
-            else:
-                self.customer_id = "CU-" + str(Customer.objects.count() + 1).zfill(8)
+            self.customer_id = next_id(Customer, "CU-")
         super(Customer, self).save(*args, **kwargs)
 
     @staticmethod
@@ -92,6 +164,7 @@ class Invoice(HandyHelperBaseModel):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [models.Index(fields=["created_at", "id"], name="invoice_created_at_pk_idx")]
 
     def __str__(self) -> str:
         return getattr(self.order, "order_id", str(self.pk))
@@ -117,29 +190,32 @@ class Manufacturer(HandyHelperBaseModel):
     def disable(self):
         """disable this manufacturer and all of its brands and products"""
         self.enabled = False
-        self.brand_set.update(enabled=False)
+        AggregateCounter.bump("total", "brand", -self.brand_set.filter(enabled=True).update(enabled=False))
         for brand in self.brand_set.all():
-            brand.product_set.update(enabled=False)
+            AggregateCounter.bump("total", "product", -brand.product_set.filter(enabled=True).update(enabled=False))
+        invalidate_models(Brand, Product)
         self.save()
 
+    @memoize
     def get_brands(self):
         return self.brand_set.all()
 
+    @memoize
     def get_orders(self):
-        return Order.objects.filter(products__brand__manufacturer=self).select_related("status")
+        return Order.objects.filter(
+            pk__in=Invoice.objects.filter(product__brand__manufacturer=self).values("order_id")
+        ).select_related("status")
 
     def get_orders_by_product(self):
-        order_qs = self.get_orders().values('products__sku').annotate(qty=models.Count('products__sku'))
-        print('TEST: ', order_qs)
-        return dict(
-            id="orders_by_product",
-            type="bar",
-            label_list=[i['products__sku'] for i in order_qs],
-            value_list=[i['qty'] for i in order_qs],
-            list_view=f"/storemgr/list_orders?products__brand__manufacturer__name={self.name}&products__sku=",
-            color_list=get_colors(order_qs.count()),
+        return get_count_chart(
+            "orders_by_product",
+            Invoice.objects.filter(product__brand__manufacturer=self),
+            "product_id",
+            f"/storemgr/list_orders?products__brand__manufacturer__name={self.name}&products__sku=",
+            count_field="order_id",
         )
 
+    @memoize
     def get_products(self):
         return Product.objects.filter(brand__manufacturer=self)
 
@@ -153,6 +229,7 @@ class Order(HandyHelperBaseModel):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [models.Index(fields=["created_at", "order_id"], name="order_created_at_pk_idx")]
 
     def __str__(self) -> str:
         return self.order_id
@@ -162,10 +239,7 @@ class Order(HandyHelperBaseModel):
 
     def save(self, *args, **kwargs):
         if not self.pk:
-            if Order.objects.count() < 1:
-                self.order_id = "OR-" + "1".zfill(8)
-            else:
-                self.order_id = "OR-" + str(Order.objects.count() + 1).zfill(8)
+            self.order_id = next_id(Order, "OR-")
         super(Order, self).save(*args, **kwargs)
 
     @staticmethod
@@ -200,6 +274,7 @@ class Product(HandyHelperBaseModel):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [models.Index(fields=["created_at", "sku"], name="product_created_at_pk_idx")]
 
     def __str__(self) -> str:
         return self.sku
@@ -209,10 +284,7 @@ class Product(HandyHelperBaseModel):
 
     def save(self, *args, **kwargs):
         if not self.pk:
-            if Product.objects.count() < 1:
-                self.sku = "SKU-" + "1".zfill(8)
-            else:
-                self.sku = "SKU-" + str(Product.objects.count() + 1).zfill(8)
+            self.sku = next_id(Product, "SKU-")
         super(Product, self).save(*args, **kwargs)
 
     @staticmethod
@@ -220,6 +292,41 @@ class Product(HandyHelperBaseModel):
         return """<i class="fa-brands fa-product-hunt"></i>"""
 
 
+class DailyRollup(HandyHelperBaseModel):
+    """number of rows of a model created on a given day; see storemgr.rollups"""
+    model_name = models.CharField(max_length=64)
+    day = models.DateField()
+    created = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = (("model_name", "day"),)
+
+    def __str__(self) -> str:
+        return f"{self.model_name}:{self.day}"
+
+
+class IdSequence(HandyHelperBaseModel):
+    """last numeric id handed out per model; see storemgr.sequences"""
+    name = models.CharField(max_length=64, unique=True)
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class SearchDocument(HandyHelperBaseModel):
+    """searchable text of a row, kept in a full-text index (SQLite FTS5 or a PostgreSQL tsvector); see storemgr.search"""
+    model_label = models.CharField(max_length=64)
+    object_pk = models.CharField(max_length=64)
+    body = models.TextField()
+
+    class Meta:
+        unique_together = (("model_label", "object_pk"),)
+
+    def __str__(self) -> str:
+        return f"{self.model_label}:{self.object_pk}"
+
+
 class ProductAttribute(HandyHelperBaseModel):
     key = models.CharField(max_length=16)
     value = models.CharField(max_length=32, blank=True, null=True)
@@ -234,6 +341,30 @@ class ProductAttribute(HandyHelperBaseModel):
         unique_together = (("key", "value"),)
 
 
+def invalidate_detail_fragments(brand_ids=(), product_ids=(), order_ids=()):
+    """
+    once the current transaction commits, start a new related version (see storemgr.caching.invalidate_objects) for
+    each brand in brand_ids, owning a product in product_ids or ordered in order_ids, and for their manufacturers; the
+    lookups run after the commit, outside the writer's transaction
+    """
+    brand_ids, product_ids, order_ids = set(brand_ids), set(product_ids), set(order_ids)
+
+    def invalidate():
+        if product_ids:
+            brand_ids.update(Product.objects.filter(pk__in=product_ids).values_list("brand_id", flat=True))
+        if order_ids:
+            brand_ids.update(Invoice.objects.filter(order_id__in=order_ids).values_list("product__brand_id", flat=True))
+        brand_ids.discard(None)
+        if brand_ids:
+            invalidate_objects(Brand, brand_ids)
+            invalidate_objects(
+                Manufacturer, Brand.objects.filter(pk__in=brand_ids).values_list("manufacturer_id", flat=True)
+            )
+
+    if brand_ids or product_ids or order_ids:
+        transaction.on_commit(invalidate)
+
+
 # Models to register with AuditLog
 auditlog.register(Brand)
 auditlog.register(Customer)
@@ -0,0 +1,258 @@
+""" DRF pagination classes for storemgr viewsets """
+
+import base64
+import binascii
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from storemgr import caching
+
+
+def get_planner_estimate(queryset):
+    """get the query planner's row estimate for queryset; None where the backend gives none (only PostgreSQL does)"""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    try:
+        with transaction.atomic(using=queryset.db), connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def get_cached_count(queryset):
+    """
+    Get (count, exact) for queryset from a cache keyed on its SQL, for STOREMGR_COUNT_CACHE_TIMEOUT seconds. Counts are
+    computed on a miss and exact then; cached counts are reported as not exact, as they are not invalidated by writes
+    and may be up to the timeout old.
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    variant = repr((sql, params))
+    key = f"{caching.KEY_PREFIX}:count:{hashlib.md5(variant.encode('utf-8')).hexdigest()}"
+    cache = caching.get_cache()
+    count = cache.get(key)
+    if count is not None:
+        return count, False
+    count = queryset.count()
+    cache.set(key, count, getattr(settings, "STOREMGR_COUNT_CACHE_TIMEOUT", 300))
+    return count, True
+
+
+def get_estimated_count(queryset):
+    """
+    Get (count, exact) for queryset: an exact count up to STOREMGR_EXACT_COUNT_THRESHOLD rows, with a COUNT(*) over a
+    LIMIT threshold + 1 subquery; above it the query planner's estimate, or a cached count where the backend has none.
+    A threshold of 0 always counts exactly.
+    """
+    threshold = getattr(settings, "STOREMGR_EXACT_COUNT_THRESHOLD", 10000)
+    if not threshold:
+        return queryset.count(), True
+    bounded_count = queryset.order_by()[: threshold + 1].count()
+    if bounded_count <= threshold:
+        return bounded_count, True
+    count = get_planner_estimate(queryset)
+    exact = False
+    if count is None:
+        count, exact = get_cached_count(queryset)
+    return max(count, bounded_count), exact
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination on (created_at, pk), newest first, or oldest first with ?direction=asc.
+
+    Each page is a single indexed range query with no COUNT(*). The cursor holds the (created_at, pk) of the last row
+    served, so rows inserted while a client walks the list never shift or repeat later pages. Every response carries
+    that cursor, even on the last page: a sync client walking oldest first saves it and later resumes from it with
+    ?direction=asc&cursor=<saved cursor> to get only the rows created since.
+    """
+
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    direction_query_param = "direction"
+    default_limit = api_settings.PAGE_SIZE
+    max_limit = 1000
+    orderings = {"desc": ("-created_at", "-pk"), "asc": ("created_at", "pk")}
+    invalid_cursor_message = "Invalid cursor"
+    invalid_direction_message = "Invalid direction"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.direction = self.get_direction(request)
+        self.position = self.decode_cursor(request, queryset.model)
+        queryset = queryset.order_by(*self.orderings[self.direction])
+        if self.position:
+            created_at, pk = self.position
+            if self.direction == "asc":
+                queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+            else:
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+        rows = list(queryset[: self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        rows = rows[: self.limit]
+        if rows:
+            self.position = (rows[-1].created_at, rows[-1].pk)
+        return rows
+
+    def get_direction(self, request):
+        """get the direction requested, desc (newest first) by default"""
+        direction = request.query_params.get(self.direction_query_param) or "desc"
+        if direction not in self.orderings:
+            raise NotFound(self.invalid_direction_message)
+        return direction
+
+    def get_limit(self, request):
+        """get the page size requested, capped at max_limit"""
+        try:
+            return _positive_int(request.query_params[self.limit_query_param], strict=True, cutoff=self.max_limit)
+        except (KeyError, ValueError):
+            return self.default_limit
+
+    def decode_cursor(self, request, model):
+        """get the (created_at, pk) position from the cursor parameter, checked against model; None for the first page"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")).decode("utf-8"))
+            created_at = parse_datetime(created_at)
+            if isinstance(pk, bool) or not isinstance(pk, (str, int)):
+                raise ValueError(pk)
+            pk = model._meta.pk.clean(pk, None)
+        except (binascii.Error, TypeError, ValueError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None or (settings.USE_TZ and timezone.is_naive(created_at)):
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def encode_cursor(self, position):
+        """build the cursor parameter for a (created_at, pk) position"""
+        created_at, pk = position
+        return base64.urlsafe_b64encode(json.dumps([created_at.isoformat(), pk]).encode("utf-8")).decode("ascii")
+
+    def get_cursor(self):
+        """get the cursor of the last row served, or the requested one when the page is empty; None for an empty list"""
+        return self.encode_cursor(self.position) if self.position else None
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.cursor_query_param, self.get_cursor())
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([("next", self.get_next_link()), ("cursor", self.get_cursor()), ("results", data)]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "cursor": {
+                    "type": "string",
+                    "nullable": True,
+                    "description": "cursor of the last row served; resume from it with ?direction=asc&cursor=",
+                },
+                "results": schema,
+            },
+        }
+
+
+class EstimatedCountPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination that counts exactly only up to STOREMGR_EXACT_COUNT_THRESHOLD rows, with a COUNT(*) over
+    a LIMIT threshold + 1 subquery. Larger results use the query planner's estimate, or a cached count per filter
+    signature where the backend has no estimate. Responses with an estimated count add "count_exact": false; those
+    with an exact count have the standard limit/offset body.
+
+    An estimated page reads one row more than it returns, so the next link is right even when the estimate is not,
+    and the last page corrects the count to an exact one. A threshold of 0 always counts exactly.
+    """
+
+    def get_count(self, queryset):
+        if not hasattr(queryset, "query"):
+            self.count_exact = True
+            return super().get_count(queryset)
+        count, self.count_exact = get_estimated_count(queryset)
+        return count
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.count = self.get_count(queryset)
+        self.offset = self.get_offset(request)
+        self.request = request
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+
+        if self.count_exact:
+            if self.count == 0 or self.offset > self.count:
+                return []
+            return list(queryset[self.offset : self.offset + self.limit])
+
+        rows = list(queryset[self.offset : self.offset + self.limit + 1])
+        if len(rows) > self.limit:
+            self.count = max(self.count, self.offset + len(rows))
+        elif rows or not self.offset:
+            self.count, self.count_exact = self.offset + len(rows), True
+        else:
+            self.count = min(self.count, self.offset)
+        return rows[: self.limit]
+
+    def get_paginated_response(self, data):
+        estimate = [] if self.count_exact else [("count_exact", False)]
+        return Response(
+            OrderedDict(
+                [("count", self.count)]
+                + estimate
+                + [("next", self.get_next_link()), ("previous", self.get_previous_link()), ("results", data)]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count_exact"] = {
+            "type": "boolean",
+            "example": False,
+            "description": "present, and false, only when count is an estimate",
+        }
+        return response_schema
+
+
+class StoreMgrPagination(EstimatedCountPagination):
+    """estimated-count limit/offset pagination; switches to KeysetPagination when the request has a cursor parameter"""
+
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,221 @@
+""" plan the select_related / prefetch_related / only() calls of a viewset queryset from its serializer and request """
+
+import functools
+import importlib
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_flex_fields import EXPAND_PARAM, FIELDS_PARAM, OMIT_PARAM, WILDCARD_VALUES, split_levels
+
+
+def get_flex_options(request):
+    """get the expand, fields and omit values of a request the way FlexFieldsModelSerializer reads them"""
+    options = {}
+    query_params = getattr(request, "query_params", {})
+    for key, param in (("expand", EXPAND_PARAM), ("fields", FIELDS_PARAM), ("omit", OMIT_PARAM)):
+        values = (query_params.getlist(param) or query_params.getlist(f"{param}[]")) if query_params else []
+        options[key] = values[0].split(",") if len(values) == 1 else values
+    return options
+
+
+def has_wildcard(values):
+    """determine if a list of expand or fields values contains a wildcard"""
+    return bool(WILDCARD_VALUES and set(values) & set(WILDCARD_VALUES))
+
+
+@functools.lru_cache(maxsize=None)
+def get_serializer_class(path):
+    """import a serializer class from a lazy "module.ClassName" string"""
+    module_path, class_name = path.rsplit(".", 1)
+    return getattr(importlib.import_module(module_path), class_name)
+
+
+@functools.lru_cache(maxsize=None)
+def get_declared_fields(serializer_class):
+    """get the unexpanded fields of a serializer class; shared and read-only"""
+    return serializer_class().fields
+
+
+def get_expandable_fields(serializer_class):
+    """get a dictionary of name: (serializer class, options) of the expandable fields of serializer_class"""
+    meta = getattr(serializer_class, "Meta", None)
+    expandable = getattr(meta, "expandable_fields", None) or getattr(serializer_class, "expandable_fields", {})
+    result = {}
+    for name, value in expandable.items():
+        value = value + ({},) if isinstance(value, tuple) and len(value) == 1 else value
+        child_class, options = value if isinstance(value, tuple) else (value, {})
+        if isinstance(child_class, str):
+            child_class = get_serializer_class(child_class)
+        result[name] = (child_class, options)
+    return result
+
+
+def get_relation_path(model, source):
+    """
+    Follow a dotted serializer source through model relations; return (lookup path, related model, many, rest) where
+    many is True if any step is to-many and rest lists the attributes after the last relation. The path is empty when
+    source starts with no relation.
+    """
+    path = []
+    many = False
+    attrs = source.split(".")
+    for attr in attrs:
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            break
+        if not field.is_relation:
+            break
+        path.append(attr)
+        many = many or field.many_to_many or field.one_to_many
+        model = field.related_model
+    return "__".join(path), model, many, attrs[len(path) :]
+
+
+def get_column(model, attr_list):
+    """get the name of the concrete model field the first of attr_list reads, or None if it reads no single column"""
+    if not attr_list:
+        return None
+    try:
+        field = model._meta.get_field(attr_list[0])
+    except FieldDoesNotExist:
+        return None
+    return field.name if field.concrete and not field.many_to_many else None
+
+
+def should_include(name, sparse_fields, omit_fields, next_omit_fields):
+    """determine if a field is kept by the fields and omit values, as FlexFieldsModelSerializer decides it"""
+    if name in omit_fields and name not in next_omit_fields:
+        return False
+    return has_wildcard(sparse_fields) or not sparse_fields or name in sparse_fields
+
+
+class QueryPlan:
+    """
+    The select_related and prefetch_related lookups needed to serialize a queryset without further queries, and with
+    defer_columns, the only() field names of the columns the serializers read on the queryset model and joined models.
+    """
+
+    def __init__(self, defer_columns=False):
+        self.defer_columns = defer_columns
+        self.select_related = []
+        self.prefetch_related = []
+        self.only = []
+
+    def add_select(self, path):
+        if path not in self.select_related:
+            self.select_related.append(path)
+
+    def add_prefetch(self, lookup):
+        self.prefetch_related.append(lookup)
+
+    def add_columns(self, prefix, model, column_list=None):
+        """add the columns of model, joined at prefix, read by a response; all concrete columns if column_list is None"""
+        if column_list is None:
+            column_list = [i.name for i in model._meta.concrete_fields]
+        for column in [model._meta.pk.name] + column_list:
+            if prefix + column not in self.only:
+                self.only.append(prefix + column)
+
+    def apply(self, queryset):
+        """return queryset with the planned lookups"""
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.defer_columns and self.only:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+
+def build_plan(model, serializer_class, expand=(), fields=(), omit=(), plan=None, prefix=""):
+    """
+    Walk the fields of serializer_class and, recursively, the expandable_fields selected by expand, and collect the
+    relations they read: to-one relations are joined, to-many relations are prefetched with a planned queryset.
+    Relation fields that only read the primary key (such as PrimaryKeyRelatedField) need neither.
+
+    The columns read are collected per model. Where a field's source is no model field (a method or property), every
+    column of that model is kept; models read through __str__ (StringRelatedField) keep every column as well.
+    Prefetched querysets are not column restricted.
+    """
+    plan = plan or QueryPlan()
+    expand_fields, next_expand_fields = split_levels(expand)
+    sparse_fields, next_sparse_fields = split_levels(fields)
+    omit_fields, next_omit_fields = split_levels(omit)
+    expandable = get_expandable_fields(serializer_class)
+    if has_wildcard(expand_fields):
+        expand_fields = list(expandable)
+    expanded = [i for i in expand_fields if i in expandable]
+
+    column_list = []
+    field_map = dict(get_declared_fields(serializer_class))
+    field_map.update({name: None for name in expanded})
+    for name, field in field_map.items():
+        if not should_include(name, sparse_fields, omit_fields, next_omit_fields):
+            continue
+        if name in expanded:
+            child_class, options = expandable[name]
+            path, related_model, many, _ = get_relation_path(model, options.get("source", name))
+            child_options = dict(
+                expand=next_expand_fields.get(name, []),
+                fields=next_sparse_fields.get(name, []),
+                omit=next_omit_fields.get(name, []),
+            )
+        elif isinstance(field, serializers.BaseSerializer):
+            child_class = type(getattr(field, "child", field))
+            path, related_model, many, _ = get_relation_path(model, field.source)
+            child_options = {}
+        else:
+            child_class = None
+            path, related_model, many, rest = get_relation_path(model, getattr(field, "source", name))
+            if not path:
+                column = get_column(model, rest)
+                if column_list is not None:
+                    column_list = column_list + [column] if column else None
+                continue
+            if "__" not in path and isinstance(field, serializers.RelatedField) and field.use_pk_only_optimization():
+                if column_list is not None:
+                    column_list.append(path)
+                continue
+        if many:
+            queryset = related_model._default_manager.all()
+            if child_class:
+                queryset = build_plan(related_model, child_class, **child_options).apply(queryset)
+            plan.add_prefetch(Prefetch(prefix + path, queryset=queryset))
+            continue
+        plan.add_select(prefix + path)
+        if child_class:
+            build_plan(related_model, child_class, **child_options, plan=plan, prefix=f"{prefix}{path}__")
+        else:
+            column = get_column(related_model, rest)
+            plan.add_columns(f"{prefix}{path}__", related_model, [column] if column else None)
+    plan.add_columns(prefix, model, column_list)
+    return plan
+
+
+def plan_queryset(queryset, serializer_class, request):
+    """
+    Apply the select_related / prefetch_related lookups serializer_class needs for request to queryset. Read requests
+    using fields or omit also select only the columns the response reads.
+    """
+    options = get_flex_options(request)
+    defer_columns = (
+        getattr(settings, "STOREMGR_DEFER_COLUMNS", True)
+        and getattr(request, "method", None) in SAFE_METHODS
+        and bool(options["fields"] or options["omit"])
+    )
+    plan = build_plan(queryset.model, serializer_class, plan=QueryPlan(defer_columns), **options)
+    return plan.apply(queryset)
+
+
+class QueryPlanMixin:
+    """
+    Plan the viewset queryset from the serializer and the request's expand, fields and omit parameters, so list and
+    retrieve responses take the same number of queries however many rows or expanded relations they include.
+    """
+
+    def get_queryset(self):
+        return plan_queryset(super().get_queryset(), self.get_serializer_class(), getattr(self, "request", None))
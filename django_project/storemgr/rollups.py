@@ -0,0 +1,168 @@
+""" per-day rollups of created rows used by the annual report views """
+
+import bisect
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# import models
+from storemgr.models import Brand, Customer, DailyRollup, Order, Product
+
+
+ROLLUP_MODELS = [Brand, Customer, Order, Product]
+
+
+def get_day_start(day):
+    """get the aware datetime at the start of a date"""
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def count_created_by_day(model, start=None, end=None):
+    """count rows of model created per day in [start, end); start and end are dates"""
+    queryset = model.objects.all()
+    if start:
+        queryset = queryset.filter(created_at__gte=get_day_start(start))
+    if end:
+        queryset = queryset.filter(created_at__lt=get_day_start(end))
+    return dict(
+        queryset.order_by()
+        .annotate(day=TruncDate("created_at"))
+        .values_list("day")
+        .annotate(qty=Count("pk"))
+        .values_list("day", "qty")
+    )
+
+
+def get_watermark(model):
+    """get the last day rolled up for model, or None if it has never been rolled up"""
+    return DailyRollup.objects.filter(model_name=model._meta.label_lower).aggregate(day=Max("day"))["day"]
+
+
+def update_rollups(model, full=False):
+    """
+    Roll up every complete day since the watermark for model; returns the number of days written.
+
+    Only days before today are written, so a rolled-up day never changes afterwards. Rows deleted after their day
+    was rolled up are still counted until a full rebuild.
+    """
+    label = model._meta.label_lower
+    end = timezone.localdate()
+    watermark = None if full else get_watermark(model)
+    if watermark:
+        start = watermark + datetime.timedelta(days=1)
+    else:
+        start = model.objects.aggregate(first=Min("created_at"))["first"]
+        start = timezone.localtime(start).date() if start else end
+    if start >= end:
+        return 0
+
+    counts = count_created_by_day(model, start, end)
+    rollup_list = [
+        DailyRollup(model_name=label, day=start + datetime.timedelta(days=i), created=0)
+        for i in range((end - start).days)
+    ]
+    for rollup in rollup_list:
+        rollup.created = counts.get(rollup.day, 0)
+    with transaction.atomic():
+        if full:
+            DailyRollup.objects.filter(model_name=label).delete()
+        # a report view may roll up the same days at the same time (see ensure_rollups); they count the same rows
+        DailyRollup.objects.bulk_create(rollup_list, batch_size=1000, ignore_conflicts=True)
+    return len(rollup_list)
+
+
+def ensure_rollups(model_list):
+    """
+    roll up the days the models of model_list are missing before today, so series of them count at most today live
+    instead of every day since an update_rollups run last happened (or the whole table); one query when none are
+    """
+    label_map = {model._meta.label_lower: model for model in model_list}
+    watermark_map = dict(
+        DailyRollup.objects.filter(model_name__in=label_map)
+        .order_by()
+        .values_list("model_name")
+        .annotate(day=Max("day"))
+        .values_list("model_name", "day")
+    )
+    yesterday = timezone.localdate() - datetime.timedelta(days=1)
+    for label, model in label_map.items():
+        if label not in watermark_map or watermark_map[label] < yesterday:
+            update_rollups(model)
+
+
+class RollupSeries:
+    """per-day created counts for one model; rolled-up days plus a live count of the days after the watermark"""
+
+    def __init__(self, base, day_counts):
+        self.base = base
+        self.days = sorted(day_counts)
+        self.totals = []
+        total = 0
+        for day in self.days:
+            total += day_counts[day]
+            self.totals.append(total)
+
+    def _total_through(self, day):
+        """rows created on or before day, excluding the base"""
+        index = bisect.bisect_right(self.days, day)
+        return self.totals[index - 1] if index else 0
+
+    def count(self):
+        """total rows created"""
+        return self.base + (self.totals[-1] if self.totals else 0)
+
+    def count_lte(self, timestamp):
+        """rows created on or before the day of timestamp"""
+        return self.base + self._total_through(timezone.localtime(timestamp).date())
+
+    def count_gte(self, timestamp):
+        """rows created on or after the day of timestamp"""
+        return self.count() - self.count_lte(timestamp - datetime.timedelta(days=1))
+
+    def count_month(self, year, month, since=None):
+        """rows created in a given month, optionally only on or after the day of since"""
+        first = datetime.date(year, month, 1)
+        if since:
+            first = max(first, timezone.localtime(since).date())
+        last = (datetime.date(year, month, 28) + datetime.timedelta(days=4)).replace(day=1) - datetime.timedelta(1)
+        if first > last:
+            return 0
+        return self._total_through(last) - self._total_through(first - datetime.timedelta(days=1))
+
+
+def load_series(model_list, start):
+    """
+    Load a RollupSeries per model holding per-day counts from start (a date) onwards.
+
+    Reads the rollup table in three queries for all models, plus one live count per model for the days after its
+    watermark that have not been rolled up yet; run ensure_rollups first to keep those to today.
+    """
+    label_map = {model._meta.label_lower: model for model in model_list}
+    rollups = DailyRollup.objects.filter(model_name__in=label_map).order_by()
+    watermark_map = dict(rollups.values_list("model_name").annotate(day=Max("day")).values_list("model_name", "day"))
+    base_map = dict(
+        rollups.filter(day__lt=start)
+        .values_list("model_name")
+        .annotate(qty=Sum("created"))
+        .values_list("model_name", "qty")
+    )
+    day_map = {label: {} for label in label_map}
+    for label, day, created in rollups.filter(day__gte=start).values_list("model_name", "day", "created"):
+        day_map[label][day] = created
+
+    series_map = {}
+    for label, model in label_map.items():
+        base = base_map.get(label) or 0
+        watermark = watermark_map.get(label)
+        tail_start = watermark + datetime.timedelta(days=1) if watermark else None
+        for day, qty in count_created_by_day(model, tail_start).items():
+            if watermark and day < start:
+                # rolled up too long ago to reach start; count these days in the base
+                base += qty
+            else:
+                day_map[label][day] = day_map[label].get(day, 0) + qty
+        series_map[model] = RollupSeries(base, day_map[label])
+    return series_map
@@ -0,0 +1,90 @@
+""" compact read-only rows for bulk reads: named tuples built from values_list() in place of model instances """
+
+import functools
+from collections import namedtuple
+
+
+class Row:
+    """
+    Base of the row classes built by get_row_class: a named tuple of the model's pk and the listed fields, with a
+    related row in place of each foreign key followed. str() and get_absolute_url() run the model's own methods
+    against the row, so they work wherever those methods read only fields the row holds.
+    """
+
+    __slots__ = ()
+    model = None
+
+    @property
+    def pk(self):
+        return self[0]
+
+    def __str__(self):
+        return self.model.__str__(self)
+
+    def get_absolute_url(self):
+        return self.model.get_absolute_url(self)
+
+
+@functools.lru_cache(maxsize=None)
+def get_row_class(model, name_list):
+    """get the Row class of model holding the fields in name_list, the first of which is the pk"""
+    base = namedtuple(f"{model.__name__}Row", name_list)
+    return type(base.__name__, (Row, base), {"__slots__": (), "model": model})
+
+
+class RowSpec:
+    """
+    How to build the rows of model holding path_list, lookups such as "name", "customer_id" or "status__name": lookups
+    is the values_list() of the query, and build() turns one of its tuples into a row. A lookup through a foreign key
+    gives the row a related row of the pk and the fields read through it; a related row with no pk is None.
+    """
+
+    def __init__(self, model, path_list):
+        local = [model._meta.pk.name]
+        related = {}
+        for path in path_list:
+            name, _, rest = path.partition("__")
+            if rest:
+                related.setdefault(name, []).append(rest)
+            elif name not in local and name != "pk":
+                local.append(name)
+        self.size = len(local)
+        self.related = {
+            name: RowSpec(model._meta.get_field(name).related_model, tuple(paths)) for name, paths in related.items()
+        }
+        self.lookups = local + [f"{name}__{i}" for name, spec in self.related.items() for i in spec.lookups]
+        self.row_class = get_row_class(model, tuple(local + list(self.related)))
+
+    def build(self, values, start=0):
+        """get the row held in values from position start, and the position after it"""
+        end = start + self.size
+        if values[start] is None:
+            return None, start + len(self.lookups)
+        if not self.related:
+            return self.row_class._make(values[start:end]), end
+        item_list = list(values[start:end])
+        for spec in self.related.values():
+            row, end = spec.build(values, end)
+            item_list.append(row)
+        return self.row_class._make(item_list), end
+
+
+@functools.lru_cache(maxsize=None)
+def get_row_spec(model, path_list):
+    """get the RowSpec of model and a tuple of lookups"""
+    return RowSpec(model, path_list)
+
+
+def get_rows(queryset, path_list):
+    """evaluate queryset as a list of rows holding the pk and the path_list lookups of its model"""
+    spec = get_row_spec(queryset.model, tuple(path_list))
+    build = spec.build
+    return [build(values)[0] for values in queryset.values_list(*spec.lookups)]
+
+
+def iter_rows(queryset, path_list, chunk_size=2000):
+    """iterate queryset as rows holding the pk and the path_list lookups of its model, reading chunk_size at a time"""
+    spec = get_row_spec(queryset.model, tuple(path_list))
+    build = spec.build
+    for values in queryset.values_list(*spec.lookups).iterator(chunk_size=chunk_size):
+        yield build(values)[0]
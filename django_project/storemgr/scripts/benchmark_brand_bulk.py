@@ -0,0 +1,111 @@
+import sys
+import os
+import traceback
+import argparse
+import logging
+import datetime
+import time
+import django
+import environ
+
+
+__version__ = "0.0.1"
+
+__doc__ = """Benchmark creating and updating brands one at a time (a save, with its signals, per brand) against the
+bulk path used by BrandViewSet.bulk_create and bulk_update. Benchmark rows are deleted afterwards."""
+
+
+# setup django
+sys.path.append(str(environ.Path(__file__) - 3))
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+django.setup()
+
+# import models
+from storemgr.models import Brand, Manufacturer
+from storemgr.serializers import BrandBulkSerializer, BrandSerializer
+
+
+def get_opts():
+    """Return an argparse object."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument(
+        "--verbose",
+        default=logging.INFO,
+        action="store_const",
+        const=logging.DEBUG,
+        help="enable debug logging",
+    )
+    parser.add_argument("--version", action="version", version=__version__, help="show version and exit")
+    parser.add_argument("--rows", type=int, default=1000, help="brands created and updated per path")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.verbose)
+    return args
+
+
+def create_one_by_one(item_list):
+    """create brands with a serializer save per brand"""
+    for item in item_list:
+        serializer = BrandBulkSerializer(data=item)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+
+def create_bulk(item_list):
+    """create brands with the bulk serializer"""
+    serializer = BrandBulkSerializer(data=item_list, many=True)
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+
+
+def update_one_by_one(prefix):
+    """rename brands with a partial update per brand, as PATCH /rest/brand/<id>/ does"""
+    for brand in Brand.objects.filter(name__startswith=prefix):
+        serializer = BrandSerializer(brand, data={"name": f"{brand.name}-x"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+
+def update_bulk(prefix):
+    """rename brands with the bulk serializer"""
+    brand_list = list(Brand.objects.filter(name__startswith=prefix))
+    data = [{"name": f"{i.name}-x"} for i in brand_list]
+    serializer = BrandBulkSerializer(brand_list, data=data, many=True, partial=True)
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+
+
+def run_benchmark(opts):
+    """time both paths for creates and updates and log throughput"""
+    manufacturer = Manufacturer.objects.get_or_create(name="benchmark")[0]
+    logging.info(f"{'operation':>10} {'path':>12} {'rows':>7} {'rows/s':>10}")
+    path_list = [("one-by-one", create_one_by_one, update_one_by_one), ("bulk", create_bulk, update_bulk)]
+    for path, create, update in path_list:
+        prefix = f"b{path[0]}{time.time_ns() % 10**9}-"
+        item_list = [{"name": f"{prefix}{i}", "manufacturer": manufacturer.pk} for i in range(opts.rows)]
+        try:
+            for operation, func, arg in [("create", create, item_list), ("update", update, prefix)]:
+                start = time.perf_counter()
+                func(arg)
+                elapsed = time.perf_counter() - start
+                logging.info(f"{operation:>10} {path:>12} {opts.rows:>7} {opts.rows / elapsed:>10.1f}")
+        finally:
+            Brand.objects.filter(name__startswith=prefix).delete()
+
+
+def main():
+    """script entry point"""
+    try:
+        opts = get_opts()
+        start = datetime.datetime.now()
+        run_benchmark(opts)
+        end = datetime.datetime.now()
+        logging.info(f"script completed in: {end - start}")
+    except Exception as err:
+        logging.error(err)
+        traceback.print_exc()
+        return 255
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import sys
+import os
+import traceback
+import argparse
+import logging
+import datetime
+import random
+import time
+import django
+import environ
+
+
+__version__ = "0.0.1"
+
+__doc__ = """Benchmark representative nested filter URLs with to-many relation filters compiled to EXISTS subqueries
+against the JOIN based filters (STOREMGR_EXISTS_FILTERS=False). Each URL is timed for a count and a first page, and
+both paths are checked to return the same rows. Populate the database with generate_test_data.py first; --seed-orders
+bulk inserts synthetic orders and invoices on top of it to reach a large dataset."""
+
+
+# setup django
+sys.path.append(str(environ.Path(__file__) - 3))
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+django.setup()
+
+# import models
+from django.http import QueryDict
+from django.test import override_settings
+from storemgr.filtersets import BrandFilterSet, OrderFilterSet, ProductFilterSet
+from storemgr.models import Brand, Customer, Invoice, Order, OrderStatus, Product
+
+
+BENCHMARKS = [
+    (OrderFilterSet, Order, "has_invoice=true"),
+    (OrderFilterSet, Order, "has_products=false"),
+    (OrderFilterSet, Order, "invoice__product__brand__name={brand}"),
+    (OrderFilterSet, Order, "products__brand__name={brand}&status__name={status}"),
+    (OrderFilterSet, Order, "products__attributes__key=color&has_invoice=true"),
+    (ProductFilterSet, Product, "has_order=true&brand__name={brand}"),
+    (ProductFilterSet, Product, "order__status__name={status}"),
+    (BrandFilterSet, Brand, "product__invoice__order__status__name={status}"),
+]
+
+
+def get_opts():
+    """Return an argparse object."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument(
+        "--verbose",
+        default=logging.INFO,
+        action="store_const",
+        const=logging.DEBUG,
+        help="enable debug logging",
+    )
+    parser.add_argument("--version", action="version", version=__version__, help="show version and exit")
+    parser.add_argument("--seed-orders", type=int, default=0, help="bulk insert this many orders before running")
+    parser.add_argument("--page-size", type=int, default=100, help="rows read for the first page")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per url and path; the fastest is reported")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.verbose)
+    return args
+
+
+def seed_orders(qty, batch_size=10000):
+    """bulk insert qty orders of 1 to 4 invoices each, using existing customers, statuses and products"""
+    customer_list = list(Customer.objects.values_list("pk", flat=True))
+    status_list = list(OrderStatus.objects.values_list("pk", flat=True))
+    product_list = list(Product.objects.values_list("pk", flat=True))
+    if not (customer_list and status_list and product_list):
+        raise ValueError("no customers, order statuses or products; run generate_test_data.py first")
+    prefix = f"OR-B{time.time_ns() % 10**6}-"
+    for start in range(0, qty, batch_size):
+        order_list = [
+            Order(
+                order_id=f"{prefix}{i}", customer_id=random.choice(customer_list), status_id=random.choice(status_list)
+            )
+            for i in range(start, min(start + batch_size, qty))
+        ]
+        Order.objects.bulk_create(order_list)
+        Invoice.objects.bulk_create(
+            [
+                Invoice(order_id=order.order_id, product_id=product)
+                for order in order_list
+                for product in random.sample(product_list, random.randint(1, min(4, len(product_list))))
+            ]
+        )
+        logging.info(f"seeded {min(start + batch_size, qty)} of {qty} orders")
+
+
+def time_query(filterset_class, model, query, page_size, repeat):
+    """filter model with query repeat times; return (fastest elapsed seconds, count, pks of the first page)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        queryset = filterset_class(QueryDict(query), queryset=model.objects.all()).qs
+        count = queryset.count()
+        page = list(queryset.values_list("pk", flat=True)[:page_size])
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count, page
+
+
+def run_benchmark(opts):
+    """time each url with EXISTS and JOIN based filters and log the results"""
+    if opts.seed_orders:
+        seed_orders(opts.seed_orders)
+    brand = Brand.objects.values_list("name", flat=True).first()
+    status = OrderStatus.objects.values_list("name", flat=True).first()
+    logging.info(f"orders: {Order.objects.count()}, invoices: {Invoice.objects.count()}")
+    logging.info(f"{'url':<62} {'rows':>8} {'join ms':>9} {'exists ms':>10} {'speedup':>8} {'match':>6}")
+    for filterset_class, model, query in BENCHMARKS:
+        query = query.format(brand=brand, status=status)
+        exists_elapsed, exists_count, exists_page = time_query(
+            filterset_class, model, query, opts.page_size, opts.repeat
+        )
+        with override_settings(STOREMGR_EXISTS_FILTERS=False):
+            join_elapsed, join_count, join_page = time_query(filterset_class, model, query, opts.page_size, opts.repeat)
+        # the JOIN based filters may repeat a row once per related match; EXISTS returns each row once
+        join_page = list(dict.fromkeys(join_page))
+        match = exists_page[: len(join_page)] == join_page
+        url = f"/rest/{model._meta.model_name}/?{query}"
+        logging.info(
+            f"{url[:62]:<62} {exists_count:>8} {join_elapsed * 1000:>9.1f} {exists_elapsed * 1000:>10.1f} "
+            f"{join_elapsed / exists_elapsed:>7.1f}x {str(match):>6}"
+        )
+        if join_count != exists_count:
+            logging.info(f"{'':<62} JOIN based count with duplicates: {join_count}")
+
+
+def main():
+    """script entry point"""
+    try:
+        opts = get_opts()
+        start = datetime.datetime.now()
+        run_benchmark(opts)
+        end = datetime.datetime.now()
+        logging.info(f"script completed in: {end - start}")
+    except Exception as err:
+        logging.error(err)
+        traceback.print_exc()
+        return 255
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import sys
+import os
+import traceback
+import argparse
+import logging
+import datetime
+import time
+import multiprocessing
+import django
+import environ
+
+
+__version__ = "0.0.1"
+
+__doc__ = """Benchmark Order inserts from several processes at once, reporting throughput as the table grows.
+
+Use --legacy to compare against the previous count()-based primary key generation."""
+
+
+# setup django
+sys.path.append(str(environ.Path(__file__) - 3))
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+django.setup()
+
+# import models
+from django.db import IntegrityError, connections
+from storemgr import sequences
+from storemgr.models import Customer, Order, OrderStatus
+
+
+class CountIdAllocator(sequences.BaseIdAllocator):
+    """the previous id generation: count() + 1, evaluated twice per insert"""
+
+    def allocate(self, model, prefix, using="default"):
+        if model.objects.count() < 1:
+            return 1
+        return model.objects.count() + 1
+
+
+def get_opts():
+    """Return an argparse object."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument(
+        "--verbose",
+        default=logging.INFO,
+        action="store_const",
+        const=logging.DEBUG,
+        help="enable debug logging",
+    )
+    parser.add_argument("--version", action="version", version=__version__, help="show version and exit")
+    parser.add_argument("--workers", type=int, default=4, help="number of inserting processes")
+    parser.add_argument("--inserts", type=int, default=500, help="orders inserted per worker per round")
+    parser.add_argument("--rounds", type=int, default=5, help="number of rounds to run")
+    parser.add_argument("--legacy", action="store_true", help="use count()-based id generation")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.verbose)
+    return args
+
+
+def insert_orders(qty, legacy, status_pk, customer_pk):
+    """worker entry point; insert qty orders and return the number of key collisions"""
+    if legacy:
+        sequences._allocator = CountIdAllocator()
+    collisions = 0
+    for _ in range(qty):
+        try:
+            Order.objects.create(status_id=status_pk, customer_id=customer_pk)
+        except IntegrityError:
+            collisions += 1
+    connections.close_all()
+    return collisions
+
+
+def run_benchmark(opts):
+    """run insert rounds and log throughput per round"""
+    status = OrderStatus.objects.get_or_create(name="benchmark")[0]
+    customer = Customer.objects.filter().first() or Customer.objects.create(first_name="bench", last_name="mark")
+    connections.close_all()
+
+    logging.info(f"{'round':>5} {'rows before':>12} {'inserts/s':>10} {'collisions':>10}")
+    for i in range(opts.rounds):
+        rows_before = Order.objects.count()
+        connections.close_all()
+        args = [(opts.inserts, opts.legacy, status.pk, customer.pk)] * opts.workers
+        start = time.perf_counter()
+        with multiprocessing.Pool(opts.workers) as pool:
+            collisions = sum(pool.starmap(insert_orders, args))
+        elapsed = time.perf_counter() - start
+        inserted = opts.inserts * opts.workers - collisions
+        logging.info(f"{i + 1:>5} {rows_before:>12} {inserted / elapsed:>10.1f} {collisions:>10}")
+
+
+def main():
+    """script entry point"""
+    try:
+        opts = get_opts()
+        start = datetime.datetime.now()
+        run_benchmark(opts)
+        end = datetime.datetime.now()
+        logging.info(f"script completed in: {end - start}")
+    except Exception as err:
+        logging.error(err)
+        traceback.print_exc()
+        return 255
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import sys
+import os
+import traceback
+import argparse
+import logging
+import datetime
+import time
+import tracemalloc
+import django
+import environ
+
+
+__version__ = "0.0.1"
+
+__doc__ = """Benchmark the whole-table read of the search index rebuild: model instances loaded with only(), as the
+rebuild did, against the compact rows of storemgr.rows it reads now. Reports time and peak traced memory per batch of
+rows and checks both give the same search documents."""
+
+
+# setup django
+sys.path.append(str(environ.Path(__file__) - 3))
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+django.setup()
+
+# import models
+from storemgr.rows import iter_rows
+from storemgr.search import SEARCH_FIELDS, get_body
+
+
+def get_opts():
+    """Return an argparse object."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument(
+        "--verbose",
+        default=logging.INFO,
+        action="store_const",
+        const=logging.DEBUG,
+        help="enable debug logging",
+    )
+    parser.add_argument("--version", action="version", version=__version__, help="show version and exit")
+    parser.add_argument("--rows", type=int, default=100000, help="rows to read per model")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per path; the fastest is reported")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.verbose)
+    return args
+
+
+def measure(func, repeat):
+    """run func repeat times and return (fastest elapsed seconds, peak traced bytes, last result)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        del result
+    tracemalloc.start()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def run_benchmark(opts):
+    """read a batch of rows of each indexed model through both paths and log time and memory"""
+    logging.info(
+        f"{'model':>12} {'rows':>7} {'instance s':>11} {'row s':>7} {'instance MB':>12} {'row MB':>7} {'match':>6}"
+    )
+    for model, field_list in SEARCH_FIELDS.items():
+        queryset = model.objects.order_by()[: opts.rows]
+
+        def read_instances():
+            return list(queryset.only("pk", *field_list).iterator(chunk_size=2000))
+
+        def read_rows():
+            return list(iter_rows(queryset, field_list))
+
+        instance_elapsed, instance_peak, instance_list = measure(read_instances, opts.repeat)
+        row_elapsed, row_peak, row_list = measure(read_rows, opts.repeat)
+        match = [(i.pk, get_body(i, field_list)) for i in instance_list] == [
+            (i.pk, get_body(i, field_list)) for i in row_list
+        ]
+        logging.info(
+            f"{model.__name__:>12} {len(row_list):>7} {instance_elapsed:>11.2f} {row_elapsed:>7.2f} "
+            f"{instance_peak / 2**20:>12.1f} {row_peak / 2**20:>7.1f} {str(match):>6}"
+        )
+
+
+def main():
+    """script entry point"""
+    try:
+        opts = get_opts()
+        start = datetime.datetime.now()
+        run_benchmark(opts)
+        end = datetime.datetime.now()
+        logging.info(f"script completed in: {end - start}")
+    except Exception as err:
+        logging.error(err)
+        traceback.print_exc()
+        return 255
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import sys
+import os
+import traceback
+import argparse
+import logging
+import datetime
+import time
+import django
+import environ
+
+
+__version__ = "0.0.1"
+
+__doc__ = """Benchmark list serialization of orders, invoices and products, comparing the model serializers with the
+values_list() serializers used by the REST list endpoints. Reports rows/s per page size and checks the rendered JSON
+of both paths is identical."""
+
+
+# setup django
+sys.path.append(str(environ.Path(__file__) - 3))
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+django.setup()
+
+# import models
+from rest_framework.renderers import JSONRenderer
+from storemgr.models import Invoice, Order, Product
+from storemgr.serializers import (
+    InvoiceSerializer,
+    InvoiceValuesSerializer,
+    OrderSerializer,
+    OrderValuesSerializer,
+    ProductSerializer,
+    ProductValuesSerializer,
+)
+
+
+BENCHMARKS = [
+    (Invoice.objects.select_related("order", "product"), InvoiceSerializer, InvoiceValuesSerializer),
+    (Order.objects.select_related("customer", "status"), OrderSerializer, OrderValuesSerializer),
+    (Product.objects.select_related("brand"), ProductSerializer, ProductValuesSerializer),
+]
+
+
+def get_opts():
+    """Return an argparse object."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument(
+        "--verbose",
+        default=logging.INFO,
+        action="store_const",
+        const=logging.DEBUG,
+        help="enable debug logging",
+    )
+    parser.add_argument("--version", action="version", version=__version__, help="show version and exit")
+    parser.add_argument(
+        "--page-sizes", type=int, nargs="+", default=[100, 1000, 10000], help="page sizes to serialize"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="runs per page size; the fastest is reported")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.verbose)
+    return args
+
+
+def time_page(func, repeat):
+    """run func repeat times and return (fastest elapsed seconds, last rendered output)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+
+def run_benchmark(opts):
+    """serialize pages of each model through both paths and log throughput"""
+    renderer = JSONRenderer()
+    logging.info(f"{'model':>10} {'rows':>7} {'model rows/s':>13} {'values rows/s':>14} {'speedup':>8} {'match':>6}")
+    for queryset, serializer_class, values_serializer_class in BENCHMARKS:
+        for page_size in opts.page_sizes:
+            page = queryset.order_by("-created_at")[:page_size]
+            rows = len(page)
+            if not rows:
+                continue
+
+            def serialize_models():
+                return renderer.render(serializer_class(list(page), many=True).data)
+
+            def serialize_values():
+                values_serializer = values_serializer_class()
+                values_page = values_serializer.get_queryset(page.model.objects.order_by("-created_at"))[:page_size]
+                return renderer.render(values_serializer.to_representation(list(values_page)))
+
+            model_elapsed, model_output = time_page(serialize_models, opts.repeat)
+            values_elapsed, values_output = time_page(serialize_values, opts.repeat)
+            logging.info(
+                f"{page.model.__name__:>10} {rows:>7} {rows / model_elapsed:>13.0f} {rows / values_elapsed:>14.0f} "
+                f"{model_elapsed / values_elapsed:>7.1f}x {str(model_output == values_output):>6}"
+            )
+
+
+def main():
+    """script entry point"""
+    try:
+        opts = get_opts()
+        start = datetime.datetime.now()
+        run_benchmark(opts)
+        end = datetime.datetime.now()
+        logging.info(f"script completed in: {end - start}")
+    except Exception as err:
+        logging.error(err)
+        traceback.print_exc()
+        return 255
+
+
+if __name__ == "__main__":
+    sys.exit(main())
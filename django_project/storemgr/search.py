@@ -0,0 +1,277 @@
+""" full-text search over products, customers and orders: SQLite FTS5 by default, a tsvector on PostgreSQL """
+
+import re
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+# import models
+from storemgr.models import Brand, Customer, Manufacturer, Order, Product, SearchDocument
+
+from storemgr.rows import iter_rows
+
+
+# fields indexed per model, in the order global search results are grouped
+SEARCH_FIELDS = {
+    Brand: ["name"],
+    Manufacturer: ["name"],
+    Product: ["sku", "description"],
+    Customer: ["customer_id", "first_name", "last_name", "email"],
+    Order: ["order_id"],
+}
+
+
+def get_body(instance, field_list):
+    """get the indexed text of a row"""
+    return " ".join(str(value) for value in (getattr(instance, i) for i in field_list) if value)
+
+
+def index_objects(model, instance_list):
+    """
+    add or refresh the search documents of instance_list, rows of model; documents whose text is unchanged are left
+    alone, so saving a row without changing its indexed fields writes nothing to the full-text index
+    """
+    if not instance_list:
+        return
+    label = model._meta.label_lower
+    body_map = {str(i.pk): get_body(i, SEARCH_FIELDS[model]) for i in instance_list}
+    with transaction.atomic(savepoint=False):
+        changed = []
+        queryset = SearchDocument.objects.filter(model_label=label, object_pk__in=body_map)
+        for document in queryset.only("pk", "object_pk", "body"):
+            body = body_map.pop(document.object_pk)
+            if document.body != body:
+                document.body = body
+                changed.append(document)
+        SearchDocument.objects.bulk_update(changed, ["body"])
+        SearchDocument.objects.bulk_create(
+            [SearchDocument(model_label=label, object_pk=object_pk, body=body) for object_pk, body in body_map.items()]
+        )
+
+
+def unindex_objects(model, pk_list):
+    """remove the search documents of the rows of model in pk_list"""
+    SearchDocument.objects.filter(model_label=model._meta.label_lower, object_pk__in=[str(i) for i in pk_list]).delete()
+
+
+def rebuild_index(chunk_size=2000):
+    """rebuild the search documents of every indexed model; returns a dictionary of model label: rows indexed"""
+    result = {}
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        for model, field_list in SEARCH_FIELDS.items():
+            result[model._meta.label_lower] = 0
+            # compact rows rather than instances: index_objects reads only the pk and the indexed fields
+            row_list = []
+            for row in iter_rows(model.objects.order_by(), field_list, chunk_size):
+                row_list.append(row)
+                if len(row_list) >= chunk_size:
+                    index_objects(model, row_list)
+                    result[model._meta.label_lower] += len(row_list)
+                    row_list = []
+            index_objects(model, row_list)
+            result[model._meta.label_lower] += len(row_list)
+    return result
+
+
+def get_terms(text):
+    """split search text into terms, each a list of lowercase word tokens; "OR-0012" is the term ["or", "0012"]"""
+    return [tokens for tokens in (re.findall(r"\w+", i.lower()) for i in text.split()) if tokens]
+
+
+def get_fts_query(vendor, terms, label, prefix=True):
+    """
+    Get the full-text query string matching the documents of label that match every term, or None if vendor has no
+    full-text index. Each term matches as a phrase whose last token is a prefix, so "OR-00" finds "OR-000123" and
+    "smi" finds "Smith"; with prefix=False, terms match whole words only.
+    """
+    star = "*" if prefix else ""
+    if vendor == "sqlite":
+        # the label is an indexed column too, so FTS5 reads only the label's matches
+        phrases = " ".join('"{}"{}'.format(" ".join(tokens), star) for tokens in terms)
+        return '{{model_label}} : "{}" AND {{body}} : ({})'.format(label.replace(".", " "), phrases)
+    if vendor == "postgresql":
+        star = ":*" if prefix else ""
+        return " & ".join(" <-> ".join(tokens) + star for tokens in terms)
+    return None
+
+
+def get_match_sql(vendor, label, terms, pk_type):
+    """
+    Get (sql, params) of a subquery selecting the object_pk of documents of label matching every term, cast to the
+    database type pk_type of the model's pk so it compares with the pk column.
+    """
+    query = get_fts_query(vendor, terms, label)
+    if query is None:
+        return None
+    if vendor == "sqlite":
+        # CROSS JOIN keeps the MATCH as the outer loop; SQLite would otherwise scan documents and MATCH per row
+        sql = (
+            f"SELECT CAST(d.object_pk AS {pk_type}) FROM storemgr_searchdocument_fts CROSS JOIN storemgr_searchdocument d "
+            "ON d.id = storemgr_searchdocument_fts.rowid "
+            "WHERE storemgr_searchdocument_fts MATCH %s"
+        )
+        return sql, (query,)
+    sql = (
+        f"SELECT CAST(object_pk AS {pk_type}) FROM storemgr_searchdocument "
+        "WHERE search_vector @@ to_tsquery('simple', %s) AND model_label = %s"
+    )
+    return sql, (query, label)
+
+
+def get_ranked_sql(vendor, label_list, terms, limit, offset, window):
+    """
+    Get (sql, params) of a query selecting (model_label, object_pk, body, truncated) of the documents of label_list
+    matching every term, best match first within each label, at positions offset + 1 to offset + limit of each label;
+    or None if vendor has no full-text index.
+
+    The candidates of a label are its whole-word matches and its first window prefix matches in index order, so broad
+    terms matching most of a table cost at most window rows per label; truncated is set on the rows of a label whose
+    prefix matches filled the window, and which may have matches the ranked positions never reach. Whole-word matches rank first, then shorter
+    documents, which the terms cover more of. bm25 / ts_rank are not used: they read every match of every term to
+    weigh the terms, which is the cost the window avoids, and they order documents of one query by the same measures.
+    """
+    if vendor not in ("sqlite", "postgresql"):
+        return None
+    candidate_list = []
+    params = []
+    if vendor == "sqlite":
+        for label in label_list:
+            for prefix in (False, True):
+                candidate_list.append(
+                    f"SELECT * FROM (SELECT rowid, {int(prefix)} AS prefix FROM storemgr_searchdocument_fts "
+                    "WHERE storemgr_searchdocument_fts MATCH %s LIMIT %s)"
+                )
+                params += [get_fts_query(vendor, terms, label, prefix), window]
+        candidates = (
+            "SELECT rowid AS id, MIN(prefix) AS prefix, MAX(prefix) AS in_prefix "
+            f"FROM ({' UNION ALL '.join(candidate_list)}) GROUP BY rowid"
+        )
+    else:
+        for label in label_list:
+            for prefix in (False, True):
+                candidate_list.append(
+                    f"(SELECT id, {int(prefix)} AS prefix FROM storemgr_searchdocument "
+                    "WHERE model_label = %s AND search_vector @@ to_tsquery('simple', %s) LIMIT %s)"
+                )
+                params += [label, get_fts_query(vendor, terms, label, prefix), window]
+        candidates = (
+            "SELECT id, MIN(prefix) AS prefix, MAX(prefix) AS in_prefix "
+            f"FROM ({' UNION ALL '.join(candidate_list)}) matches GROUP BY id"
+        )
+    # CROSS JOIN (a plain JOIN on PostgreSQL) reads the documents of the candidates only
+    join = "CROSS JOIN" if vendor == "sqlite" else "JOIN"
+    sql = (
+        "SELECT model_label, object_pk, body, prefix_count >= %s AS truncated FROM ("
+        "SELECT d.model_label, d.object_pk, d.body, ROW_NUMBER() OVER ("
+        "PARTITION BY d.model_label ORDER BY candidates.prefix, LENGTH(d.body), d.id) AS position, "
+        "SUM(candidates.in_prefix) OVER (PARTITION BY d.model_label) AS prefix_count "
+        f"FROM ({candidates}) candidates {join} storemgr_searchdocument d ON d.id = candidates.id"
+        ") ranked WHERE position > %s AND position <= %s ORDER BY model_label, position"
+    )
+    return sql, (window, *params, offset, offset + limit)
+
+
+def get_ranked_rows(label_list, text, limit, offset, using="default"):
+    """
+    get (model_label, object_pk, body, truncated) rows of the documents of label_list matching text, best match first;
+    see get_ranked_sql
+    """
+    terms = get_terms(text)
+    connection = connections[using]
+    window = getattr(settings, "STOREMGR_SEARCH_RANK_WINDOW", 500)
+    ranked = get_ranked_sql(connection.vendor, label_list, terms, limit, offset, window)
+    if ranked:
+        with connection.cursor() as cursor:
+            cursor.execute(*ranked)
+            return cursor.fetchall()
+    row_list = []
+    for label in label_list:
+        documents = SearchDocument.objects.using(using).filter(model_label=label)
+        for word in text.split():
+            documents = documents.filter(body__icontains=word)
+        documents = documents.order_by("id").values_list("model_label", "object_pk", "body")[offset : offset + limit]
+        row_list += [(*row, False) for row in documents]
+    return row_list
+
+
+def global_search(text, model_list=None, limit=10, offset=0):
+    """
+    Search the documents of every model in model_list (default: all indexed models) in one query, and return a list
+    of result groups, one per model with matches, in SEARCH_FIELDS order. Each group holds up to limit hits, best
+    match first, starting at offset, and has_more tells whether a further batch exists. Batches stop at the
+    STOREMGR_SEARCH_RANK_WINDOW ranked candidates; truncated tells that the type has matches past them, which a more
+    specific text finds. Hits are built from the search documents alone, so no model
+    table is read.
+    """
+    model_list = [i for i in SEARCH_FIELDS if i in (model_list or SEARCH_FIELDS)]
+    if not get_terms(text or "") or not model_list:
+        return []
+    model_map = {i._meta.label_lower: i for i in model_list}
+    hit_map = {label: [] for label in model_map}
+    truncated_set = set()
+    for label, object_pk, body, truncated in get_ranked_rows(list(model_map), text, limit + 1, offset):
+        hit_map[label].append(dict(pk=object_pk, text=body, url=model_map[label](pk=object_pk).get_absolute_url()))
+        if truncated:
+            truncated_set.add(label)
+    return [
+        dict(
+            type=model._meta.model_name,
+            title=model._meta.verbose_name_plural.title(),
+            icon=model.get_icon(),
+            results=hit_map[label][:limit],
+            has_more=len(hit_map[label]) > limit,
+            truncated=label in truncated_set,
+        )
+        for label, model in model_map.items()
+        if hit_map[label]
+    ]
+
+
+def search(queryset, text):
+    """
+    Filter queryset to the rows whose search document matches text. Backends without a full-text index fall back
+    to a case-insensitive substring match on the search documents. Blank text leaves queryset unfiltered.
+    """
+    terms = get_terms(text or "")
+    if not terms:
+        return queryset
+    label = queryset.model._meta.label_lower
+    pk_field = queryset.model._meta.pk
+    connection = connections[queryset.db]
+    match = get_match_sql(connection.vendor, label, terms, pk_field.cast_db_type(connection))
+    if match:
+        return queryset.filter(pk__in=RawSQL(*match))
+    documents = SearchDocument.objects.filter(model_label=label)
+    for word in text.split():
+        documents = documents.filter(body__icontains=word)
+    # object_pk is text; compare it as the pk's own type
+    return queryset.filter(pk__in=documents.values(object_id=Cast("object_pk", output_field=pk_field)))
+
+
+def get_search_options(query_params):
+    """
+    Read the global search parameters: q (the search text), type (comma separated model names; default all), limit
+    (hits per type) and offset (hits per type to skip). Raises ValueError with a message for invalid values.
+    """
+    model_map = {i._meta.model_name: i for i in SEARCH_FIELDS}
+    type_list = [i for i in query_params.get("type", "").split(",") if i]
+    unknown = [i for i in type_list if i not in model_map]
+    if unknown:
+        raise ValueError(f"Unknown search type: {', '.join(unknown)}; choose from {', '.join(model_map)}")
+    max_limit = getattr(settings, "STOREMGR_SEARCH_MAX_BATCH_SIZE", 100)
+    try:
+        limit = int(query_params.get("limit", getattr(settings, "STOREMGR_SEARCH_BATCH_SIZE", 10)))
+        offset = int(query_params.get("offset", 0))
+    except ValueError:
+        raise ValueError("limit and offset must be integers") from None
+    if not 0 < limit <= max_limit or offset < 0:
+        raise ValueError(f"limit must be between 1 and {max_limit}, and offset may not be negative")
+    return dict(
+        text=query_params.get("q", ""),
+        model_list=[model_map[i] for i in type_list],
+        limit=limit,
+        offset=offset,
+    )
@@ -0,0 +1,159 @@
+""" primary key allocation for models using prefixed, zero-padded string keys (OR-00000001, SKU-00000001, etc.) """
+
+import os
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.db.models.functions import Length
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+ID_WIDTH = 8
+
+
+class BaseIdAllocator:
+    """base class for id allocators; subclasses must implement reserve()"""
+
+    def reserve(self, model, prefix, count=1, using="default"):
+        """reserve `count` consecutive ids for model and return the first one"""
+        raise NotImplementedError
+
+    def allocate(self, model, prefix, using="default"):
+        """return the next numeric id for model"""
+        return self.reserve(model, prefix, using=using)
+
+    @staticmethod
+    def get_max_id(model, prefix, using="default"):
+        """get the highest numeric id currently stored for model; used to seed a new sequence"""
+        pk_name = model._meta.pk.attname
+        # ids past the padding width are longer strings; order by length first so they sort numerically
+        last = (
+            model._base_manager.using(using)
+            .filter(**{f"{pk_name}__startswith": prefix})
+            .order_by(Length(pk_name).desc(), f"-{pk_name}")
+            .values_list(pk_name, flat=True)
+            .first()
+        )
+        try:
+            return int(last[len(prefix) :])
+        except (TypeError, ValueError):
+            return 0
+
+
+def reserve_values(name, count=1, get_seed=None, using="default"):
+    """
+    reserve count consecutive values of the IdSequence named name and return the first one; one UPDATE per
+    reservation, safe across processes. A new sequence starts after get_seed(), or after 0.
+    """
+    from storemgr.models import IdSequence  # pylint: disable=import-outside-toplevel
+
+    with transaction.atomic(using=using):
+        # the UPDATE takes the row (or database) write lock before the value is read back
+        updated = (
+            IdSequence.objects.using(using)
+            .filter(name=name)
+            .update(last_value=F("last_value") + count, updated_at=timezone.now())
+        )
+        if not updated:
+            try:
+                with transaction.atomic(using=using):
+                    IdSequence.objects.using(using).create(
+                        name=name, last_value=(get_seed() if get_seed else 0) + count
+                    )
+            except IntegrityError:
+                # another worker seeded the sequence first; take the next range from it
+                IdSequence.objects.using(using).filter(name=name).update(
+                    last_value=F("last_value") + count, updated_at=timezone.now()
+                )
+        last_value = IdSequence.objects.using(using).filter(name=name).values_list("last_value", flat=True).get()
+    return last_value - count + 1
+
+
+class SequenceIdAllocator(BaseIdAllocator):
+    """reserve ids from the IdSequence table; one UPDATE per reservation, safe across processes"""
+
+    def reserve(self, model, prefix, count=1, using="default"):
+        return reserve_values(
+            model._meta.label_lower, count, lambda: self.get_max_id(model, prefix, using), using=using
+        )
+
+
+class BlockIdAllocator(SequenceIdAllocator):
+    """reserve ids from the IdSequence table in blocks and hand them out from a per-process cache
+
+    Inserts only touch the sequence table once every `block_size` ids. Ids stay unique across processes, but are
+    not gap-free: ids left in a block when a worker exits are never used.
+
+    Blocks are only reserved outside of transactions, so every cached block is reserved for good. A transaction that
+    runs out of ids takes each further id alone, within the transaction, and the block is refilled once it commits:
+    a block reserved inside it would go back to the sequence if it rolled back, for another process to reserve again.
+    """
+
+    def __init__(self, block_size=None):
+        self.block_size = block_size or getattr(settings, "STOREMGR_ID_BLOCK_SIZE", 50)
+        self._blocks = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def allocate(self, model, prefix, using="default"):
+        key = (using, model._meta.label_lower)
+        with self._lock:
+            if self._pid != os.getpid():
+                # forked worker; blocks inherited from the parent process are not ours to use
+                self._blocks.clear()
+                self._pid = os.getpid()
+            next_value, last_value = self._blocks.get(key, (1, 0))
+            if next_value > last_value:
+                if connections[using].in_atomic_block:
+                    transaction.on_commit(lambda: self.refill(model, prefix, using), using=using)
+                    return self.reserve(model, prefix, using=using)
+                next_value = self.reserve(model, prefix, count=self.block_size, using=using)
+                last_value = next_value + self.block_size - 1
+            self._blocks[key] = (next_value + 1, last_value)
+        return next_value
+
+    def refill(self, model, prefix, using="default"):
+        """reserve a new block of ids for model, unless the cached one still has ids left"""
+        key = (using, model._meta.label_lower)
+        with self._lock:
+            next_value, last_value = self._blocks.get(key, (1, 0))
+            if next_value > last_value:
+                next_value = self.reserve(model, prefix, count=self.block_size, using=using)
+                self._blocks[key] = (next_value, next_value + self.block_size - 1)
+
+    def reset(self):
+        """drop all cached blocks"""
+        with self._lock:
+            self._blocks.clear()
+
+
+_allocator = None
+
+
+def get_allocator():
+    """get the id allocator configured by STOREMGR_ID_ALLOCATOR"""
+    global _allocator  # pylint: disable=global-statement
+    if _allocator is None:
+        _allocator = import_string(getattr(settings, "STOREMGR_ID_ALLOCATOR", "storemgr.sequences.BlockIdAllocator"))()
+    return _allocator
+
+
+def format_id(prefix, value):
+    """format a numeric id as a prefixed, zero-padded primary key"""
+    return prefix + str(value).zfill(ID_WIDTH)
+
+
+def next_id(model, prefix, using="default"):
+    """get the next formatted primary key for model"""
+    return format_id(prefix, get_allocator().allocate(model, prefix, using=using))
+
+
+def next_ids(model, prefix, count, using="default"):
+    """reserve count consecutive formatted primary keys for model in one round trip"""
+    if count < 1:
+        return []
+    first = get_allocator().reserve(model, prefix, count=count, using=using)
+    return [format_id(prefix, value) for value in range(first, first + count)]
@@ -1,11 +1,17 @@
 """ DRF serailizers for applicable app models """
 
-from rest_framework import serializers
+import copy
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 from rest_flex_fields import FlexFieldsModelSerializer
 
 
 # import models
-from storemgr.models import Brand, Customer, Invoice, Order, OrderStatus, Product, ProductAttribute
+from storemgr.models import Brand, Customer, Invoice, Manufacturer, Order, OrderStatus, Product, ProductAttribute
+
+# import services
+from storemgr.services import bulk_create_brands, bulk_update_brands
 
 
 class BrandSerializer(FlexFieldsModelSerializer):
@@ -24,6 +30,95 @@ class BrandSerializer(FlexFieldsModelSerializer):
         ]
 
 
+class BrandListSerializer(serializers.ListSerializer):
+    """
+    Validate and write a list of brands in bulk. Name uniqueness and manufacturer checks take one query each for the
+    whole list; rows are written with bulk_create/bulk_update, with their audit entries, in one transaction.
+    """
+
+    def to_internal_value(self, data):
+        errors = None
+        try:
+            validated = super().to_internal_value(data)
+        except serializers.ValidationError as err:
+            if not isinstance(err.detail, list):
+                raise
+            errors = [dict(i) for i in err.detail]
+        if errors is None:
+            errors = [{} for _ in data]
+        self.check_names(data, errors)
+        self.check_manufacturers(data, errors)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return validated
+
+    def get_values(self, data, field_name):
+        """get the value of field_name in each item of data as the child field coerces it; None if missing or invalid"""
+        field = self.child.fields[field_name]
+        value_list = []
+        for item in data:
+            try:
+                value_list.append(field.to_internal_value(item[field_name]))
+            except (KeyError, TypeError, serializers.ValidationError):
+                value_list.append(None)
+        return value_list
+
+    def check_names(self, data, errors):
+        """flag names used twice in data or already used by another brand"""
+        instance_list = self.instance or [None] * len(data)
+        names = self.get_values(data, "name")
+        owner_map = dict(
+            Brand.objects.filter(name__in=[i for i in names if i is not None]).order_by().values_list("name", "pk")
+        )
+        seen = set()
+        for index, (name, instance) in enumerate(zip(names, instance_list)):
+            if name is None:
+                continue
+            if name in seen or owner_map.get(name, getattr(instance, "pk", None)) != getattr(instance, "pk", None):
+                errors[index].setdefault("name", ["brand with this name already exists."])
+            seen.add(name)
+
+    def check_manufacturers(self, data, errors):
+        """flag manufacturers that do not exist"""
+        ids = self.get_values(data, "manufacturer")
+        found = set(Manufacturer.objects.filter(pk__in=[i for i in ids if i is not None]).values_list("pk", flat=True))
+        for index, manufacturer_id in enumerate(ids):
+            if manufacturer_id is not None and manufacturer_id not in found:
+                errors[index].setdefault("manufacturer", [f"unknown manufacturer: {manufacturer_id}"])
+
+    def get_actor(self):
+        """get the user to record in the audit entries"""
+        request = self.context.get("request")
+        user = getattr(request, "user", None)
+        return user if user and user.is_authenticated else None
+
+    def create(self, validated_data):
+        return bulk_create_brands([Brand(**item) for item in validated_data], self.get_actor())
+
+    def update(self, instance, validated_data):
+        pair_list = []
+        field_set = set()
+        for brand, item in zip(instance, validated_data):
+            pair_list.append((copy.copy(brand), brand))
+            for attr, value in item.items():
+                setattr(brand, attr, value)
+                field_set.add(attr)
+        return bulk_update_brands(pair_list, field_set, self.get_actor())
+
+
+class BrandBulkSerializer(BrandSerializer):
+    """serializer class for bulk Brand writes; use with many=True only, as name uniqueness is checked by the list"""
+
+    manufacturer = serializers.IntegerField(source="manufacturer_id")
+
+    class Meta(BrandSerializer.Meta):
+        """Metaclass to define filterset model and fields"""
+
+        fields = BrandSerializer.Meta.fields + ["manufacturer"]
+        extra_kwargs = {"name": {"validators": []}}
+        list_serializer_class = BrandListSerializer
+
+
 class CustomerSerializer(FlexFieldsModelSerializer):
     """serializer class for Customer"""
 
@@ -141,3 +236,92 @@ class ProductAttributeSerializer(FlexFieldsModelSerializer):
             "updated_at",
             "value",
         ]
+
+
+class ValuesSerializer:
+    """
+    Serialize values_list() rows to the same output as serializer_class, without building model instances.
+
+    Fields are taken from serializer_class.Meta.fields; lookups maps a field (such as a StringRelatedField) to the
+    column holding its value when that is not the field name.
+    """
+
+    serializer_class = None
+    lookups = {}
+    passthrough_fields = (
+        serializers.BooleanField,
+        serializers.CharField,
+        serializers.IntegerField,
+        serializers.StringRelatedField,
+    )
+
+    def __init__(self):
+        declared = self.serializer_class().fields
+        self.field_names = list(self.serializer_class.Meta.fields)
+        self.lookup_list = [self.lookups.get(name, name) for name in self.field_names]
+        self.fields = [declared[name] for name in self.field_names]
+
+    def get_queryset(self, queryset):
+        """get a queryset of named rows holding the needed columns; rows also carry pk for keyset pagination"""
+        return queryset.values_list(*self.lookup_list, "pk", named=True)
+
+    def get_converter(self, field):
+        """get the function converting a non-null column value for field, or None if the value is used as is"""
+        if isinstance(field, self.passthrough_fields):
+            return None
+        if isinstance(field, serializers.DateTimeField):
+            output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+            if output_format and output_format.lower() == ISO_8601:
+                return self.get_datetime_converter(field)
+        return field.to_representation
+
+    @staticmethod
+    def get_datetime_converter(field):
+        """
+        get an ISO 8601 converter for field resolving the timezone once rather than per value; naive values fall back
+        to DateTimeField.to_representation
+        """
+        field_timezone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+        if field_timezone is None:
+            return field.to_representation
+
+        def convert(value):
+            if value.tzinfo is None:
+                return field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+        return convert
+
+    def to_representation(self, rows):
+        """build a list of dictionaries from rows"""
+        names = self.field_names
+        converters = [self.get_converter(field) for field in self.fields]
+        return [
+            {
+                name: value if convert is None or value is None else convert(value)
+                for name, convert, value in zip(names, converters, row)
+            }
+            for row in rows
+        ]
+
+
+class InvoiceValuesSerializer(ValuesSerializer):
+    """values serializer matching InvoiceSerializer"""
+
+    serializer_class = InvoiceSerializer
+    lookups = {"order": "order_id", "product": "product_id"}
+
+
+class OrderValuesSerializer(ValuesSerializer):
+    """values serializer matching OrderSerializer"""
+
+    serializer_class = OrderSerializer
+    lookups = {"customer": "customer_id", "status": "status__name"}
+
+
+class ProductValuesSerializer(ValuesSerializer):
+    """values serializer matching ProductSerializer"""
+
+    serializer_class = ProductSerializer
+    lookups = {"brand": "brand__name"}
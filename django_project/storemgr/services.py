@@ -0,0 +1,221 @@
+""" service functions for bulk operations on applicable app models """
+
+from collections import Counter
+
+from auditlog.cid import get_cid
+from auditlog.diff import model_instance_diff
+from auditlog.models import LogEntry
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+# import models
+from storemgr.caching import invalidate_models, invalidate_objects
+from storemgr.models import (
+    AggregateCounter,
+    Brand,
+    Customer,
+    Invoice,
+    Manufacturer,
+    Order,
+    OrderStatus,
+    Product,
+    invalidate_detail_fragments,
+)
+
+from storemgr.autocomplete import publish_instances
+from storemgr.search import SEARCH_FIELDS, index_objects
+from storemgr.sequences import next_ids
+
+
+NON_FIELD_ERRORS = "non_field_errors"
+
+
+def _get_keys(item_list, field):
+    """get the set of string keys referenced by field (a string or a list of strings) across item_list"""
+    key_set = set()
+    for item in item_list:
+        value = item.get(field)
+        for key in value if isinstance(value, list) else [value]:
+            if isinstance(key, str):
+                key_set.add(key)
+    return key_set
+
+
+def _track_bulk_changes(model, pair_list, delta_list, model_list=(), field_list=None):
+    """
+    Keep the counters, cache generations, search index and autocomplete indexes in step with rows of model written by
+    bulk_create or bulk_update, which send no post_save: add delta_list, (dimension, key, delta) tuples, to the
+    counters, start new cache generations of model and model_list, and index and publish the rows of pair_list,
+    (stored copy, saved row) pairs whose stored copy is None for created rows. field_list, the fields an update wrote,
+    skips the search index when none of them is indexed.
+    """
+    instance_list = [new for _, new in pair_list]
+    AggregateCounter.bump_many(delta_list)
+    invalidate_models(model, *model_list)
+    if field_list is None or set(field_list) & set(SEARCH_FIELDS[model]):
+        index_objects(model, instance_list)
+    publish_instances(model, instance_list, previous_list=[old for old, _ in pair_list])
+
+
+def _validate_order(item, status_map, customer_set, brand_map):
+    """check a single bulk order item against the resolved lookups; returns a dictionary of field: list of errors"""
+    item_errors = {}
+    if not isinstance(item.get("status"), str) or item["status"] not in status_map:
+        item_errors["status"] = [f"unknown status: {item.get('status')}"]
+    if not isinstance(item.get("customer"), str) or item["customer"] not in customer_set:
+        item_errors["customer"] = [f"unknown customer: {item.get('customer')}"]
+    products = item.get("products") or []
+    if not isinstance(products, list):
+        item_errors["products"] = ["expected a list of skus"]
+    else:
+        missing = sorted({str(sku) for sku in products if not isinstance(sku, str) or sku not in brand_map})
+        if missing:
+            item_errors["products"] = [f"unknown products: {', '.join(missing)}"]
+    return item_errors
+
+
+def bulk_create_orders(order_list, batch_size=None):
+    """
+    Create orders, and an Invoice per product line, from a list of dictionaries in a fixed number of queries.
+
+    Args:
+        order_list: (list of dictionaries) orders to create; each containing:
+                        status   - name of an OrderStatus
+                        customer - customer_id of a Customer
+                        products - list of product skus; repeat a sku to order more than one
+
+                    example:
+                        [{"status": "created", "customer": "CU-00000001", "products": ["SKU-00000001"]}, ...]
+        batch_size: (int) rows per INSERT statement; defaults to STOREMGR_BULK_BATCH_SIZE
+
+    Returns:
+        dictionary containing:
+            created - list of order_ids created, in input order
+            errors  - list of dictionaries with the index of each rejected item and its errors, a dictionary of
+                      field: list of messages in the shape of serializer errors; errors not tied to a field are
+                      under non_field_errors
+    """
+    batch_size = batch_size or getattr(settings, "STOREMGR_BULK_BATCH_SIZE", 1000)
+    errors = []
+    valid_list = []
+
+    # resolve every referenced status, customer and product up front; one query each
+    item_list = [i for i in order_list if isinstance(i, dict)]
+    status_map = dict(
+        OrderStatus.objects.filter(name__in=_get_keys(item_list, "status")).order_by().values_list("name", "pk")
+    )
+    customer_set = set(
+        Customer.objects.filter(customer_id__in=_get_keys(item_list, "customer"))
+        .order_by()
+        .values_list("customer_id", flat=True)
+    )
+    brand_map = dict(
+        Product.objects.filter(sku__in=_get_keys(item_list, "products")).order_by().values_list("sku", "brand_id")
+    )
+
+    for index, item in enumerate(order_list):
+        if not isinstance(item, dict):
+            errors.append(dict(index=index, errors={NON_FIELD_ERRORS: ["expected an object"]}))
+            continue
+        item_errors = _validate_order(item, status_map, customer_set, brand_map)
+        if item_errors:
+            errors.append(dict(index=index, errors=item_errors))
+        else:
+            valid_list.append(item)
+
+    if not valid_list:
+        return dict(created=[], errors=errors)
+
+    order_id_list = next_ids(Order, "OR-", len(valid_list))
+    order_objs = []
+    invoice_objs = []
+    for order_id, item in zip(order_id_list, valid_list):
+        order_objs.append(Order(order_id=order_id, status_id=status_map[item["status"]], customer_id=item["customer"]))
+        invoice_objs += [Invoice(order_id=order_id, product_id=sku) for sku in item.get("products") or []]
+
+    status_counts = Counter(status_map[item["status"]] for item in valid_list)
+    brand_counts = Counter(
+        brand_id for item in valid_list for brand_id in {brand_map[sku] for sku in item.get("products") or []}
+    )
+
+    with transaction.atomic():
+        Order.objects.bulk_create(order_objs, batch_size=batch_size)
+        Invoice.objects.bulk_create(invoice_objs, batch_size=batch_size)
+        _track_bulk_changes(
+            Order,
+            [(None, order) for order in order_objs],
+            [("total", "order", len(order_objs))]
+            + [("orders_by_status", status_id, qty) for status_id, qty in status_counts.items()]
+            + [("orders_by_brand", brand_id, qty) for brand_id, qty in brand_counts.items()],
+            model_list=[Invoice],
+        )
+        invalidate_detail_fragments(brand_ids=brand_counts)
+
+    return dict(created=order_id_list, errors=errors)
+
+
+def bulk_log_changes(pair_list, action, actor=None):
+    """
+    Write the auditlog entries for a list of (old, new) instance pairs in one query, as the auditlog save signals
+    would for each instance; old is None for created rows. Pairs without changes are skipped.
+    """
+    if not pair_list:
+        return
+    content_type = ContentType.objects.get_for_model(pair_list[0][1])
+    cid = get_cid()
+    entry_list = []
+    for old, new in pair_list:
+        changes = model_instance_diff(old, new, use_json_for_changes=settings.AUDITLOG_STORE_JSON_CHANGES)
+        if not changes:
+            continue
+        entry_list.append(
+            LogEntry(
+                content_type=content_type,
+                object_pk=str(new.pk),
+                object_id=new.pk if isinstance(new.pk, int) else None,
+                object_repr=str(new),
+                action=action,
+                changes=changes,
+                actor=actor,
+                cid=cid,
+            )
+        )
+    LogEntry.objects.bulk_create(entry_list)
+
+
+def bulk_create_brands(brand_list, actor=None):
+    """insert unsaved Brand instances in bulk, with their audit entries and counters, in one transaction"""
+    batch_size = getattr(settings, "STOREMGR_BULK_BATCH_SIZE", 1000)
+    with transaction.atomic():
+        Brand.objects.bulk_create(brand_list, batch_size=batch_size)
+        bulk_log_changes([(None, brand) for brand in brand_list], LogEntry.Action.CREATE, actor)
+        _track_bulk_changes(
+            Brand,
+            [(None, brand) for brand in brand_list],
+            [("total", "brand", sum(1 for brand in brand_list if brand.enabled))],
+        )
+        invalidate_objects(Manufacturer, [brand.manufacturer_id for brand in brand_list])
+    return brand_list
+
+
+def bulk_update_brands(pair_list, field_list, actor=None):
+    """save modified Brand instances, given as (stored copy, modified) pairs, in bulk in one transaction"""
+    batch_size = getattr(settings, "STOREMGR_BULK_BATCH_SIZE", 1000)
+    now = timezone.now()
+    for _, brand in pair_list:
+        brand.updated_at = now
+    with transaction.atomic():
+        Brand.objects.bulk_update(
+            [brand for _, brand in pair_list], sorted(set(field_list) | {"updated_at"}), batch_size=batch_size
+        )
+        bulk_log_changes(pair_list, LogEntry.Action.UPDATE, actor)
+        _track_bulk_changes(
+            Brand,
+            pair_list,
+            [("total", "brand", sum(int(brand.enabled) - int(old.enabled) for old, brand in pair_list))],
+            field_list=field_list,
+        )
+        invalidate_objects(Manufacturer, [i.manufacturer_id for pair in pair_list for i in pair])
+    return [brand for _, brand in pair_list]
@@ -1,13 +1,21 @@
 import logging
+import threading
 
 from djangoaddicts.signalcontrol.decorators import signal_control
 
 from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
 
 # import models
 from django.contrib.auth.models import User, Group
+from storemgr.models import (AggregateCounter, Brand, Customer, Invoice, Manufacturer, Order, OrderStatus, Product,
+                             ProductAttribute, invalidate_detail_fragments)
+from storemgr.caching import invalidate_models, invalidate_objects
+from storemgr.counters import drop_counter, refresh_orders_by_brand
+from storemgr.search import SEARCH_FIELDS, index_objects, unindex_objects
+from storemgr.autocomplete import get_source_fields, publish_instances
 
 
 user_logger = logging.getLogger('user')
@@ -42,3 +50,321 @@ def log_user_logout(sender, user, **kwargs):
     """ log user logout to user log """
     user_logger.info(f'logout successful for user: {user}')
 
+
+# fields whose previous value is needed to adjust counters and fragment versions when a row is updated
+COUNTER_TRACKED_FIELDS = {
+    Manufacturer: ["enabled"],
+    Brand: ["enabled", "manufacturer_id"],
+    Product: ["enabled", "brand_id"],
+    Order: ["status_id"],
+    Invoice: ["order_id", "product_id"],
+}
+
+# (order_id, brand_id) pairs of invoices that are about to be deleted, per thread
+_pending_invoice_deletes = threading.local()
+
+
+def _get_brand_id(product_id):
+    """get the brand_id of a product"""
+    return Product.objects.filter(pk=product_id).values_list("brand_id", flat=True).first()
+
+
+def _order_has_brand(order_id, brand_id, exclude_pk):
+    """check if an order has an invoice, other than exclude_pk, for a product of brand_id"""
+    return Invoice.objects.filter(order_id=order_id, product__brand_id=brand_id).exclude(pk=exclude_pk).exists()
+
+
+def _bump_enabled(key, instance, created, previous):
+    """adjust an enabled-row total after a save"""
+    if created:
+        AggregateCounter.bump("total", key, 1 if instance.enabled else 0)
+    elif previous and previous["enabled"] != instance.enabled:
+        AggregateCounter.bump("total", key, 1 if instance.enabled else -1)
+
+
+@receiver(pre_save, sender=Manufacturer)
+@receiver(pre_save, sender=Brand)
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Order)
+@receiver(pre_save, sender=Invoice)
+def snapshot_counted_fields(sender, instance, raw=False, **kwargs):
+    """ keep the stored values of counted fields so post_save can tell what changed """
+    instance._counter_snapshot = None
+    if not raw and not instance._state.adding:
+        instance._counter_snapshot = (
+            sender.objects.filter(pk=instance.pk).values(*COUNTER_TRACKED_FIELDS[sender]).first()
+        )
+
+
+@receiver(post_save, sender=Manufacturer)
+def count_manufacturer(sender, instance, created, raw=False, **kwargs):
+    """ update counters on manufacturer save """
+    if not raw:
+        _bump_enabled("manufacturer", instance, created, instance._counter_snapshot)
+
+
+@receiver(post_save, sender=Brand)
+def count_brand(sender, instance, created, raw=False, **kwargs):
+    """ update counters on brand save """
+    if not raw:
+        _bump_enabled("brand", instance, created, instance._counter_snapshot)
+
+
+@receiver(post_save, sender=Customer)
+def count_customer(sender, instance, created, raw=False, **kwargs):
+    """ update counters on customer save """
+    if created and not raw:
+        AggregateCounter.bump("total", "customer")
+
+
+@receiver(post_save, sender=Product)
+def count_product(sender, instance, created, raw=False, **kwargs):
+    """ update counters on product save """
+    if raw:
+        return
+    previous = instance._counter_snapshot
+    _bump_enabled("product", instance, created, previous)
+    if previous and previous["brand_id"] != instance.brand_id:
+        refresh_orders_by_brand([previous["brand_id"], instance.brand_id])
+
+
+@receiver(post_save, sender=Order)
+def count_order(sender, instance, created, raw=False, **kwargs):
+    """ update counters on order save """
+    if raw:
+        return
+    previous = instance._counter_snapshot
+    if created:
+        AggregateCounter.bump_many([("total", "order", 1), ("orders_by_status", instance.status_id, 1)])
+    elif previous and previous["status_id"] != instance.status_id:
+        AggregateCounter.bump_many(
+            [("orders_by_status", previous["status_id"], -1), ("orders_by_status", instance.status_id, 1)]
+        )
+
+
+@receiver(post_save, sender=Invoice)
+def count_invoice(sender, instance, created, raw=False, **kwargs):
+    """ update orders_by_brand when an order gains (or moves) a product line """
+    if raw:
+        return
+    previous = instance._counter_snapshot
+    if not created:
+        if not previous or (previous["order_id"], previous["product_id"]) == (instance.order_id, instance.product_id):
+            return
+    if previous:
+        brand_id = _get_brand_id(previous["product_id"])
+        if not _order_has_brand(previous["order_id"], brand_id, instance.pk):
+            AggregateCounter.bump("orders_by_brand", brand_id, -1)
+    brand_id = _get_brand_id(instance.product_id)
+    if not _order_has_brand(instance.order_id, brand_id, instance.pk):
+        AggregateCounter.bump("orders_by_brand", brand_id)
+
+
+@receiver(pre_delete, sender=Invoice)
+def stage_invoice_delete(sender, instance, **kwargs):
+    """ record the order/brand pair of an invoice about to be deleted """
+    pending = getattr(_pending_invoice_deletes, "pairs", None)
+    if pending is None:
+        pending = _pending_invoice_deletes.pairs = {}
+    instance._counter_pair = (instance.order_id, _get_brand_id(instance.product_id))
+    pending[instance._counter_pair] = pending.get(instance._counter_pair, 0) + 1
+
+
+@receiver(post_delete, sender=Invoice)
+def uncount_invoice(sender, instance, **kwargs):
+    """ update orders_by_brand once the last deleted invoice of an order/brand pair is gone """
+    pending = getattr(_pending_invoice_deletes, "pairs", {})
+    pair = getattr(instance, "_counter_pair", None)
+    if pair not in pending:
+        return
+    pending[pair] -= 1
+    if pending[pair] > 0:
+        return
+    del pending[pair]
+    if not _order_has_brand(pair[0], pair[1], instance.pk):
+        AggregateCounter.bump("orders_by_brand", pair[1], -1)
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def count_order_products(sender, instance, action, reverse, pk_set, **kwargs):
+    """ recount orders_by_brand for brands touched through Order.products add/remove/clear """
+    if action == "pre_clear":
+        instance._counter_brand_ids = (
+            [instance.brand_id]
+            if reverse
+            else list(Invoice.objects.filter(order=instance).values_list("product__brand_id", flat=True).distinct())
+        )
+    elif action == "post_clear":
+        refresh_orders_by_brand(getattr(instance, "_counter_brand_ids", []))
+    elif action in ("post_add", "post_remove"):
+        if reverse:
+            refresh_orders_by_brand([instance.brand_id])
+        else:
+            refresh_orders_by_brand(
+                Product.objects.filter(pk__in=pk_set).values_list("brand_id", flat=True).distinct()
+            )
+
+
+@receiver(post_delete, sender=Manufacturer)
+def uncount_manufacturer(sender, instance, **kwargs):
+    """ update counters on manufacturer delete """
+    AggregateCounter.bump("total", "manufacturer", -1 if instance.enabled else 0)
+
+
+@receiver(post_delete, sender=Brand)
+def uncount_brand(sender, instance, **kwargs):
+    """ update counters on brand delete """
+    AggregateCounter.bump("total", "brand", -1 if instance.enabled else 0)
+    drop_counter("orders_by_brand", instance.pk)
+
+
+@receiver(post_delete, sender=Customer)
+def uncount_customer(sender, instance, **kwargs):
+    """ update counters on customer delete """
+    AggregateCounter.bump("total", "customer", -1)
+
+
+@receiver(post_delete, sender=Product)
+def uncount_product(sender, instance, **kwargs):
+    """ update counters on product delete """
+    AggregateCounter.bump("total", "product", -1 if instance.enabled else 0)
+
+
+@receiver(post_delete, sender=Order)
+def uncount_order(sender, instance, **kwargs):
+    """ update counters on order delete """
+    AggregateCounter.bump_many([("total", "order", -1), ("orders_by_status", instance.status_id, -1)])
+
+
+@receiver(post_delete, sender=OrderStatus)
+def uncount_orderstatus(sender, instance, **kwargs):
+    """ drop the counter of a deleted order status """
+    drop_counter("orders_by_status", instance.pk)
+
+
+# models whose table version is bumped on every change; see storemgr.conditional
+VERSIONED_MODELS = [Brand, Customer, Invoice, Manufacturer, Order, OrderStatus, Product, ProductAttribute]
+
+
+def bump_table_version(sender, raw=False, **kwargs):
+    """ bump the table version of a saved or deleted row """
+    if not raw:
+        invalidate_models(sender)
+
+
+for versioned_model in VERSIONED_MODELS:
+    post_save.connect(bump_table_version, sender=versioned_model, dispatch_uid=f"version_{versioned_model.__name__}")
+    post_delete.connect(bump_table_version, sender=versioned_model, dispatch_uid=f"version_{versioned_model.__name__}")
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+@receiver(m2m_changed, sender=Product.attributes.through)
+def bump_m2m_table_version(sender, instance, action, model, **kwargs):
+    """ bump the table versions of both sides, and of an explicit through model, of a many-to-many change """
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_models(*[i for i in (type(instance), model, sender) if i in VERSIONED_MODELS])
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def invalidate_manufacturer_fragments(sender, instance, raw=False, **kwargs):
+    """ start a new related version of the manufacturer (or manufacturers, on a move) of a saved or deleted brand """
+    if not raw:
+        previous = getattr(instance, "_counter_snapshot", None) or {}
+        invalidate_objects(Manufacturer, [instance.manufacturer_id, previous.get("manufacturer_id")])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_fragments(sender, instance, raw=False, **kwargs):
+    """ start a new related version of the brand (or brands, on a move) of a saved or deleted product """
+    if not raw:
+        previous = getattr(instance, "_counter_snapshot", None) or {}
+        invalidate_detail_fragments(brand_ids=[instance.brand_id, previous.get("brand_id")])
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def invalidate_invoice_fragments(sender, instance, raw=False, **kwargs):
+    """ start a new related version of the brand of a saved or deleted invoice, and of the one it moved from """
+    if not raw:
+        previous = getattr(instance, "_counter_snapshot", None) or {}
+        invalidate_detail_fragments(product_ids=[instance.product_id, previous.get("product_id")])
+
+
+@receiver(post_save, sender=Order)
+def invalidate_order_fragments(sender, instance, created, raw=False, **kwargs):
+    """ start a new related version of the brands of an updated order; a new order has no invoices yet """
+    if not raw and not created:
+        invalidate_detail_fragments(order_ids=[instance.pk])
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def invalidate_order_products_fragments(sender, instance, action, reverse, pk_set, **kwargs):
+    """ start a new related version of the brands touched through Order.products add/remove/clear """
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        invalidate_detail_fragments(brand_ids=[instance.brand_id])
+    elif action == "post_clear":
+        # recorded by count_order_products on pre_clear
+        invalidate_detail_fragments(brand_ids=getattr(instance, "_counter_brand_ids", []))
+    else:
+        invalidate_detail_fragments(product_ids=pk_set)
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Manufacturer)
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Product)
+def index_search_document(sender, instance, raw=False, update_fields=None, **kwargs):
+    """ refresh the search document of a saved row, unless the save left the indexed fields alone """
+    if raw or (update_fields and not set(update_fields) & set(SEARCH_FIELDS[sender])):
+        return
+    index_objects(sender, [instance])
+
+
+@receiver(post_delete, sender=Brand)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Manufacturer)
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Product)
+def unindex_search_document(sender, instance, **kwargs):
+    """ remove the search document of a deleted row """
+    unindex_objects(sender, [instance.pk])
+
+
+@receiver(pre_save, sender=Brand)
+@receiver(pre_save, sender=Customer)
+def snapshot_autocomplete_fields(sender, instance, raw=False, update_fields=None, **kwargs):
+    """ keep the stored values of autocompleted fields so post_save can skip a save that left them alone """
+    field_list = get_source_fields(sender)
+    instance._autocomplete_snapshot = None
+    if raw or instance._state.adding:
+        return
+    if update_fields and not set(update_fields) & set(field_list):
+        instance._autocomplete_snapshot = {i: getattr(instance, i) for i in field_list}
+    else:
+        instance._autocomplete_snapshot = sender.objects.filter(pk=instance.pk).values(*field_list).first()
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Product)
+def publish_autocomplete_row(sender, instance, created, raw=False, **kwargs):
+    """ publish a created row, or a saved row whose autocompleted fields changed, to the indexes of every worker """
+    if not raw:
+        # Order and Product keep no snapshot: their sources read the pk alone, so only creates are published
+        previous = None if created else getattr(instance, "_autocomplete_snapshot", None) or {}
+        publish_instances(sender, [instance], previous_list=[previous])
+
+
+@receiver(post_delete, sender=Brand)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Product)
+def publish_autocomplete_delete(sender, instance, **kwargs):
+    """ publish a deleted row to the autocomplete indexes of every worker """
+    publish_instances(sender, [instance], deleted=True)
@@ -0,0 +1,257 @@
+""" server-side paging, sorting and search for the bootstrap-table list pages of storemgr """
+
+import base64
+import binascii
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils import formats, timezone
+from django.utils.html import escape, escapejs, format_html
+
+from storemgr.pagination import get_estimated_count
+from storemgr.rows import get_rows
+
+
+logger = logging.getLogger(__name__)
+
+# query parameters bootstrap-table sends with each server-side request, as opposed to list filters
+TABLE_PARAMS = ("limit", "offset", "sort", "order", "cursor", "_")
+
+
+def format_value(value):
+    """get the escaped text of value as the template engine would render it"""
+    if value is None:
+        return ""
+    return escape(formats.localize(timezone.template_localtime(value)))
+
+
+def format_enabled(value):
+    """get the check / cross icon of a boolean"""
+    if value:
+        return format_html('<span class="text-primary"><i class="fa-solid fa-check"></i></span>')
+    return format_html('<span class="text-danger"><i class="fa-solid fa-xmark"></i></span>')
+
+
+def format_link(instance):
+    """get a link to the detail page of instance"""
+    return format_html('<a href="{}">{}</a>', instance.get_absolute_url(), instance)
+
+
+def format_audit_link(model_name, pk, label):
+    """get the action link opening the audit log of a row"""
+    url = reverse("handyhelpers:get_auditlog_entries", args=[model_name, pk])
+    return format_html(
+        '<a href="#" title="view audit log" class="hvr-grow mx-1" onClick="showInfo(\'{}\', \'{}\', '
+        '\'Audit Log: <small><i>{}</i></small>\', \'xl\');" role="button" data-bs-toggle="tooltip" '
+        'data-placement="left"><i class="fa fa-history fa-fw"></i></a>',
+        escapejs(url),
+        escapejs(pk),
+        escapejs(escape(label)),
+    )
+
+
+def get_field(model, path):
+    """get the model field at a lookup path such as "status__name" """
+    for name in path.split("__")[:-1]:
+        model = model._meta.get_field(name).related_model
+    return model._meta.get_field(path.split("__")[-1])
+
+
+def is_nullable(model, path):
+    """whether the value at a lookup path can be NULL, through the field itself or a foreign key on the way"""
+    for name in path.split("__"):
+        field = model._meta.get_field(name)
+        if field.null:
+            return True
+        model = field.related_model
+    return False
+
+
+def get_path_value(instance, path):
+    """get the value at a lookup path such as "status__name" of instance"""
+    for name in path.split("__"):
+        instance = getattr(instance, name)
+        if instance is None:
+            return None
+    return instance
+
+
+class Column:
+    """
+    A column of a server-side list table. name is its bootstrap-table data-field and title its header; fields are the
+    lookups its cells read (default: name), sort is the lookup it sorts on (default: its first field; sortable=False
+    for none), and render(instance) builds its html cell (default: the escaped value of its first field).
+    """
+
+    def __init__(self, name, title, fields=None, sort=None, sortable=True, render=None):
+        self.name = name
+        self.title = title
+        self.fields = fields if fields is not None else [name]
+        self.sort = (sort or self.fields[0]) if sortable else None
+        self.render = render or (lambda instance: format_value(get_path_value(instance, self.fields[0])))
+
+
+def get_projection(model, column_list):
+    """
+    get the (select_related, only) lookups loading what column_list reads of model: its pk, the fields and sort
+    lookups of the columns, and the foreign keys they pass through
+    """
+    related = set()
+    only = {model._meta.pk.name}
+    for column in column_list:
+        for path in column.fields + ([column.sort] if column.sort else []):
+            parts = path.split("__")
+            for i in range(1, len(parts)):
+                related.add("__".join(parts[:i]))
+            only.update("__".join(parts[: i + 1]) for i in range(len(parts)))
+    return sorted(related), sorted(only)
+
+
+class ServerSideTableMixin:
+    """
+    Serve a HandyHelperListPlusCreateAndFilterView table one page at a time. The page itself renders no rows; its
+    table requests them from the view's data route (as_view(data=True)) with bootstrap-table's server-side limit,
+    offset, sort, order and search parameters plus the page's own list filters, and gets back
+    {"total", "total_exact", "rows", "cursor"}.
+
+    columns, a list of Column, declares the table once: the page renders its header from them, and each page of rows
+    is read with select_related / only() limited to what the columns read (see get_projection). With DEBUG on,
+    select_related and prefetch_related lookups of the view's queryset that no column reads are logged as warnings.
+    With compact_rows set, pages are read with values_list() as the lightweight rows of storemgr.rows instead of model
+    instances; the column renderers then see only the pk and the fields the columns declare.
+
+    Rows are ordered by the sort lookup of the requested column and pk. Following pages are keyset queries: each
+    response carries a cursor holding the sort value and pk of its last row, which the table sends back for the next
+    page, so a page costs an indexed range read rather than an OFFSET scan. Any other page (a jump, or a cursor from
+    another sort, search or filter) is read with LIMIT / OFFSET, as is every page sorted on a nullable lookup, where a
+    range filter would drop the NULL rows. Totals are estimated above
+    STOREMGR_EXACT_COUNT_THRESHOLD rows; see storemgr.pagination.get_estimated_count.
+    """
+
+    data = False
+    columns = []
+    compact_rows = False
+    table = "storemgr/table/server_side_table.htm"
+    default_sort = "created_at"
+    default_order = "desc"
+
+    def get(self, request, *args, **kwargs):
+        if self.data:
+            return self.get_table_data(request)
+        # the list template passes the view's kwargs to the table template
+        self.kwargs = dict(
+            self.kwargs, table=dict(columns=self.columns, sort_name=self.default_sort, sort_order=self.default_order)
+        )
+        return super().get(request, *args, **kwargs)
+
+    def get_row(self, instance):
+        """get the dictionary of data-field: html cell of a listed row"""
+        return {column.name: column.render(instance) for column in self.columns}
+
+    def project(self, queryset):
+        """limit queryset to the related rows and columns the table reads"""
+        related, only = get_projection(queryset.model, self.columns)
+        if settings.DEBUG:
+            roots = {i.split("__")[0] for i in only}
+            selected = queryset.query.select_related
+            unused = [i for i in (selected if isinstance(selected, dict) else {}) if i not in roots]
+            unused += [
+                getattr(i, "prefetch_through", i)
+                for i in queryset._prefetch_related_lookups
+                if getattr(i, "prefetch_through", i).split("__")[0] not in roots
+            ]
+            if unused:
+                logger.warning("%s loads %s, which no column reads", type(self).__name__, ", ".join(unused))
+        return queryset.select_related(None).select_related(*related).only(*only)
+
+    def get_page_size(self, params):
+        """get the number of rows requested, within STOREMGR_TABLE_MAX_PAGE_SIZE"""
+        max_size = getattr(settings, "STOREMGR_TABLE_MAX_PAGE_SIZE", 500)
+        try:
+            return min(max(int(params.get("limit", 10)), 1), max_size)
+        except ValueError:
+            return 10
+
+    def get_ordering(self, params):
+        """get the (sort lookup, descending) of the request, from the sortable columns"""
+        sort_fields = {column.name: column.sort for column in self.columns if column.sort}
+        lookup = sort_fields.get(params.get("sort"), sort_fields[self.default_sort])
+        descending = params.get("order", self.default_order) == "desc"
+        return lookup, descending
+
+    def get_variant(self, params, lookup, descending):
+        """identify the row sequence a cursor belongs to: the sort, and every filter and search parameter"""
+        filters = sorted((key, value) for key, value in params.lists() if key not in TABLE_PARAMS)
+        return hashlib.md5(repr((lookup, descending, filters)).encode("utf-8")).hexdigest()
+
+    def encode_cursor(self, variant, offset, value, pk):
+        """build the cursor of the row at offset - 1"""
+        data = [variant, offset, value.isoformat() if hasattr(value, "isoformat") else value, pk]
+        return base64.urlsafe_b64encode(json.dumps(data).encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, params, variant, offset, lookup):
+        """get the (sort value, pk) of the cursor parameter; None if it is missing, invalid or not for this page"""
+        try:
+            data = json.loads(base64.urlsafe_b64decode(params["cursor"].encode("ascii")).decode("utf-8"))
+            cursor_variant, cursor_offset, value, pk = data
+            value = get_field(self.queryset.model, lookup).to_python(value)
+        except (KeyError, binascii.Error, TypeError, ValueError, UnicodeError, ValidationError):
+            return None
+        if cursor_variant != variant or cursor_offset != offset:
+            return None
+        return value, pk
+
+    def get_table_data(self, request):
+        """serve one page of rows as bootstrap-table server-side json"""
+        params = request.GET
+        limit = self.get_page_size(params)
+        try:
+            offset = max(int(params.get("offset", 0)), 0)
+        except ValueError:
+            offset = 0
+        lookup, descending = self.get_ordering(params)
+        variant = self.get_variant(params, lookup, descending)
+        keyset = not is_nullable(self.queryset.model, lookup)
+        position = self.decode_cursor(params, variant, offset, lookup) if keyset else None
+
+        # list filters read request.GET; leave them only the page's own filters and search
+        request.GET = params.copy()
+        for key in TABLE_PARAMS:
+            request.GET.pop(key, None)
+        queryset = self.filter_by_query_params()
+        if not self.compact_rows:
+            queryset = self.project(queryset)
+        total, total_exact = get_estimated_count(queryset)
+
+        sign = "-" if descending else ""
+        queryset = queryset.order_by(f"{sign}{lookup}", f"{sign}pk")
+        if position:
+            value, pk = position
+            after = "lt" if descending else "gt"
+            queryset = queryset.filter(Q(**{f"{lookup}__{after}": value}) | Q(**{lookup: value, f"pk__{after}": pk}))
+            page = queryset[:limit]
+        else:
+            page = queryset[offset : offset + limit]
+        if self.compact_rows:
+            row_list = get_rows(page, [path for column in self.columns for path in column.fields] + [lookup])
+        else:
+            row_list = list(page)
+
+        cursor = None
+        if row_list and keyset:
+            last = row_list[-1]
+            cursor = self.encode_cursor(variant, offset + len(row_list), get_path_value(last, lookup), last.pk)
+        return JsonResponse(
+            dict(
+                total=total,
+                total_exact=total_exact,
+                rows=[self.get_row(i) for i in row_list],
+                cursor=cursor,
+            )
+        )
@@ -14,15 +14,21 @@ urlpatterns = [
     path("annual_stats/", report.StoreMgrAnnualStatView.as_view(), name="annual_stats"),
     path("annual_trends/", report.StoreMgrAnnualTrendView.as_view(), name="annual_trends"),
     path("dashboard/", report.StoreMgrDashboard.as_view(), name="dashboard"),
+    path("search/", gui.Search.as_view(), name="search"),
     
     path("list_brands/", gui.ListBrands.as_view(), name="list_brands"),
+    path("list_brands/rows/", gui.ListBrands.as_view(data=True), name="list_brands_rows"),
     path("list_customers/", gui.ListCustomers.as_view(), name="list_customers"),
+    path("list_customers/rows/", gui.ListCustomers.as_view(data=True), name="list_customers_rows"),
     path("list_manufacturers/", gui.ListManufacturers.as_view(), name="list_manufacturers"),
+    path("list_manufacturers/rows/", gui.ListManufacturers.as_view(data=True), name="list_manufacturers_rows"),
     path("list_orders/", gui.ListOrders.as_view(), name="list_orders"),
+    path("list_orders/rows/", gui.ListOrders.as_view(data=True), name="list_orders_rows"),
     path("list_products/", gui.ListProducts.as_view(), name="list_products"),
+    path("list_products/rows/", gui.ListProducts.as_view(data=True), name="list_products_rows"),
     
     path("detail_brand/<int:pk>", gui.DetailBrand.as_view(), name="detail_brand"),
-    path("detail_customer/<int:pk>", gui.DetailCustomer.as_view(), name="detail_customer"),
+    path("detail_customer/<str:pk>", gui.DetailCustomer.as_view(), name="detail_customer"),
     path("detail_manufacturer/<int:pk>", gui.DetailManufacturer.as_view(), name="detail_manufacturer"),
     path("detail_order/<str:pk>", gui.DetailOrder.as_view(), name="detail_order"),
     path("detail_product/<str:pk>", gui.DetailProduct.as_view(), name="detail_product"),
@@ -6,6 +6,7 @@ from storemgr.views import rest
 router = routers.DefaultRouter()
 
 # storemgr API Endpoints
+router.register(r"autocomplete", rest.AutocompleteViewSet, "autocomplete")
 router.register(r"brand", rest.BrandViewSet, "brand")
 router.register(r"customer", rest.CustomerViewSet, "customer")
 router.register(r"invoice", rest.InvoiceViewSet, "invoice")
@@ -13,6 +14,7 @@ router.register(r"order", rest.OrderViewSet, "order")
 router.register(r"orderstatus", rest.OrderStatusViewSet, "orderstatus")
 router.register(r"product", rest.ProductViewSet, "product")
 router.register(r"productattribute", rest.ProductAttributeViewSet, "productattribute")
+router.register(r"search", rest.SearchViewSet, "search")
 
 urlpatterns = [
     # API views
@@ -1,3 +1,5 @@
+from urllib.parse import urlencode
+
 from django.shortcuts import render
 
 from django.views.generic import DetailView, View
@@ -5,11 +7,27 @@ from handyhelpers.views import HandyHelperIndexView, HandyHelperListPlusCreateAn
 from handyhelpers.permissions import InAnyGroup
 
 # import models
-from storemgr.models import Brand, Customer, Manufacturer, Order, Product
+from storemgr.models import Brand, Customer, Manufacturer, Order, OrderStatus, Product
 
 # import forms
 from storemgr.forms import FilterOrderForm, FilterProductForm
 
+# import caching
+from storemgr.caching import FragmentCacheMixin
+
+# import tables
+from storemgr.tables import Column, ServerSideTableMixin, format_audit_link, format_enabled, format_link
+
+# import search
+from storemgr.search import get_search_options, global_search, search
+
+
+class FullTextSearchMixin:
+    """apply the full-text search index to a list view's query parameter filters with ?search="""
+
+    def filter_by_query_params(self):
+        return search(super().filter_by_query_params(), self.request.GET.get("search", ""))
+
 
 class Index(HandyHelperIndexView):
     """render the storemgr index page"""
@@ -22,12 +40,12 @@ class Index(HandyHelperIndexView):
             "title": "Dashboard",
             "description": "View dashboard",
         },
-        # {
-        #     'url': '/search',
-        #     'icon': 'fas fa-search',
-        #     'title': 'Search',
-        #     'description': 'Run custom searches',
-        # },
+        {
+            "url": "/storemgr/search/",
+            "icon": "fas fa-search",
+            "title": "Search",
+            "description": "Search orders, products, customers, brands and manufacturers",
+        },
         {
             "url": "/storemgr/rest/",
             "icon": "fas fa-download",
@@ -52,32 +70,90 @@ class Index(HandyHelperIndexView):
     protected_group_name = "admin"
 
 
-class ListBrands(HandyHelperListPlusCreateAndFilterView):
+class ListBrands(ServerSideTableMixin, FullTextSearchMixin, HandyHelperListPlusCreateAndFilterView):
     """list available Brand entries"""
-    queryset = Brand.objects.all().select_related("manufacturer")
+    queryset = Brand.objects.all()
+    compact_rows = True
     title = "Brands"
-    table = "storemgr/table/brands.htm"
+    columns = [
+        Column("name", "Name", render=format_link),
+        Column(
+            "manufacturer",
+            "Manufacturer",
+            fields=["manufacturer__name"],
+            render=lambda instance: format_link(instance.manufacturer),
+        ),
+        Column("enabled", "Enabled", render=lambda instance: format_enabled(instance.enabled)),
+        Column("created_at", "Created At"),
+        Column("updated_at", "Updated At"),
+        Column(
+            "actions",
+            "",
+            fields=["name"],
+            sortable=False,
+            render=lambda instance: format_audit_link("brand", instance.pk, instance),
+        ),
+    ]
 
 
-class ListCustomers(HandyHelperListPlusCreateAndFilterView):
+class ListCustomers(ServerSideTableMixin, FullTextSearchMixin, HandyHelperListPlusCreateAndFilterView):
     """list available Customer entries"""
     queryset = Customer.objects.all()
+    compact_rows = True
     title = "Customers"
-    table = "storemgr/table/customers.htm"
+    columns = [
+        Column("customer_id", "Customer ID"),
+        Column("first_name", "First Name"),
+        Column("last_name", "Last Name"),
+        Column("created_at", "Created At"),
+        Column(
+            "actions",
+            "",
+            fields=[],
+            sortable=False,
+            render=lambda instance: format_audit_link("customer", instance.pk, instance.pk),
+        ),
+    ]
 
 
-class ListManufacturers(HandyHelperListPlusCreateAndFilterView):
+class ListManufacturers(ServerSideTableMixin, FullTextSearchMixin, HandyHelperListPlusCreateAndFilterView):
     """list available Manufacturer entries"""
     queryset = Manufacturer.objects.all()
+    compact_rows = True
     title = "Manufacturers"
-    table = "storemgr/table/manufacturers.htm"
+    columns = [
+        Column("name", "Name", render=format_link),
+        Column("enabled", "Enabled", render=lambda instance: format_enabled(instance.enabled)),
+        Column("created_at", "Created At"),
+        Column("updated_at", "Updated At"),
+        Column(
+            "actions",
+            "",
+            fields=["name"],
+            sortable=False,
+            render=lambda instance: format_audit_link("manufacturer", instance.pk, instance),
+        ),
+    ]
 
 
-class ListOrders(HandyHelperListPlusCreateAndFilterView):
+class ListOrders(ServerSideTableMixin, FullTextSearchMixin, HandyHelperListPlusCreateAndFilterView):
     """list available Order entries"""
-    queryset = Order.objects.all().select_related("status", "customer").prefetch_related("products")
+    queryset = Order.objects.all()
+    compact_rows = True
     title = "Orders"
-    table = "storemgr/table/orders.htm"
+    columns = [
+        Column("customer_id", "Customer ID"),
+        Column("status", "Status", fields=["status__name"]),
+        Column("created_at", "Created At"),
+        Column("updated_at", "Updated At"),
+        Column(
+            "actions",
+            "",
+            fields=[],
+            sortable=False,
+            render=lambda instance: format_audit_link("order", instance.pk, instance.pk),
+        ),
+    ]
 
     filter_form_obj = FilterOrderForm
     filter_form_title = "<b>Filter Orders: </b>"
@@ -85,11 +161,25 @@ class ListOrders(HandyHelperListPlusCreateAndFilterView):
     filter_form_tool_tip = "filter orders"
 
 
-class ListProducts(HandyHelperListPlusCreateAndFilterView):
+class ListProducts(ServerSideTableMixin, FullTextSearchMixin, HandyHelperListPlusCreateAndFilterView):
     """list available Product entries"""
-    queryset = Product.objects.all().prefetch_related("attributes")
+    queryset = Product.objects.all()
+    compact_rows = True
     title = "Products"
-    table = "storemgr/table/products.htm"
+    columns = [
+        Column("sku", "SKU"),
+        Column("brand", "Brand", fields=["brand__name"]),
+        Column("description", "Description"),
+        Column("enabled", "Enabled", render=lambda instance: format_enabled(instance.enabled)),
+        Column("created_at", "Created At"),
+        Column(
+            "actions",
+            "",
+            fields=[],
+            sortable=False,
+            render=lambda instance: format_audit_link("product", instance.pk, instance.pk),
+        ),
+    ]
 
     filter_form_obj = FilterProductForm
     filter_form_title = "<b>Filter Products: </b>"
@@ -97,9 +187,12 @@ class ListProducts(HandyHelperListPlusCreateAndFilterView):
     filter_form_tool_tip = "filter products"
 
 
-class DetailBrand(DetailView):
-    model = Brand
+class DetailBrand(FragmentCacheMixin, DetailView):
+    queryset = Brand.objects.select_related("manufacturer")
     template_name = 'storemgr/detail/brand.html'
+    # orders, products and invoices of the brand start a new related version; a status rename shows in any brand
+    fragment_models = {"orders": [OrderStatus], "charts": [OrderStatus]}
+    fragment_related = ("totals", "orders", "products", "charts")
 
 
 class DetailCustomer(DetailView):
@@ -107,9 +200,10 @@ class DetailCustomer(DetailView):
     template_name = 'storemgr/detail/customer.html'
 
 
-class DetailManufacturer(DetailView):
+class DetailManufacturer(FragmentCacheMixin, DetailView):
     model = Manufacturer
     template_name = 'storemgr/detail/manufacturer.html'
+    fragment_related = ("totals", "brands", "products", "charts")
 
 
 class DetailProduct(DetailView):
@@ -120,3 +214,23 @@ class DetailProduct(DetailView):
 class DetailOrder(DetailView):
     model = Order
     template_name = 'storemgr/detail/order.html'
+
+
+class Search(View):
+    """search brands, manufacturers, products, customers and orders at once; see storemgr.search.global_search"""
+    title = "Search"
+    template_name = "storemgr/custom/search.html"
+
+    def get(self, request):
+        context = dict(title=self.title, query=request.GET.get("q", ""), groups=[])
+        try:
+            options = get_search_options(request.GET)
+        except ValueError as err:
+            context["error"] = str(err)
+            return render(request, self.template_name, context)
+        for group in global_search(**options):
+            if group["has_more"]:
+                params = dict(q=options["text"], type=group["type"], offset=options["offset"] + options["limit"])
+                group["next_url"] = f"{request.path}?{urlencode(params)}"
+            context["groups"].append(group)
+        return render(request, self.template_name, context)
@@ -1,114 +1,255 @@
+import datetime
+
 from django.conf import settings
 from django.shortcuts import render
+from django.utils import timezone
 from django.views.generic import View
 from handyhelpers.views.report import AnnualTrendView, AnnualStatView, AnnualProgressView
-from handyhelpers.views.report import get_colors
+from handyhelpers.views.report import get_annual_timestamps, get_color_list, get_timestamps
 
 # import models
 from storemgr.models import (Brand, Customer, Manufacturer, Order, OrderStatus, Product)
 
+from storemgr.charts import get_chart
+from storemgr.counters import BUILT_MARKER, get_all_counters, rebuild_counters
+from storemgr.rollups import ensure_rollups, load_series
+from storemgr.rows import get_rows
+
+
+class RollupReportMixin:
+    """
+    Serve the handyhelpers annual report views from DailyRollup rather than scanning each dataset's table.
+
+    Each dataset_list entry takes a `model` in place of a `queryset`; counts are per day, so "past day/week/month/year"
+    windows start at the beginning of the day they fall on. Views keep the handyhelpers page and templates and
+    override get_report_data, which builds their part of the context from the loaded series; by default, the counts
+    of each dataset over the past day, week, month and year.
+    """
+    dataset_list = list()
+    htmx_template_name = None
+
+    def get_series(self):
+        """
+        load per-day counts covering the past year (plus the month it started in) for every dataset; days not yet
+        rolled up before today are rolled up first
+        """
+        model_list = [dataset["model"] for dataset in self.dataset_list]
+        ensure_rollups(model_list)
+        start = (timezone.now() - datetime.timedelta(days=366)).date().replace(day=1)
+        series_map = load_series(model_list, start)
+        return [(dataset, series_map[dataset["model"]]) for dataset in self.dataset_list]
+
+    def get_report_data(self, series_list):
+        """get the report's context from a list of (dataset, RollupSeries)"""
+        context = dict()
+        context['dataset_list'] = self.build_day_week_month_year_charts(series_list)
+        return context
+
+    def get(self, request):
+        if self.is_htmx():
+            self.template_name = self.htmx_template_name
+        context = dict()
+        context['base_template'] = self.base_template
+        context['title'] = self.title
+        context['sub_title'] = self.sub_title
+        context.update(self.get_report_data(self.get_series()))
+        return render(request, self.template_name, context=context)
+
+    def build_annual_progress_chart(self, series_list):
+        """rollup equivalent of handyhelpers.views.report.build_annual_progress_chart"""
+        color_list = get_color_list()
+        annual_timestamp_list = get_annual_timestamps()
+        return_dataset_list = []
+        for index, (dataset, series) in enumerate(series_list):
+            return_dataset_list.append(
+                dict(title=dataset.get("title"),
+                     url=dataset.get("list_view"),
+                     dt_field=dataset.get("dt_field"),
+                     data=[series.count_lte(ts) for ts in annual_timestamp_list],
+                     color=color_list[index % len(color_list)],
+                     list_view=dataset.get("list_view"),
+                     icon=dataset.get("icon"),
+                     )
+            )
+        return [ts.strftime("%B") for ts in annual_timestamp_list], annual_timestamp_list, return_dataset_list
 
-class StoreMgrAnnualProgressView(AnnualProgressView):
+    def build_annual_trend_chart(self, series_list):
+        """rollup equivalent of handyhelpers.views.report.build_annual_trend_chart"""
+        color_list = get_color_list()
+        annual_timestamp_list = get_annual_timestamps(reverse=True)
+        last_year = timezone.now() - datetime.timedelta(days=365.2425)
+        return_dataset_list = []
+        for index, (dataset, series) in enumerate(series_list):
+            return_dataset_list.append(
+                dict(title=dataset.get("title"),
+                     list_view=dataset.get("list_view"),
+                     dt_field=dataset.get("dt_field"),
+                     color=color_list[index % len(color_list)],
+                     annual=[series.count_month(ts.year, ts.month, since=last_year) for ts in annual_timestamp_list],
+                     )
+            )
+        return [ts.strftime("%B") for ts in annual_timestamp_list], annual_timestamp_list, return_dataset_list
+
+    def build_day_week_month_year_charts(self, series_list):
+        """rollup equivalent of handyhelpers.views.report.build_day_week_month_year_charts"""
+        color_list = get_color_list()
+        last_day, last_week, last_month, last_year = get_timestamps()
+        return [
+            dict(title=dataset.get("title"),
+                 list_view=dataset.get("list_view"),
+                 dt_field=dataset.get("dt_field"),
+                 color=color_list[index % len(color_list)],
+                 day=series.count_gte(last_day),
+                 week=series.count_gte(last_week),
+                 month=series.count_gte(last_month),
+                 year=series.count_gte(last_year),
+                 )
+            for index, (dataset, series) in enumerate(series_list)
+        ]
+
+
+class StoreMgrAnnualProgressView(RollupReportMixin, AnnualProgressView):
     """ """
+    htmx_template_name = 'handyhelpers/report/chartjs/annual_progress_content.htm'
     dataset_list = [
         dict(
             title="Brands",
-            queryset=Brand.objects.all(),
+            model=Brand,
             dt_field="created_at",
             icon=Brand.get_icon(),
             list_view="/storemgr/list_brands",
         ),
         dict(
             title="Customers",
-            queryset=Customer.objects.all(),
+            model=Customer,
             dt_field="created_at",
             icon=Customer.get_icon(),
             list_view="/storemgr/list_customers",
         ),
         dict(
             title="Orders",
-            queryset=Order.objects.all(),
+            model=Order,
             dt_field="created_at",
             icon=Order.get_icon(),
             list_view="/storemgr/list_orders",
         ),
         dict(
             title="Products",
-            queryset=Product.objects.all(),
+            model=Product,
             dt_field="created_at",
             icon=Product.get_icon(),
             list_view="/storemgr/list_products",
         ),
     ]
 
+    def get_report_data(self, series_list):
+        context = dict()
+        context['month_labels'], context['month_timestamps'], context['annual_progress_dataset_list'] = \
+            self.build_annual_progress_chart(series_list)
+        return context
 
-class StoreMgrAnnualStatView(AnnualStatView):
+
+class StoreMgrAnnualStatView(RollupReportMixin, AnnualStatView):
     """ """
+    htmx_template_name = 'handyhelpers/report/annual_stats_content.htm'
     dataset_list = [
         dict(
             title="Brands",
-            queryset=Brand.objects.all(),
+            model=Brand,
             dt_field="created_at",
             icon=Brand.get_icon(),
             list_view="/storemgr/list_brands",
         ),
         dict(
             title="Customers",
-            queryset=Customer.objects.all(),
+            model=Customer,
             dt_field="created_at",
             icon=Customer.get_icon(),
             list_view="/storemgr/list_customers",
         ),
         dict(
             title="Orders",
-            queryset=Order.objects.all(),
+            model=Order,
             dt_field="created_at",
             icon=Order.get_icon(),
             list_view="/storemgr/list_orders",
         ),
         dict(
             title="Products",
-            queryset=Product.objects.all(),
+            model=Product,
             dt_field="created_at",
             icon=Product.get_icon(),
             list_view="/storemgr/list_products",
         ),
     ]
 
+    def get_report_data(self, series_list):
+        context = dict()
+        context['dataset_list'] = []
+        last_day, last_week, last_month, last_year = get_timestamps()
+
+        for dataset, series in series_list:
+            context['dataset_list'].append(
+                dict(title=dataset.get('title'),
+                     icon=dataset.get('icon'),
+                     url=dataset.get('list_view'),
+                     total=series.count(),
+                     day_count=series.count_gte(last_day),
+                     day_date=last_day,
+                     week_count=series.count_gte(last_week),
+                     week_date=last_week,
+                     month_count=series.count_gte(last_month),
+                     month_date=last_month,
+                     year_count=series.count_gte(last_year),
+                     year_date=last_year,
+                     ),
+            )
+        return context
 
-class StoreMgrAnnualTrendView(AnnualTrendView):
+
+class StoreMgrAnnualTrendView(RollupReportMixin, AnnualTrendView):
     """ """
+    htmx_template_name = 'handyhelpers/report/chartjs/annual_trends_content.htm'
     dataset_list = [
         dict(
             title="Brands",
-            queryset=Brand.objects.all(),
+            model=Brand,
             dt_field="created_at",
             icon=Brand.get_icon(),
             list_view="/storemgr/list_brands",
         ),
         dict(
             title="Customers",
-            queryset=Customer.objects.all(),
+            model=Customer,
             dt_field="created_at",
             icon=Customer.get_icon(),
             list_view="/storemgr/list_customers",
         ),
         dict(
             title="Orders",
-            queryset=Order.objects.all(),
+            model=Order,
             dt_field="created_at",
             icon=Order.get_icon(),
             list_view="/storemgr/list_orders",
         ),
         dict(
             title="Products",
-            queryset=Product.objects.all(),
+            model=Product,
             dt_field="created_at",
             icon=Product.get_icon(),
             list_view="/storemgr/list_products",
         ),
     ]
 
+    def get_report_data(self, series_list):
+        context = super().get_report_data(series_list)
+        context['last_day'], context['last_week'], context['last_month'], context['last_year'] = get_timestamps()
+        context['month_labels'], context['month_timestamps'], context['annual_trend_dataset_list'] = \
+            self.build_annual_trend_chart(series_list)
+        context['chart_display_title'] = self.chart_display_title
+        context['chart_display_legend'] = self.chart_display_legend
+        return context
+
 
 class StoreMgrDashboard(View):
     """ """
@@ -118,54 +259,54 @@ class StoreMgrDashboard(View):
     
     def get(self, request):
         """ """
+        counters = get_all_counters()
+        if BUILT_MARKER[0] not in counters:
+            rebuild_counters()
+            counters = get_all_counters()
+        totals = counters.get("total", {})
+
         context = {}
         context['counts'] = [
             {"title": "Manufacturers", 
-             "count": Manufacturer.objects.filter(enabled=True).count(), 
+             "count": totals.get("manufacturer", 0), 
              "icon": Manufacturer.get_icon(), 
              "link": "/storemgr/list_manufacturers/?enabled=True"},
             
             {"title": "Brands", 
-             "count": Brand.objects.filter(enabled=True).count(), 
+             "count": totals.get("brand", 0), 
              "icon": Brand.get_icon(), 
              "link": "/storemgr/list_brands/?enabled=True"},
             
             {"title": "Customers", 
-             "count": Customer.objects.filter().count(), 
+             "count": totals.get("customer", 0), 
              "icon": Customer.get_icon(), 
              "link": "/storemgr/list_customers"},
             
             {"title": "Products", 
-             "count": Product.objects.filter(enabled=True).count(), 
+             "count": totals.get("product", 0), 
              "icon": Product.get_icon(), 
              "link": "/storemgr/list_products/?enabled=True"},
             
             {"title": "Orders", 
-             "count": Order.objects.filter().count(), 
+             "count": totals.get("order", 0), 
              "icon": Order.get_icon(), 
              "link": "/storemgr/list_orders"},
             ]
 
         # get Orders by brand
-        brand_list = [i.name for i in Brand.objects.all()]
-        context['orders_by_brand'] = dict(
-            id='orders_by_brand',
-            type='bar',
-            label_list=brand_list,
-            value_list=[Order.objects.filter(**{'products__brand__name': brand}).count() for brand in brand_list],
-            list_view='/storemgr/list_orders?products__brand__name=',
-            color_list=get_colors(len(brand_list)),
+        brand_counts = counters.get("orders_by_brand", {})
+        context['orders_by_brand'] = get_chart(
+            'orders_by_brand',
+            [(row.name, brand_counts.get(str(row.pk), 0)) for row in get_rows(Brand.objects.order_by(), ["name"])],
+            '/storemgr/list_orders?products__brand__name=',
         )
-        
+
         # get Orders by status
-        status_list = [i.name for i in OrderStatus.objects.all()]
-        context['orders_by_status'] = dict(
-            id='orders_by_status',
-            type='bar',
-            label_list=status_list,
-            value_list=[Order.objects.filter(**{'status__name': status}).count() for status in status_list],
-            list_view='/storemgr/list_orders?status__name=',
-            color_list=get_colors(len(status_list)),
+        status_counts = counters.get("orders_by_status", {})
+        context['orders_by_status'] = get_chart(
+            'orders_by_status',
+            [(row.name, status_counts.get(str(row.pk), 0)) for row in get_rows(OrderStatus.objects.order_by(), ["name"])],
+            '/storemgr/list_orders?status__name=',
         )
-                
+
         return render(request, self.template_name, context=context)
@@ -1,9 +1,16 @@
 """ DRF viewsets for applicable app models """
 
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.http import Http404
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-from rest_flex_fields import is_expanded
+from rest_flex_fields import EXPAND_PARAM, FIELDS_PARAM, OMIT_PARAM
 from handyhelpers.drf_permissions import InAnyGroup
 
 # import models
@@ -11,15 +18,30 @@ from storemgr.models import Brand, Customer, Invoice, Order, OrderStatus, Produc
 
 # import serializers
 from storemgr.serializers import (
+    BrandBulkSerializer,
     BrandSerializer,
     CustomerSerializer,
     InvoiceSerializer,
+    InvoiceValuesSerializer,
     OrderSerializer,
     OrderStatusSerializer,
+    OrderValuesSerializer,
     ProductSerializer,
     ProductAttributeSerializer,
+    ProductValuesSerializer,
 )
 
+# import mixins
+from storemgr.caching import ResponseCacheMixin
+from storemgr.conditional import ConditionalGetMixin
+from storemgr.exports import ExportMixin
+from storemgr.planner import QueryPlanMixin
+
+# import services
+from storemgr.autocomplete import AUTOCOMPLETE_SOURCES, autocomplete
+from storemgr.search import get_search_options, global_search
+from storemgr.services import bulk_create_orders
+
 # import filtersets
 from storemgr.filtersets import (
     BrandFilterSet,
@@ -32,7 +54,126 @@ from storemgr.filtersets import (
 )
 
 
-class BrandViewSet(viewsets.ModelViewSet):
+class RelatedListMixin:
+    """
+    Build list responses for a queryset, and list the rows of another viewset related to this viewset's instance
+    through that viewset's get_queryset() (select_related / expand handling), filterset, paginator and serializer.
+    """
+
+    def get_list_response(self, request, queryset):
+        """paginate and serialize queryset as the list action does"""
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    def list(self, request, *args, **kwargs):
+        return self.get_list_response(request, self.filter_queryset(self.get_queryset()))
+
+    def get_parent(self):
+        """
+        get this viewset's instance as get_object() does, with its lookup, 404 and object permission checks, but
+        without this viewset's list filters: the query parameters filter the related rows
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        instance = get_object_or_404(self.get_queryset(), **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(self.request, instance)
+        return instance
+
+    def list_related(self, request, viewset_class, lookup, empty_message):
+        """
+        list the rows of viewset_class whose lookup matches this instance, in one data query plus the paginator's count
+        query once the instance is resolved; returns a 404 with empty_message when there are none
+        """
+        key = self.get_parent().pk
+        view = viewset_class(request=request, args=(), kwargs={}, format_kwarg=self.format_kwarg, action="list")
+        view.headers = self.headers
+        try:
+            queryset = view.filter_queryset(view.get_queryset()).filter(**{lookup: key})
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        response = view.get_list_response(request, queryset)
+        if getattr(view.paginator, "count", None) == 0 or response.data == []:
+            return Response(empty_message, status.HTTP_404_NOT_FOUND)
+        return response
+
+
+class ValuesListMixin(RelatedListMixin):
+    """
+    Serve list responses from values_list() rows through values_serializer_class when the request does not use
+    expand, fields or omit; the output is identical to serializer_class but skips building model instances.
+    """
+
+    values_serializer_class = None
+
+    def use_values_serializer(self, request):
+        """determine if this list request can be served from values_list() rows"""
+        if not getattr(settings, "STOREMGR_VALUES_SERIALIZATION", True) or not self.values_serializer_class:
+            return False
+        return not any(i in request.query_params for i in (EXPAND_PARAM, FIELDS_PARAM, OMIT_PARAM))
+
+    def get_list_response(self, request, queryset):
+        if not self.use_values_serializer(request):
+            return super().get_list_response(request, queryset)
+        values_serializer = self.values_serializer_class()
+        queryset = values_serializer.get_queryset(queryset)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(values_serializer.to_representation(page))
+        return Response(values_serializer.to_representation(queryset))
+
+
+class BatchRetrieveMixin:
+    """
+    Add a `batch` list action retrieving many rows by key in one round trip. Keys come from ?ids=a,b,c or a POST
+    body of {"ids": [...]} (or a plain list); results keep the order of the keys, and keys not found are reported.
+    """
+
+    @action(detail=False, methods=["get", "post"])
+    def batch(self, request, *args, **kwargs):
+        """retrieve the rows for a list of keys"""
+        if request.method == "POST":
+            keys = request.data.get("ids") if isinstance(request.data, dict) else request.data
+        else:
+            keys = [i for i in request.query_params.get("ids", "").split(",") if i]
+        if not isinstance(keys, list) or not keys:
+            return Response("Expected a list of ids", status.HTTP_400_BAD_REQUEST)
+        max_keys = getattr(settings, "STOREMGR_BATCH_MAX_KEYS", 5000)
+        if len(keys) > max_keys:
+            return Response(f"Too many ids; send at most {max_keys} per request", status.HTTP_400_BAD_REQUEST)
+        keys = [str(i) for i in keys]
+        unique_keys = list(dict.fromkeys(keys))
+
+        queryset = self.filter_queryset(self.get_queryset())
+        values_serializer = None
+        if getattr(self, "values_serializer_class", None) and self.use_values_serializer(request):
+            values_serializer = self.values_serializer_class()
+            queryset = values_serializer.get_queryset(queryset)
+
+        # one IN query, split only where the backend limits the number of query parameters
+        batch_size = max(connections[queryset.db].ops.bulk_batch_size(["pk"], unique_keys), 1)
+        rows = []
+        try:
+            for i in range(0, len(unique_keys), batch_size):
+                rows += queryset.filter(pk__in=unique_keys[i : i + batch_size])
+        except (TypeError, ValueError, ValidationError):
+            return Response("Invalid ids", status.HTTP_400_BAD_REQUEST)
+
+        if values_serializer:
+            data = values_serializer.to_representation(rows)
+        else:
+            data = self.get_serializer(rows, many=True).data
+        data_map = {str(row.pk): item for row, item in zip(rows, data)}
+        return Response(
+            dict(
+                results=[data_map[i] for i in keys if i in data_map],
+                missing=[i for i in unique_keys if i not in data_map],
+            ),
+            status.HTTP_200_OK,
+        )
+
+
+class BrandViewSet(ResponseCacheMixin, ConditionalGetMixin, RelatedListMixin, QueryPlanMixin, viewsets.ModelViewSet):
 # class BrandViewSet(viewsets.ModelViewSet, InAnyGroup):
     """API endpoint that allows Brands to be viewed"""
     # permission_classes = (InAnyGroup,)
@@ -44,22 +185,67 @@ class BrandViewSet(viewsets.ModelViewSet):
     serializer_class = BrandSerializer
     filterset_class = BrandFilterSet
 
+    def get_bulk_list(self, request):
+        """get the list of items in a bulk request, or an error response"""
+        if not isinstance(request.data, list) or not request.data:
+            return None, Response("Expected a list of brands", status.HTTP_400_BAD_REQUEST)
+        max_items = getattr(settings, "STOREMGR_BULK_MAX_ITEMS", 10000)
+        if len(request.data) > max_items:
+            return None, Response(f"Too many brands; send at most {max_items} per request", status.HTTP_400_BAD_REQUEST)
+        return request.data, None
+
+    @action(detail=False, methods=["post"])
+    def bulk_create(self, request, *args, **kwargs):
+        """create a list of brands; the whole list is validated, then written in one transaction"""
+        item_list, error = self.get_bulk_list(request)
+        if error:
+            return error
+        serializer = BrandBulkSerializer(data=item_list, many=True, context=self.get_serializer_context())
+        if not serializer.is_valid():
+            return Response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+        serializer.save()
+        return Response(serializer.data, status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["patch"])
+    def bulk_update(self, request, *args, **kwargs):
+        """partially update a list of brands identified by id; the whole list is validated, then written in one go"""
+        item_list, error = self.get_bulk_list(request)
+        if error:
+            return error
+        ids = [item.get("id") if isinstance(item, dict) else None for item in item_list]
+        instance_map = self.model.objects.in_bulk([i for i in ids if isinstance(i, int)])
+        id_counts = Counter(ids)
+        id_errors = [
+            {} if i in instance_map and id_counts[i] == 1 else {"id": [f"unknown or repeated id: {i}"]} for i in ids
+        ]
+        if any(id_errors):
+            return Response(id_errors, status.HTTP_400_BAD_REQUEST)
+        serializer = BrandBulkSerializer(
+            [instance_map[i] for i in ids],
+            data=item_list,
+            many=True,
+            partial=True,
+            context=self.get_serializer_context(),
+        )
+        if not serializer.is_valid():
+            return Response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+        serializer.save()
+        return Response(serializer.data, status.HTTP_200_OK)
+
     @action(detail=True, methods=["get"])
     def product_set(self, request, *args, **kwargs):
         """get the products associated with this Brand instance if available"""
-        instance = self.get_object()
-        data = instance.product_set.all()
-        if data:
-            try:
-                serializer = ProductSerializer(data, many=True)
-                return Response(serializer.data, status.HTTP_200_OK)
-            except Exception as err:
-                return Response(str(err), status.HTTP_500_INTERNAL_SERVER_ERROR)
-        else:
-            return Response("No products available for this brand ", status.HTTP_404_NOT_FOUND)
+        return self.list_related(request, ProductViewSet, "brand", "No products available for this brand ")
 
 
-class CustomerViewSet(viewsets.ReadOnlyModelViewSet):
+class CustomerViewSet(
+    BatchRetrieveMixin,
+    ResponseCacheMixin,
+    ConditionalGetMixin,
+    RelatedListMixin,
+    QueryPlanMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
     """API endpoint that allows Customers to be viewed"""
 
     model = Customer
@@ -70,96 +256,80 @@ class CustomerViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=True, methods=["get"])
     def order_set(self, request, *args, **kwargs):
         """get the orders associated with this Customer instance if available"""
-        instance = self.get_object()
-        data = instance.order_set.all()
-        if data:
-            try:
-                serializer = OrderSerializer(data, many=True)
-                return Response(serializer.data, status.HTTP_200_OK)
-            except Exception as err:
-                return Response(str(err), status.HTTP_500_INTERNAL_SERVER_ERROR)
-        else:
-            return Response("No orders available for this customer ", status.HTTP_404_NOT_FOUND)
+        return self.list_related(request, OrderViewSet, "customer", "No orders available for this customer ")
 
 
-class InvoiceViewSet(viewsets.ReadOnlyModelViewSet):
+class InvoiceViewSet(
+    ExportMixin, ResponseCacheMixin, ConditionalGetMixin, ValuesListMixin, QueryPlanMixin, viewsets.ReadOnlyModelViewSet
+):
     """API endpoint that allows Invoices to be viewed"""
 
     model = Invoice
+    queryset = model.objects.all()
     serializer_class = InvoiceSerializer
+    values_serializer_class = InvoiceValuesSerializer
     filterset_class = InvoiceFilterSet
-
-    def get_queryset(self):
-        queryset = self.model.objects.all().select_related(
-            "order",
-            "product",
-        )
-
-        if is_expanded(self.request, "order"):
-            queryset = queryset.select_related(
-                "order__status",
-                "order__customer",
-            )
-
-        if is_expanded(self.request, "product"):
-            queryset = queryset.select_related(
-                "product__brand",
-            )
-
-        return queryset
-
-
-class OrderViewSet(viewsets.ReadOnlyModelViewSet):
+    conditional_models = [Order, Product, Customer, OrderStatus, Brand]
+    export_fields = [
+        ("id", "id"),
+        ("order", "order_id"),
+        ("product", "product_id"),
+        ("created_at", "created_at"),
+        ("updated_at", "updated_at"),
+    ]
+
+
+class OrderViewSet(
+    BatchRetrieveMixin,
+    ExportMixin,
+    ResponseCacheMixin,
+    ConditionalGetMixin,
+    ValuesListMixin,
+    QueryPlanMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
     """API endpoint that allows Orders to be viewed"""
 
     model = Order
+    queryset = model.objects.all()
     serializer_class = OrderSerializer
+    values_serializer_class = OrderValuesSerializer
     filterset_class = OrderFilterSet
+    conditional_models = [Customer, OrderStatus]
+    cache_models = [Invoice]
+    export_fields = [
+        ("order_id", "order_id"),
+        ("customer", "customer_id"),
+        ("status", "status__name"),
+        ("created_at", "created_at"),
+        ("updated_at", "updated_at"),
+    ]
+
+    @action(detail=False, methods=["post"])
+    def bulk_create(self, request, *args, **kwargs):
+        """create a batch of orders, and an invoice per product line, from a list of orders"""
+        if not isinstance(request.data, list):
+            return Response("Expected a list of orders", status.HTTP_400_BAD_REQUEST)
+        max_items = getattr(settings, "STOREMGR_BULK_MAX_ITEMS", 10000)
+        if len(request.data) > max_items:
+            return Response(f"Too many orders; send at most {max_items} per request", status.HTTP_400_BAD_REQUEST)
+        result = bulk_create_orders(request.data)
+        return Response(result, status.HTTP_201_CREATED if result["created"] else status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=["get"])
     def invoice_set(self, request, *args, **kwargs):
         """get the invoices associated with this Order instance if available"""
-        instance = self.get_object()
-        data = instance.invoice_set.all()
-        if data:
-            try:
-                serializer = InvoiceSerializer(data, many=True)
-                return Response(serializer.data, status.HTTP_200_OK)
-            except Exception as err:
-                return Response(str(err), status.HTTP_500_INTERNAL_SERVER_ERROR)
-        else:
-            return Response("No invoices available for this order ", status.HTTP_404_NOT_FOUND)
+        return self.list_related(request, InvoiceViewSet, "order", "No invoices available for this order ")
 
     @action(detail=True, methods=["get"])
     def products(self, request, *args, **kwargs):
         """get the products associated with this Order instance if available"""
-        instance = self.get_object()
-        data = instance.products.all()
-        if data:
-            try:
-                serializer = ProductSerializer(data, many=True)
-                return Response(serializer.data, status.HTTP_200_OK)
-            except Exception as err:
-                return Response(str(err), status.HTTP_500_INTERNAL_SERVER_ERROR)
-        else:
-            return Response("No products available for this order ", status.HTTP_404_NOT_FOUND)
-
-    def get_queryset(self):
-        queryset = self.model.objects.all().select_related(
-            "customer",
-            "status",
-        )
-
-        if is_expanded(self.request, "customer"):
-            queryset = queryset.select_related("customer")
-
-        if is_expanded(self.request, "status"):
-            queryset = queryset.select_related("status")
-
-        return queryset
+        return self.list_related(request, ProductViewSet, "order", "No products available for this order ")
 
 
-class OrderStatusViewSet(viewsets.ReadOnlyModelViewSet):
+class OrderStatusViewSet(
+    ResponseCacheMixin, ConditionalGetMixin, RelatedListMixin, QueryPlanMixin, viewsets.ReadOnlyModelViewSet
+):
     """API endpoint that allows OrderStatuss to be viewed"""
 
     model = OrderStatus
@@ -170,79 +340,57 @@ class OrderStatusViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=True, methods=["get"])
     def order_set(self, request, *args, **kwargs):
         """get the orders associated with this OrderStatus instance if available"""
-        instance = self.get_object()
-        data = instance.order_set.all()
-        if data:
-            try:
-                serializer = OrderSerializer(data, many=True)
-                return Response(serializer.data, status.HTTP_200_OK)
-            except Exception as err:
-                return Response(str(err), status.HTTP_500_INTERNAL_SERVER_ERROR)
-        else:
-            return Response("No orders available for this orderstatus ", status.HTTP_404_NOT_FOUND)
-
-
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+        return self.list_related(request, OrderViewSet, "status", "No orders available for this orderstatus ")
+
+
+class ProductViewSet(
+    BatchRetrieveMixin,
+    ExportMixin,
+    ResponseCacheMixin,
+    ConditionalGetMixin,
+    ValuesListMixin,
+    QueryPlanMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
     """API endpoint that allows Products to be viewed"""
 
     model = Product
+    queryset = model.objects.all()
     serializer_class = ProductSerializer
+    values_serializer_class = ProductValuesSerializer
     filterset_class = ProductFilterSet
+    conditional_models = [Brand]
+    cache_models = [Invoice]
+    export_fields = [
+        ("sku", "sku"),
+        ("brand", "brand__name"),
+        ("description", "description"),
+        ("enabled", "enabled"),
+        ("created_at", "created_at"),
+        ("updated_at", "updated_at"),
+    ]
 
     @action(detail=True, methods=["get"])
     def invoice_set(self, request, *args, **kwargs):
         """get the invoices associated with this Product instance if available"""
-        instance = self.get_object()
-        data = instance.invoice_set.all()
-        if data:
-            try:
-                serializer = InvoiceSerializer(data, many=True)
-                return Response(serializer.data, status.HTTP_200_OK)
-            except Exception as err:
-                return Response(str(err), status.HTTP_500_INTERNAL_SERVER_ERROR)
-        else:
-            return Response("No invoices available for this product ", status.HTTP_404_NOT_FOUND)
+        return self.list_related(request, InvoiceViewSet, "product", "No invoices available for this product ")
 
     @action(detail=True, methods=["get"])
     def order_set(self, request, *args, **kwargs):
         """get the orders associated with this Product instance if available"""
-        instance = self.get_object()
-        data = instance.order_set.all()
-        if data:
-            try:
-                serializer = OrderSerializer(data, many=True)
-                return Response(serializer.data, status.HTTP_200_OK)
-            except Exception as err:
-                return Response(str(err), status.HTTP_500_INTERNAL_SERVER_ERROR)
-        else:
-            return Response("No orders available for this product ", status.HTTP_404_NOT_FOUND)
+        return self.list_related(request, OrderViewSet, "products", "No orders available for this product ")
 
     @action(detail=True, methods=["get"])
     def attributes(self, request, *args, **kwargs):
         """get the attributess associated with this Product instance if available"""
-        instance = self.get_object()
-        data = instance.attributes.all()
-        if data:
-            try:
-                serializer = ProductAttributeSerializer(data, many=True)
-                return Response(serializer.data, status.HTTP_200_OK)
-            except Exception as err:
-                return Response(str(err), status.HTTP_500_INTERNAL_SERVER_ERROR)
-        else:
-            return Response("No attributess available for this product ", status.HTTP_404_NOT_FOUND)
-
-    def get_queryset(self):
-        queryset = self.model.objects.all().select_related(
-            "brand",
+        return self.list_related(
+            request, ProductAttributeViewSet, "product", "No attributess available for this product "
         )
 
-        if is_expanded(self.request, "brand"):
-            queryset = queryset.select_related("brand")
-
-        return queryset
 
-
-class ProductAttributeViewSet(viewsets.ReadOnlyModelViewSet):
+class ProductAttributeViewSet(
+    ResponseCacheMixin, ConditionalGetMixin, RelatedListMixin, QueryPlanMixin, viewsets.ReadOnlyModelViewSet
+):
     """API endpoint that allows ProductAttributes to be viewed"""
 
     model = ProductAttribute
@@ -253,13 +401,49 @@ class ProductAttributeViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=True, methods=["get"])
     def product_set(self, request, *args, **kwargs):
         """get the products associated with this ProductAttribute instance if available"""
-        instance = self.get_object()
-        data = instance.product_set.all()
-        if data:
-            try:
-                serializer = ProductSerializer(data, many=True)
-                return Response(serializer.data, status.HTTP_200_OK)
-            except Exception as err:
-                return Response(str(err), status.HTTP_500_INTERNAL_SERVER_ERROR)
-        else:
-            return Response("No products available for this productattribute ", status.HTTP_404_NOT_FOUND)
+        return self.list_related(
+            request, ProductViewSet, "attributes", "No products available for this productattribute "
+        )
+
+
+class AutocompleteViewSet(viewsets.ViewSet):
+    """
+    API endpoint suggesting values as a user types. Query parameters: source (brand, customer, order_id or sku), q (the
+    typed prefix) and limit. Suggestions come from an in-memory prefix index in each worker, not from the database.
+    """
+
+    def list(self, request, *args, **kwargs):
+        source = request.query_params.get("source")
+        if source not in AUTOCOMPLETE_SOURCES:
+            return Response(
+                f"Unknown autocomplete source: {source}; choose from {', '.join(AUTOCOMPLETE_SOURCES)}",
+                status.HTTP_400_BAD_REQUEST,
+            )
+        max_limit = getattr(settings, "STOREMGR_AUTOCOMPLETE_MAX_LIMIT", 50)
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= max_limit:
+            return Response(f"limit must be between 1 and {max_limit}", status.HTTP_400_BAD_REQUEST)
+        return Response(autocomplete(source, request.query_params.get("q", ""), limit), status.HTTP_200_OK)
+
+
+class SearchViewSet(viewsets.ViewSet):
+    """
+    API endpoint searching brands, manufacturers, products, customers and orders through the full-text index at once.
+    Query parameters: q (search text), type (comma separated: brand, customer, manufacturer, order, product), limit
+    (hits per type) and offset (hits per type to skip). Hits are grouped by type, best match first; a group's
+    has_more tells whether the next offset returns more, and truncated that the type has more matches than the ranked
+    batches reach, which a more specific q finds.
+    """
+
+    def list(self, request, *args, **kwargs):
+        try:
+            options = get_search_options(request.query_params)
+        except ValueError as err:
+            return Response(str(err), status.HTTP_400_BAD_REQUEST)
+        return Response(
+            dict(query=options["text"], offset=options["offset"], results=global_search(**options)),
+            status.HTTP_200_OK,
+        )
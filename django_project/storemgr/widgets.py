@@ -0,0 +1,26 @@
+""" form widgets for applicable app forms """
+
+from django import forms
+from django.urls import reverse_lazy
+
+
+class AutocompleteWidget(forms.TextInput):
+    """
+    A text input suggesting values from the autocomplete endpoint as the user types, so a form renders no choice list
+    however large the table is. By default the typed text is only a search: the field submits the value of the chosen
+    suggestion (a primary key). With free_text, the field submits the typed text, and suggestions only complete it.
+    """
+
+    template_name = "storemgr/widgets/autocomplete.html"
+    url = reverse_lazy("storemgr:autocomplete-list")
+
+    def __init__(self, source, free_text=False, limit=10, attrs=None):
+        super().__init__(attrs={"class": "form-control", **(attrs or {})})
+        self.source = source
+        self.free_text = free_text
+        self.limit = limit
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"].update(source=self.source, free_text=self.free_text, limit=self.limit, url=str(self.url))
+        return context
@@ -0,0 +1,179 @@
+import django
+import os
+import shutil
+import tempfile
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from model_bakery import baker
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+django.setup()
+
+from storemgr import autocomplete
+from storemgr.autocomplete import get_cache
+from storemgr.forms import FilterOrderForm, FilterProductForm
+
+# the autocomplete cache of the tests, apart from the one of any running server
+CACHE_LOCATION = tempfile.mkdtemp()
+CACHES = dict(settings.CACHES, storemgr_autocomplete=dict(settings.CACHES['storemgr_autocomplete'],
+                                                          LOCATION=CACHE_LOCATION))
+
+
+def tearDownModule():
+    shutil.rmtree(CACHE_LOCATION, ignore_errors=True)
+
+
+@override_settings(CACHES=CACHES)
+class AutocompleteTests(TestCase):
+    """ test the in-memory prefix indexes and their refresh from published changes """
+    def setUp(self):
+        autocomplete._indexes.clear()
+        get_cache().clear()
+        self.customer = baker.make('storemgr.Customer', first_name='Ada', last_name='Lovelace')
+        self.other_customer = baker.make('storemgr.Customer', first_name='Adam', last_name='Smith')
+        self.product_list = [baker.make('storemgr.Product', sku=f'AC-{i:03}') for i in range(12)]
+
+    def test_lookup(self):
+        """ verify prefix matching on either name order, limits and ordering """
+        self.assertEqual([i['value'] for i in autocomplete.autocomplete('customer', 'ada')],
+                         [self.customer.pk, self.other_customer.pk])
+        self.assertEqual([i['value'] for i in autocomplete.autocomplete('customer', 'smith ad')], [self.other_customer.pk])
+        self.assertEqual(autocomplete.autocomplete('customer', 'LOVEL'),
+                         [dict(value=self.customer.pk, label=f'Ada Lovelace ({self.customer.pk})')])
+        self.assertEqual([i['value'] for i in autocomplete.autocomplete('sku', 'ac-00', 5)],
+                         ['AC-000', 'AC-001', 'AC-002', 'AC-003', 'AC-004'])
+        self.assertEqual(len(autocomplete.autocomplete('sku', 'ac-0', 50)), 12)
+        self.assertEqual(autocomplete.autocomplete('sku', ' '), [])
+
+    def test_refresh(self):
+        """ verify published saves and deletes reach a loaded index without reloading it """
+        autocomplete.autocomplete('sku', 'ac')
+        with self.captureOnCommitCallbacks(execute=True):
+            product = baker.make('storemgr.Product', sku='AC-NEW')
+            self.product_list[0].delete()
+        with self.assertNumQueries(0):
+            values = [i['value'] for i in autocomplete.autocomplete('sku', 'ac', 50)]
+        self.assertIn(product.pk, values)
+        self.assertNotIn('AC-000', values)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.last_name = 'Byron'
+            self.customer.save()
+        self.assertEqual(autocomplete.autocomplete('customer', 'byr')[0]['value'], self.customer.pk)
+        self.assertEqual(autocomplete.autocomplete('customer', 'lovel'), [])
+
+    def test_unchanged_save(self):
+        """ verify saves publish only when they change what a source reads, and order and product saves never do """
+        with self.captureOnCommitCallbacks(execute=True):
+            order = baker.make('storemgr.Order', order_id='OR-000001')
+        generations = {i: autocomplete.get_generation(i) for i in autocomplete.AUTOCOMPLETE_SOURCES}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.email = 'ada@example.com'
+            self.customer.save()
+            self.product_list[0].description = 'changed'
+            self.product_list[0].save()
+            order.status = baker.make('storemgr.OrderStatus')
+            order.save()
+            self.customer.save(update_fields=['email'])
+        self.assertEqual({i: autocomplete.get_generation(i) for i in generations}, generations)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.first_name = 'Augusta'
+            self.customer.save()
+        self.assertEqual(autocomplete.get_generation('customer'), generations['customer'] + 1)
+
+    def test_publish(self):
+        """ verify a publish numbered like another takes the next number, and old deltas are dropped """
+        generation = autocomplete.get_generation('sku')
+        # as if a non-atomic incr gave another publisher the next number too
+        get_cache().set(autocomplete.get_delta_key('sku', generation + 1), [], timeout=None)
+        autocomplete.publish('sku', [('delete', 'AC-000')])
+        self.assertEqual(autocomplete.get_generation('sku'), generation + 2)
+        self.assertEqual(get_cache().get(autocomplete.get_delta_key('sku', generation + 2)), [('delete', 'AC-000')])
+        with override_settings(STOREMGR_AUTOCOMPLETE_MAX_DELTAS=1):
+            autocomplete.publish('sku', [('delete', 'AC-001')])
+        self.assertIsNone(get_cache().get(autocomplete.get_delta_key('sku', generation + 2)))
+
+    def test_lost_generation(self):
+        """ verify a lost sequence restarts above the generations numbered before """
+        generation = autocomplete.get_generation('sku')
+        get_cache().clear()
+        self.assertGreater(autocomplete.get_generation('sku'), generation)
+
+    def test_concurrent_publish(self):
+        """ verify publishes never share a generation, and one left behind the cached generation is picked up later """
+        autocomplete.autocomplete('sku', 'ac')
+        with self.captureOnCommitCallbacks(execute=True):
+            first = baker.make('storemgr.Product', sku='AC-FIRST')
+        with self.captureOnCommitCallbacks(execute=True):
+            second = baker.make('storemgr.Product', sku='AC-SECOND')
+        generation = get_cache().get(autocomplete.get_generation_key('sku'))
+        # as if the publisher of the first change raised the cached generation last
+        get_cache().set(autocomplete.get_generation_key('sku'), generation - 1, timeout=None)
+        self.assertEqual(autocomplete.autocomplete('sku', 'ac-first'), [dict(value=first.pk, label=first.pk)])
+        with self.captureOnCommitCallbacks(execute=True):
+            baker.make('storemgr.Product', sku='AC-THIRD')
+        with self.assertNumQueries(0):
+            self.assertEqual(len(autocomplete.autocomplete('sku', 'ac-', 50)), 15)
+        self.assertEqual(autocomplete.autocomplete('sku', 'ac-sec'), [dict(value=second.pk, label=second.pk)])
+
+    def test_refresh_does_not_block(self):
+        """ verify lookups go on with the current snapshot while another thread builds the next one """
+        autocomplete.autocomplete('sku', 'ac')
+        index = autocomplete.get_index('sku')
+        with self.captureOnCommitCallbacks(execute=True):
+            baker.make('storemgr.Product', sku='AC-NEW')
+        with index.refresh_lock:
+            self.assertEqual(autocomplete.autocomplete('sku', 'ac-n'), [])
+        self.assertEqual(autocomplete.autocomplete('sku', 'ac-n'), [dict(value='AC-NEW', label='AC-NEW')])
+
+    def test_endpoint(self):
+        """ verify the autocomplete endpoint """
+        self.client.force_login(baker.make('auth.User'))
+        url = reverse('storemgr:autocomplete-list')
+        response = self.client.get(url, {'source': 'sku', 'q': 'ac-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([i['value'] for i in response.json()], ['AC-010', 'AC-011'])
+        self.assertEqual(self.client.get(url, {'source': 'invoice', 'q': 'a'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'source': 'sku', 'q': 'a', 'limit': 0}).status_code, 400)
+
+    def test_filter_forms(self):
+        """ verify the filter forms render no choice lists of the autocompleted tables """
+        with self.assertNumQueries(0):
+            html = str(FilterProductForm())
+        self.assertNotIn('AC-000', html)
+        self.assertIn('data-autocomplete-source="brand"', html)
+        with self.assertNumQueries(1):
+            html = str(FilterOrderForm())
+        self.assertIn('data-autocomplete-source="customer"', html)
+
+
+@override_settings(CACHES=CACHES, STOREMGR_AUTOCOMPLETE_MAX_DELTAS=1)
+class AutocompleteReloadTests(TransactionTestCase):
+    """ test the background reload of an index that fell too far behind, on committed rows a thread can read """
+    def setUp(self):
+        autocomplete._indexes.clear()
+        get_cache().clear()
+        baker.make('storemgr.Product', sku='AC-000')
+
+    def test_reload(self):
+        """ verify lookups go on with the current snapshot while the index reloads in the background """
+        autocomplete.autocomplete('sku', 'ac')
+        index = autocomplete.get_index('sku')
+        baker.make('storemgr.Product', sku='AC-NEW')
+        baker.make('storemgr.Product', sku='AC-NEWER')
+        with self.assertNumQueries(0):
+            self.assertEqual(autocomplete.autocomplete('sku', 'ac-n'), [])
+        # the refresh lock is held until the reload is swapped in
+        with index.refresh_lock:
+            pass
+        self.assertEqual([i['value'] for i in autocomplete.autocomplete('sku', 'ac-n')], ['AC-NEW', 'AC-NEWER'])
+
+    def test_lost_deltas(self):
+        """ verify an index reloads when the published changes it missed are gone """
+        autocomplete.autocomplete('sku', 'ac')
+        index = autocomplete.get_index('sku')
+        baker.make('storemgr.Product', sku='AC-NEW')
+        get_cache().delete(autocomplete.get_delta_key('sku', index.generation + 1))
+        autocomplete.autocomplete('sku', 'ac-n')
+        with index.refresh_lock:
+            pass
+        self.assertEqual(autocomplete.autocomplete('sku', 'ac-n'), [dict(value='AC-NEW', label='AC-NEW')])
@@ -0,0 +1,45 @@
+import django
+import os
+from django.test import TestCase
+from model_bakery import baker
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+django.setup()
+
+from storemgr.charts import count_by
+from storemgr.models import Invoice
+
+
+class ChartTests(TestCase):
+    """ test that chart series count distinct orders per label in one query """
+    def setUp(self):
+        self.manufacturer = baker.make('storemgr.Manufacturer')
+        self.brand = baker.make('storemgr.Brand', manufacturer=self.manufacturer)
+        self.product = baker.make('storemgr.Product', brand=self.brand)
+        self.other_product = baker.make('storemgr.Product', brand=self.brand)
+        self.status = baker.make('storemgr.OrderStatus', name='open')
+        self.order = baker.make('storemgr.Order', status=self.status)
+        self.other_order = baker.make('storemgr.Order', status=self.status)
+        baker.make('storemgr.Invoice', order=self.order, product=self.product, _quantity=2)
+        baker.make('storemgr.Invoice', order=self.order, product=self.other_product)
+        baker.make('storemgr.Invoice', order=self.other_order, product=self.product)
+        baker.make('storemgr.Invoice', product=baker.make('storemgr.Product'))
+
+    def test_count_by(self):
+        """ verify repeated lines of an order count once per label """
+        rows = count_by(Invoice.objects.filter(product__brand=self.brand), 'product_id', 'order_id')
+        self.assertEqual(rows, sorted([(self.product.pk, 2), (self.other_product.pk, 1)]))
+
+    def test_detail_charts(self):
+        """ verify the brand and manufacturer charts, one query each """
+        with self.assertNumQueries(1):
+            chart = self.brand.get_orders_by_status()
+        self.assertEqual((chart['label_list'], chart['value_list']), (['open'], [2]))
+        self.assertEqual(len(chart['color_list']), 1)
+        with self.assertNumQueries(1):
+            chart = self.brand.get_orders_by_product()
+        self.assertEqual(dict(zip(chart['label_list'], chart['value_list'])),
+                         {self.product.pk: 2, self.other_product.pk: 1})
+        with self.assertNumQueries(1):
+            chart = self.manufacturer.get_orders_by_product()
+        self.assertEqual(chart['value_list'], [count for _, count in sorted(
+            [(self.product.pk, 2), (self.other_product.pk, 1)])])
@@ -0,0 +1,135 @@
+import django
+import os
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from model_bakery import baker
+from unittest.mock import patch
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+django.setup()
+
+from storemgr.counters import (count_orders_by_brand, count_orders_by_status, count_totals, fold_deltas,
+                               get_all_counters, rebuild_counters)
+from storemgr.models import AggregateCounter, CounterDelta
+
+
+class CounterTests(TestCase):
+    """ test that signal-maintained counters match counts taken from the source tables """
+    def setUp(self):
+        rebuild_counters()
+        self.brand = baker.make('storemgr.Brand')
+        self.other_brand = baker.make('storemgr.Brand')
+        self.product = baker.make('storemgr.Product', brand=self.brand)
+        self.other_product = baker.make('storemgr.Product', brand=self.other_brand)
+        self.status = baker.make('storemgr.OrderStatus')
+        self.order = baker.make('storemgr.Order', status=self.status)
+
+    def assertCountersMatch(self):
+        """ compare the maintained counters with freshly counted values """
+        counters = get_all_counters()
+        self.assertEqual(counters.get('total'), count_totals())
+        self.assertEqual({k: v for k, v in counters.get('orders_by_brand', {}).items() if v},
+                         {str(k): v for k, v in count_orders_by_brand().items()})
+        self.assertEqual({k: v for k, v in counters.get('orders_by_status', {}).items() if v},
+                         {str(k): v for k, v in count_orders_by_status().items()})
+
+    def test_create(self):
+        """ verify counters follow row creation, including repeated products of one brand in an order """
+        baker.make('storemgr.Invoice', order=self.order, product=self.product, _quantity=2)
+        baker.make('storemgr.Invoice', order=self.order, product=self.other_product)
+        self.assertEqual(get_all_counters()['orders_by_brand'][str(self.brand.pk)], 1)
+        self.assertCountersMatch()
+
+    def test_update(self):
+        """ verify counters follow status, brand, enabled and invoice changes """
+        invoice = baker.make('storemgr.Invoice', order=self.order, product=self.product)
+        self.order.status = baker.make('storemgr.OrderStatus')
+        self.order.save()
+        self.product.enabled = False
+        self.product.save()
+        invoice.product = self.other_product
+        invoice.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_product.brand = self.brand
+            self.other_product.save()
+        self.brand.disable()
+        self.assertCountersMatch()
+
+    def test_delete(self):
+        """ verify counters follow deletes, including cascades """
+        baker.make('storemgr.Invoice', order=self.order, product=self.product, _quantity=3)
+        other_order = baker.make('storemgr.Order', status=self.status)
+        baker.make('storemgr.Invoice', order=other_order, product=self.product)
+        self.order.delete()
+        self.assertCountersMatch()
+        self.other_product.delete()
+        self.status.delete()
+        self.assertCountersMatch()
+
+    def test_m2m(self):
+        """ verify counters follow Order.products add/remove/clear """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.products.add(self.product, self.other_product)
+        self.assertCountersMatch()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.products.remove(self.product)
+        self.assertCountersMatch()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.products.clear()
+        self.assertCountersMatch()
+
+    def test_fold(self):
+        """ verify writers append deltas without touching counter rows, and folding them keeps the values """
+        fold_deltas()
+        with CaptureQueriesContext(connection) as queries:
+            baker.make('storemgr.Order', status=self.status, _quantity=3)
+        self.assertFalse([i for i in queries if 'UPDATE "storemgr_aggregatecounter"' in i['sql']])
+        self.assertTrue(CounterDelta.objects.exists())
+        self.assertCountersMatch()
+        counters = get_all_counters()
+        # orders and customers totals, orders by status
+        self.assertEqual(fold_deltas(), 3)
+        self.assertFalse(CounterDelta.objects.exists())
+        self.assertEqual(get_all_counters(), counters)
+        self.assertEqual(fold_deltas(), 0)
+
+    @override_settings(STOREMGR_COUNTER_FOLD_THRESHOLD=4)
+    def test_auto_fold(self):
+        """ verify writes fold the pending deltas once every threshold deltas, so reads sum a bounded number of rows """
+        fold_deltas()
+        for _ in range(6):
+            with self.captureOnCommitCallbacks(execute=True):
+                baker.make('storemgr.Order', status=self.status)
+            self.assertLessEqual(CounterDelta.objects.count(), 4)
+        self.assertCountersMatch()
+
+    def test_fold_keeps_later_deltas(self):
+        """ verify a fold deletes only the delta rows it summed """
+        baker.make('storemgr.Order', status=self.status)
+        original = CounterDelta.objects.filter
+
+        def filter_and_insert(*args, **kwargs):
+            # a delta committed by another writer after the fold read its rows
+            if 'pk__in' in kwargs and not CounterDelta.objects.filter(key='late').exists():
+                CounterDelta.objects.create(dimension='total', key='late', delta=1)
+            return original(*args, **kwargs)
+
+        with patch.object(CounterDelta.objects, 'filter', side_effect=filter_and_insert):
+            fold_deltas()
+        self.assertEqual(list(CounterDelta.objects.values_list('key', 'delta')), [('late', 1)])
+        self.assertFalse(AggregateCounter.objects.filter(key='late').exists())
+
+    def test_dashboard_query_count(self):
+        """ verify the dashboard query count does not grow with the number of brands, statuses or orders """
+        self.client.force_login(baker.make('auth.User'))
+        url = reverse('storemgr:dashboard')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as before:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        baker.make('storemgr.Brand', _quantity=5)
+        baker.make('storemgr.Order', _quantity=5)
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(url)
+        self.assertEqual(len(before), len(after))
@@ -0,0 +1,99 @@
+import django
+import os
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+django.setup()
+
+
+@override_settings(STOREMGR_FRAGMENT_CACHE_TIMEOUT=0)
+class DetailPageTests(TestCase):
+    """ test that brand and manufacturer detail pages run each relation query once, whatever the number of rows """
+    def setUp(self):
+        self.client.force_login(baker.make('auth.User'))
+        self.manufacturer = baker.make('storemgr.Manufacturer')
+        self.brand = baker.make('storemgr.Brand', manufacturer=self.manufacturer)
+        self.add_orders(2)
+
+    def add_orders(self, quantity):
+        """ add orders of two products of the brand each """
+        product_list = baker.make('storemgr.Product', brand=self.brand, _quantity=2)
+        for order in baker.make('storemgr.Order', _quantity=quantity):
+            order.products.add(*product_list)
+
+    def assertPageQueries(self, url, num):
+        """ verify the page query count, before and after adding rows; 9 of them are session, user and menu queries """
+        self.client.get(url)
+        with self.assertNumQueries(num):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.add_orders(3)
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_brand(self):
+        """ verify the brand page: object, products, order count, orders and two charts """
+        response = self.assertPageQueries(self.brand.get_absolute_url(), 15)
+        self.assertEqual(len(response.context['object'].get_orders()), 5)
+
+    def test_manufacturer(self):
+        """ verify the manufacturer page: object, brands, products, order count and a chart """
+        response = self.assertPageQueries(self.manufacturer.get_absolute_url(), 14)
+        self.assertEqual(response.context['object'].get_orders().count(), 5)
+
+    def test_memoize(self):
+        """ verify helpers return the same result for the life of the instance """
+        self.assertIs(self.brand.get_orders(), self.brand.get_orders())
+        self.assertEqual(len(self.brand.get_orders()), 2)
+        with self.assertNumQueries(0):
+            list(self.brand.get_orders())
+
+
+class FragmentCacheTests(TestCase):
+    """ test that detail page fragments are served from the cache until the object or a related model changes """
+    def setUp(self):
+        self.client.force_login(baker.make('auth.User'))
+        self.brand = baker.make('storemgr.Brand')
+        self.product = baker.make('storemgr.Product', brand=self.brand)
+        self.order = baker.make('storemgr.Order')
+        self.order.products.add(self.product)
+
+    def test_brand(self):
+        """ verify a repeated page view runs only the object query of its own, and changes show on the next view """
+        url = self.brand.get_absolute_url()
+        self.client.get(url)
+        with self.assertNumQueries(10):
+            response = self.client.get(url)
+        self.assertContains(response, self.order.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = baker.make('storemgr.Order')
+            order.products.add(self.product)
+        self.assertContains(self.client.get(url), order.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.description = 'refreshed description'
+            self.product.save()
+        self.assertContains(self.client.get(url), 'refreshed description')
+        self.brand.name = 'renamed brand'
+        self.brand.save()
+        self.assertContains(self.client.get(url), 'products__brand__name=renamed brand')
+
+    def test_other_brand_orders(self):
+        """ verify orders of other brands leave the fragments of a brand and its manufacturer cached """
+        urls = [self.brand.get_absolute_url(), self.brand.manufacturer.get_absolute_url()]
+        for url in urls:
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = baker.make('storemgr.Order', status=self.order.status)
+            order.products.add(baker.make('storemgr.Product'))
+        for url in urls:
+            with self.assertNumQueries(10):
+                self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.products.add(self.product)
+        self.assertContains(self.client.get(urls[0]), order.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(urls[1])
+        self.assertGreater(len(queries), 10)
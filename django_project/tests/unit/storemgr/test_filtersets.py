@@ -0,0 +1,61 @@
+import django
+import os
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from model_bakery import baker
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+django.setup()
+
+from storemgr.filtersets import BrandFilterSet, OrderFilterSet, ProductAttributeFilterSet, ProductFilterSet
+from storemgr.models import Brand, Order, Product, ProductAttribute
+
+
+class ExistsFilterTests(TestCase):
+    """ test that to-many relation filters compiled to EXISTS match the JOIN based filters, without duplicates """
+    def setUp(self):
+        self.brand = baker.make('storemgr.Brand')
+        self.product = baker.make('storemgr.Product', brand=self.brand)
+        self.other_product = baker.make('storemgr.Product', brand=self.brand)
+        self.attribute = baker.make('storemgr.ProductAttribute', key='color')
+        self.product.attributes.add(self.attribute)
+        self.order = baker.make('storemgr.Order')
+        self.order.products.add(self.product, self.other_product)
+        baker.make('storemgr.Invoice', order=self.order, product=self.product, _quantity=2)
+        baker.make('storemgr.Invoice', order=self.order, product=self.other_product)
+        self.empty_order = baker.make('storemgr.Order')
+        baker.make('storemgr.Brand')
+
+    def filter(self, filterset_class, queryset, query):
+        """ get the pks of queryset filtered with a query string, in order """
+        return list(filterset_class(QueryDict(query), queryset=queryset).qs.values_list('pk', flat=True))
+
+    def assertFilterMatches(self, filterset_class, queryset, query):
+        """ compare the EXISTS filters with the JOIN based ones; rows must match once each """
+        result = self.filter(filterset_class, queryset, query)
+        with override_settings(STOREMGR_EXISTS_FILTERS=False):
+            expected = self.filter(filterset_class, queryset, query)
+        self.assertEqual(len(result), len(set(result)))
+        self.assertEqual(result, list(dict.fromkeys(expected)))
+        return result
+
+    def test_has_filters(self):
+        """ verify has_* filters, their negation and ! exclusion """
+        orders = Order.objects.all()
+        self.assertEqual(self.assertFilterMatches(OrderFilterSet, orders, 'has_invoice=true'), [self.order.pk])
+        self.assertEqual(self.assertFilterMatches(OrderFilterSet, orders, 'has_invoice=false'), [self.empty_order.pk])
+        self.assertEqual(self.assertFilterMatches(OrderFilterSet, orders, 'has_products!=true'), [self.empty_order.pk])
+        self.assertFilterMatches(OrderFilterSet, orders, 'has_products=true')
+        self.assertFilterMatches(BrandFilterSet, Brand.objects.all(), 'has_product=true')
+        self.assertFilterMatches(BrandFilterSet, Brand.objects.all(), 'has_product=false')
+        self.assertFilterMatches(ProductFilterSet, Product.objects.all(), 'has_attributes=true&has_order=true')
+        self.assertFilterMatches(ProductAttributeFilterSet, ProductAttribute.objects.all(), 'has_product=false')
+
+    def test_related_filters(self):
+        """ verify nested related filters across reverse foreign keys and many-to-many fields """
+        orders = Order.objects.all()
+        query = f'invoice__product__brand__name={self.brand.name}'
+        self.assertEqual(self.assertFilterMatches(OrderFilterSet, orders, query), [self.order.pk])
+        query = f'products__attributes__key=color&customer__customer_id={self.order.customer_id}'
+        self.assertEqual(self.assertFilterMatches(OrderFilterSet, orders, query), [self.order.pk])
+        query = f'product__invoice__order__order_id={self.order.pk}'
+        self.assertEqual(self.assertFilterMatches(BrandFilterSet, Brand.objects.all(), query), [self.brand.pk])
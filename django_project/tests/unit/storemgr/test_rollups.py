@@ -0,0 +1,86 @@
+import datetime
+import django
+import os
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+django.setup()
+
+from storemgr.models import DailyRollup, Order
+from storemgr.rollups import get_watermark, load_series, update_rollups
+from storemgr.views.report import RollupReportMixin, StoreMgrAnnualStatView
+
+
+class RollupTests(TestCase):
+    """ test daily rollups and the report views built on them """
+    def setUp(self):
+        self.now = timezone.now()
+        for days_ago in [0, 0, 1, 3, 40, 200, 500]:
+            order = baker.make('storemgr.Order')
+            Order.objects.filter(pk=order.pk).update(created_at=self.now - datetime.timedelta(days=days_ago))
+
+    def assertSeriesMatch(self):
+        """ compare series counts with counts taken from the order table """
+        start = (self.now - datetime.timedelta(days=366)).date().replace(day=1)
+        series = load_series([Order], start)[Order]
+        self.assertEqual(series.count(), Order.objects.count())
+        for days_ago in [0, 2, 39, 199, 365]:
+            ts = self.now - datetime.timedelta(days=days_ago)
+            day_start = timezone.localtime(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+            self.assertEqual(series.count_gte(ts), Order.objects.filter(created_at__gte=day_start).count())
+
+    def test_update_rollups(self):
+        """ verify complete days are rolled up once and today is left to the live count """
+        days = update_rollups(Order)
+        self.assertEqual(days, 500)
+        self.assertFalse(DailyRollup.objects.filter(day=timezone.localdate()).exists())
+        self.assertEqual(update_rollups(Order), 0)
+        self.assertSeriesMatch()
+
+    def test_series_without_rollups(self):
+        """ verify series fall back to live counts when nothing has been rolled up """
+        self.assertSeriesMatch()
+
+    def test_series_with_stale_watermark(self):
+        """ verify rows created after the watermark are counted """
+        update_rollups(Order)
+        DailyRollup.objects.filter(day__gte=timezone.localdate() - datetime.timedelta(days=100)).delete()
+        self.assertSeriesMatch()
+
+    def test_report_views(self):
+        """ verify the annual report views render from rollups """
+        update_rollups(Order)
+        self.client.force_login(baker.make('auth.User'))
+        for name in ['annual_progress', 'annual_stats', 'annual_trends']:
+            response = self.client.get(reverse(f'storemgr:{name}'))
+            self.assertEqual(response.status_code, 200)
+
+    def test_report_views_without_rollups(self):
+        """ verify a report view rolls up models never rolled up rather than counting their whole table live """
+        self.client.force_login(baker.make('auth.User'))
+        response = self.client.get(reverse('storemgr:annual_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(DailyRollup.objects.filter(model_name='storemgr.order').exists())
+        orders = [i for i in response.context['dataset_list'] if i['title'] == 'Orders'][0]
+        self.assertEqual(orders['total'], Order.objects.count())
+
+    def test_report_views_refresh_rollups(self):
+        """ verify a report view rolls up the days missed since the last update, leaving only today to count live """
+        update_rollups(Order)
+        DailyRollup.objects.filter(day__gte=timezone.localdate() - datetime.timedelta(days=100)).delete()
+        self.client.force_login(baker.make('auth.User'))
+        response = self.client.get(reverse('storemgr:annual_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_watermark(Order), timezone.localdate() - datetime.timedelta(days=1))
+        self.assertSeriesMatch()
+
+    def test_default_report_data(self):
+        """ verify the report mixin's default context counts each dataset over the past day, week, month and year """
+        view = StoreMgrAnnualStatView()
+        series_list = [(i, j) for i, j in view.get_series() if i['model'] is Order]
+        data = RollupReportMixin.get_report_data(view, series_list)
+        self.assertEqual([i['title'] for i in data['dataset_list']], ['Orders'])
+        self.assertEqual(data['dataset_list'][0]['year'], Order.objects.filter(
+            created_at__gte=timezone.now() - datetime.timedelta(days=365)).count())
@@ -0,0 +1,38 @@
+import django
+import os
+from django.test import TestCase
+from model_bakery import baker
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+django.setup()
+
+from storemgr.models import Brand, Order
+from storemgr.rows import get_rows, iter_rows
+
+
+class RowTests(TestCase):
+    """ test compact rows read in one query stand in for model instances in bulk reads """
+    def setUp(self):
+        self.manufacturer = baker.make('storemgr.Manufacturer', name='acme')
+        self.brand = baker.make('storemgr.Brand', manufacturer=self.manufacturer, name='roadrunner')
+        self.order = baker.make('storemgr.Order', status=baker.make('storemgr.OrderStatus', name='open'))
+
+    def test_rows(self):
+        """ verify pk, fields, related rows, str and get_absolute_url """
+        with self.assertNumQueries(1):
+            row = get_rows(Brand.objects.all(), ['name', 'manufacturer__name'])[0]
+        self.assertEqual((row.pk, row.name), (self.brand.pk, 'roadrunner'))
+        self.assertEqual(str(row), 'roadrunner')
+        self.assertEqual(row.get_absolute_url(), self.brand.get_absolute_url())
+        self.assertEqual((row.manufacturer.pk, str(row.manufacturer)), (self.manufacturer.pk, 'acme'))
+        self.assertEqual(row.manufacturer.get_absolute_url(), self.manufacturer.get_absolute_url())
+        row = get_rows(Order.objects.all(), ['status__name', 'created_at'])[0]
+        self.assertEqual((row.pk, row.status.name, row.created_at), (self.order.pk, 'open', self.order.created_at))
+
+    def test_iter_rows(self):
+        """ verify rows streamed in chunks match the rows read at once """
+        baker.make('storemgr.Brand', manufacturer=self.manufacturer, _quantity=4)
+        queryset = Brand.objects.order_by('pk')
+        with self.assertNumQueries(1):
+            row_list = list(iter_rows(queryset, ['name', 'manufacturer__name'], chunk_size=2))
+        self.assertEqual(row_list, get_rows(queryset, ['name', 'manufacturer__name']))
+        self.assertEqual([i.pk for i in row_list], list(queryset.values_list('pk', flat=True)))
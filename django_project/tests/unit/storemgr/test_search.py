@@ -0,0 +1,155 @@
+import django
+import os
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from model_bakery import baker
+from unittest.mock import patch
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+django.setup()
+
+from storemgr.models import Brand, Customer, Order, Product, SearchDocument
+from storemgr.search import SEARCH_FIELDS, global_search, search
+
+
+class SearchTests(TestCase):
+    """ test that the full-text search index follows its source rows and matches word prefixes """
+    def setUp(self):
+        self.customer = baker.make('storemgr.Customer', first_name='Ada', last_name='Lovelace',
+                                   email='ada@example.com')
+        self.other_customer = baker.make('storemgr.Customer', first_name='Alan', last_name='Turing',
+                                         email='alan@example.org')
+        self.order = baker.make('storemgr.Order', order_id='OR-000123', customer=self.customer)
+        self.other_order = baker.make('storemgr.Order', order_id='OR-000456', customer=self.customer)
+        self.product = baker.make('storemgr.Product', sku='SKU-77', description='Stainless steel kettle')
+
+    def assertSearch(self, model, text, expected):
+        """ compare the pks found for text with the expected rows """
+        self.assertEqual(set(search(model.objects.all(), text).values_list('pk', flat=True)),
+                         {i.pk for i in expected})
+
+    def test_prefix_search(self):
+        """ verify word prefix matching on names, email, order ids, skus and descriptions """
+        self.assertSearch(Customer, 'lovel', [self.customer])
+        self.assertSearch(Customer, 'ada lovelace', [self.customer])
+        self.assertSearch(Customer, 'example.org', [self.other_customer])
+        self.assertSearch(Customer, 'ada turing', [])
+        self.assertSearch(Order, 'OR-000', [self.order, self.other_order])
+        self.assertSearch(Order, 'or-0001', [self.order])
+        self.assertSearch(Product, 'kett', [self.product])
+        self.assertSearch(Product, 'sku-77', [self.product])
+        self.assertSearch(Product, '  ', Product.objects.all())
+
+    def test_pk_types(self):
+        """ verify the document subquery is cast to the pk type of integer and text keyed models, on both paths """
+        brand = baker.make('storemgr.Brand', name='Zephyr')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertSearch(Brand, 'zeph', [brand])
+            self.assertSearch(Customer, 'lovel', [self.customer])
+        self.assertIn('CAST(d.object_pk AS integer)', queries[0]['sql'])
+        self.assertIn('CAST(d.object_pk AS varchar', queries[1]['sql'])
+        with patch('storemgr.search.get_match_sql', return_value=None):
+            self.assertSearch(Brand, 'zephyr', [brand])
+            self.assertSearch(Customer, 'lovelace', [self.customer])
+
+    def test_signals(self):
+        """ verify saves and deletes keep the index in step """
+        self.customer.last_name = 'Byron'
+        self.customer.save()
+        self.assertSearch(Customer, 'byron', [self.customer])
+        self.assertSearch(Customer, 'lovelace', [])
+        self.product.delete()
+        self.assertFalse(SearchDocument.objects.filter(model_label='storemgr.product').exists())
+        self.assertSearch(Product, 'kettle', [])
+
+    def test_unchanged_save(self):
+        """ verify saves leaving the indexed fields alone do not rewrite the search document """
+        document = SearchDocument.objects.get(model_label='storemgr.customer', object_pk=self.customer.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.customer.save()
+            self.customer.save(update_fields=['updated_at'])
+        self.assertFalse([i for i in queries if 'storemgr_searchdocument' in i['sql'] and
+                          not i['sql'].startswith('SELECT')])
+        self.assertEqual(SearchDocument.objects.get(pk=document.pk).updated_at, document.updated_at)
+
+    def test_rebuild(self):
+        """ verify the rebuild command restores a cleared index """
+        SearchDocument.objects.all().delete()
+        self.assertSearch(Order, 'OR-000123', [])
+        call_command('rebuild_search_index', stdout=open(os.devnull, 'w'))
+        self.assertSearch(Order, 'OR-000123', [self.order])
+        self.assertEqual(SearchDocument.objects.count(), sum(i.objects.count() for i in SEARCH_FIELDS))
+
+    def test_viewset_filter(self):
+        """ verify the ?search= filter of the customer and order viewsets """
+        self.client.force_login(baker.make('auth.User'))
+        response = self.client.get(reverse('storemgr:customer-list'), {'search': 'alan'})
+        self.assertEqual([i['customer_id'] for i in response.json()['results']], [self.other_customer.pk])
+        response = self.client.get(reverse('storemgr:order-list'), {'search': 'OR-000456'})
+        self.assertEqual([i['order_id'] for i in response.json()['results']], [self.other_order.pk])
+
+
+class GlobalSearchTests(TestCase):
+    """ test the global search across brands, manufacturers, products, customers and orders """
+    def setUp(self):
+        self.manufacturer = baker.make('storemgr.Manufacturer', name='Acme Industries')
+        self.brand = baker.make('storemgr.Brand', name='Acme Home', manufacturer=self.manufacturer)
+        self.product_list = [baker.make('storemgr.Product', sku=f'SKU-{i}', description=f'acme widget {i}',
+                                        brand=self.brand) for i in range(3)]
+        self.best_product = baker.make('storemgr.Product', sku='ACME', description='acme')
+        baker.make('storemgr.Customer', first_name='Wile', last_name='Coyote', email='wile@acme.com')
+
+    def test_groups(self):
+        """ verify hits are grouped by type in index order, best match first, in batches """
+        groups = global_search('acme', limit=2)
+        self.assertEqual([i['type'] for i in groups], ['brand', 'manufacturer', 'product', 'customer'])
+        products = groups[2]
+        self.assertEqual(products['results'][0]['pk'], self.best_product.pk)
+        self.assertEqual(products['results'][0]['url'], self.best_product.get_absolute_url())
+        self.assertTrue(products['has_more'])
+        next_batch = global_search('acme', model_list=[Product], limit=2, offset=2)
+        self.assertEqual(len(next_batch), 1)
+        self.assertEqual(len(next_batch[0]['results']), 2)
+        self.assertFalse(next_batch[0]['has_more'])
+        found = {i['pk'] for i in products['results'] + next_batch[0]['results']}
+        self.assertEqual(found, {i.pk for i in self.product_list + [self.best_product]})
+        self.assertEqual(global_search('acme home industries'), [])
+        self.assertEqual(global_search(''), [])
+
+    def test_truncated(self):
+        """ verify groups whose prefix matches fill the rank window say so, and others do not """
+        with override_settings(STOREMGR_SEARCH_RANK_WINDOW=3):
+            products = global_search('acme', model_list=[Product], limit=10)[0]
+            self.assertFalse(products['has_more'])
+            self.assertTrue(products['truncated'])
+        products = global_search('acme', model_list=[Product], limit=10)[0]
+        self.assertEqual(len(products['results']), 4)
+        self.assertFalse(products['truncated'])
+
+    def test_ranking(self):
+        """ verify whole word matches rank before prefix matches, and shorter documents first """
+        baker.make('storemgr.Order', order_id='OR-0001234')
+        baker.make('storemgr.Order', order_id='OR-00012')
+        baker.make('storemgr.Order', order_id='OR-000123')
+        groups = global_search('OR-000123', model_list=[Order])
+        self.assertEqual([i['pk'] for i in groups[0]['results']], ['OR-000123', 'OR-0001234'])
+        groups = global_search('OR-0001', model_list=[Order])
+        self.assertEqual([i['pk'] for i in groups[0]['results']], ['OR-00012', 'OR-000123', 'OR-0001234'])
+
+    def test_endpoint(self):
+        """ verify the search endpoint and page """
+        self.client.force_login(baker.make('auth.User'))
+        response = self.client.get(reverse('storemgr:search-list'), {'q': 'acme', 'type': 'brand,manufacturer'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([i['results'][0]['text'] for i in response.json()['results']],
+                         ['Acme Home', 'Acme Industries'])
+        response = self.client.get(reverse('storemgr:search-list'), {'q': 'acme', 'type': 'invoice'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('storemgr:search-list'), {'q': 'acme', 'limit': 0})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('storemgr:search'), {'q': 'acme', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.best_product.get_absolute_url())
+        self.assertContains(response, 'type=product&amp;offset=1')
@@ -0,0 +1,85 @@
+import django
+import os
+from django.db import transaction
+from django.test import TestCase
+from model_bakery import baker
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+django.setup()
+
+from storemgr.models import IdSequence, Order
+from storemgr.sequences import BlockIdAllocator, SequenceIdAllocator, get_allocator
+
+
+class SequenceIdAllocatorTests(TestCase):
+    """ test id reservation against the IdSequence table """
+    def setUp(self):
+        self.allocator = SequenceIdAllocator()
+
+    def test_reserve_seeds_from_existing_rows(self):
+        """ verify a new sequence starts after the highest existing id """
+        baker.make('storemgr.Order', order_id='OR-00000041')
+        self.assertEqual(self.allocator.reserve(Order, 'OR-'), 42)
+        self.assertEqual(IdSequence.objects.get(name='storemgr.order').last_value, 42)
+
+    def test_reserve_seeds_past_padding_width(self):
+        """ verify ids longer than the padding width seed the sequence by number, not string order """
+        baker.make('storemgr.Order', order_id='OR-99999999')
+        baker.make('storemgr.Order', order_id='OR-100000000')
+        self.assertEqual(self.allocator.reserve(Order, 'OR-'), 100000001)
+
+    def test_reserve_ranges_do_not_overlap(self):
+        """ verify consecutive reservations return disjoint ranges """
+        first = self.allocator.reserve(Order, 'OR-', count=10)
+        second = self.allocator.reserve(Order, 'OR-', count=10)
+        self.assertEqual(second, first + 10)
+
+
+class BlockIdAllocatorTests(TestCase):
+    """ test block-cached id allocation """
+    def setUp(self):
+        self.allocator = BlockIdAllocator(block_size=5)
+
+    def test_allocate_uses_cached_block(self):
+        """ verify ids come from the cached block and the sequence is bumped once per block """
+        # a transaction out of ids takes one alone and refills the block once it commits
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.allocator.allocate(Order, 'OR-')
+        ids = [self.allocator.allocate(Order, 'OR-') for _ in range(5)]
+        self.assertEqual(ids, list(range(first + 1, first + 6)))
+        self.assertEqual(IdSequence.objects.get(name='storemgr.order').last_value, ids[-1])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.allocator.allocate(Order, 'OR-'), ids[-1] + 1)
+        self.assertEqual(IdSequence.objects.get(name='storemgr.order').last_value, ids[-1] + 6)
+
+    def test_allocators_do_not_collide(self):
+        """ verify two allocators (as in two worker processes) never hand out the same id """
+        other = BlockIdAllocator(block_size=5)
+        ids = []
+        for _ in range(7):
+            with self.captureOnCommitCallbacks(execute=True):
+                ids += [self.allocator.allocate(Order, 'OR-'), other.allocate(Order, 'OR-')]
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_rollback_reserves_no_block(self):
+        """ verify a rolled back transaction leaves no block behind for another worker to reserve again """
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ValueError), transaction.atomic():
+                first = self.allocator.allocate(Order, 'OR-')
+                self.assertEqual(self.allocator.allocate(Order, 'OR-'), first + 1)
+                raise ValueError
+        self.assertEqual(self.allocator._blocks, {})
+        other = BlockIdAllocator(block_size=5)
+        self.assertEqual(other.allocate(Order, 'OR-'), first)
+        ids = [self.allocator.allocate(Order, 'OR-') for _ in range(5)]
+        ids += [other.allocate(Order, 'OR-') for _ in range(4)]
+        self.assertEqual(len(ids + [first]), len(set(ids + [first])))
+
+    def test_model_save_format(self):
+        """ verify saved models get prefixed, zero-padded keys """
+        get_allocator().reset()
+        order = baker.make('storemgr.Order')
+        product = baker.make('storemgr.Product')
+        customer = baker.make('storemgr.Customer')
+        self.assertRegex(order.pk, r'^OR-\d{8}$')
+        self.assertRegex(product.pk, r'^SKU-\d{8}$')
+        self.assertRegex(customer.pk, r'^CU-\d{8}$')
@@ -0,0 +1,112 @@
+import django
+import os
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from model_bakery import baker
+from unittest.mock import patch
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+django.setup()
+
+from storemgr.models import Order, Product
+from storemgr.rows import Row
+from storemgr.views.gui import ListOrders
+
+
+class ServerSideTableTests(TestCase):
+    """ test the server-side rows of the list pages: one page per request, sorted, searched and filtered """
+    def setUp(self):
+        self.client.force_login(baker.make('auth.User'))
+        self.status = baker.make('storemgr.OrderStatus', name='shipped')
+        self.order_list = baker.make('storemgr.Order', status=self.status, _quantity=7)
+        self.other_order = baker.make('storemgr.Order', order_id='OR-SEARCHME')
+
+    def get_rows(self, name, **params):
+        """ get the json rows of a list page, as the table's ajax request """
+        response = self.client.get(reverse(f'storemgr:list_{name}_rows'), params,
+                                   HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_page(self):
+        """ verify the list page renders no rows and points its table at the rows route """
+        response = self.client.get(reverse('storemgr:list_orders'), {'status__name': 'shipped'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'{reverse("storemgr:list_orders_rows")}?status__name=shipped')
+        self.assertNotContains(response, self.other_order.customer_id)
+        self.assertContains(response, '<th data-field="status" data-sortable="true">Status</th>', html=False)
+        self.assertContains(response, '<th data-field="actions"></th>', html=False)
+
+    def test_paging(self):
+        """ verify cursor pages match offset pages, and each request reads one page """
+        expected = [i.customer_id for i in Order.objects.order_by('-created_at', '-pk')]
+        data = self.get_rows('orders', limit=3, offset=0)
+        self.assertEqual((data['total'], data['total_exact']), (8, True))
+        self.assertEqual([i['customer_id'] for i in data['rows']], expected[:3])
+        # session, user, count and page
+        with self.assertNumQueries(4), CaptureQueriesContext(connection) as queries:
+            cursor_page = self.get_rows('orders', limit=3, offset=3, cursor=data['cursor'])
+        page_sql = [i['sql'] for i in queries if 'ORDER BY' in i['sql']]
+        self.assertEqual(len(page_sql), 1)
+        self.assertNotIn('OFFSET', page_sql[0])
+        offset_page = self.get_rows('orders', limit=3, offset=3)
+        self.assertEqual(cursor_page['rows'], offset_page['rows'])
+        self.assertEqual([i['customer_id'] for i in cursor_page['rows']], expected[3:6])
+        stale_page = self.get_rows('orders', limit=3, offset=6, cursor=data['cursor'])
+        self.assertEqual([i['customer_id'] for i in stale_page['rows']], expected[6:])
+
+    def test_nullable_sort(self):
+        """ verify pages sorted on a nullable column are read by offset, keeping the NULL rows """
+        baker.make('storemgr.Product', description=None, _quantity=3)
+        baker.make('storemgr.Product', description='described', _quantity=3)
+        for order in ['asc', 'desc']:
+            data = self.get_rows('products', sort='description', order=order, limit=2)
+            self.assertIsNone(data['cursor'])
+            sku_list = [i['sku'] for i in data['rows']]
+            for offset in [2, 4]:
+                data = self.get_rows('products', sort='description', order=order, limit=2, offset=offset)
+                self.assertIsNone(data['cursor'])
+                sku_list += [i['sku'] for i in data['rows']]
+            self.assertEqual(sorted(sku_list), sorted(Product.objects.values_list('sku', flat=True)))
+
+    def test_sort_search_filter(self):
+        """ verify sort, order, search and list filters """
+        data = self.get_rows('orders', sort='customer_id', order='asc', limit=100)
+        self.assertEqual([i['customer_id'] for i in data['rows']],
+                         sorted(i.customer_id for i in self.order_list + [self.other_order]))
+        data = self.get_rows('orders', search='OR-SEARCHME')
+        self.assertEqual([i['customer_id'] for i in data['rows']], [self.other_order.customer_id])
+        data = self.get_rows('orders', status__name='shipped', sort='status', order='desc')
+        self.assertEqual(data['total'], 7)
+        brand = baker.make('storemgr.Brand', name='<b>bold</b>')
+        data = self.get_rows('brands', search='bold')
+        self.assertEqual(len(data['rows']), 1)
+        self.assertIn('&lt;b&gt;bold&lt;/b&gt;', data['rows'][0]['name'])
+        self.assertIn(brand.get_absolute_url(), data['rows'][0]['name'])
+
+    def test_compact_rows(self):
+        """ verify a compact_rows listing renders its page from Row tuples rather than model instances """
+        self.assertTrue(ListOrders.compact_rows)
+        with patch.object(ListOrders, 'get_row', side_effect=lambda row: {'customer_id': row.customer_id}) as get_row:
+            data = self.get_rows('orders', limit=3)
+        row_list = [i.args[0] for i in get_row.call_args_list]
+        self.assertEqual(len(row_list), 3)
+        self.assertTrue(all(isinstance(i, Row) and isinstance(i, tuple) for i in row_list))
+        self.assertTrue(all(isinstance(i.status, Row) for i in row_list))
+        self.assertEqual([i['customer_id'] for i in data['rows']], [i.customer_id for i in row_list])
+
+    def test_projection(self):
+        """ verify rows are read with the columns' fields only, and unread relations are flagged in debug mode """
+        with CaptureQueriesContext(connection) as queries:
+            self.get_rows('orders')
+        page_sql = [i['sql'] for i in queries if 'ORDER BY' in i['sql']][0]
+        self.assertIn('"storemgr_orderstatus"."name"', page_sql)
+        self.assertNotIn('"storemgr_orderstatus"."created_at"', page_sql)
+        self.assertNotIn('storemgr_customer', page_sql)
+        view = ListOrders()
+        queryset = Order.objects.select_related('customer').prefetch_related('products')
+        with override_settings(DEBUG=True), self.assertLogs('storemgr.tables', 'WARNING') as logs:
+            queryset = view.project(queryset)
+        self.assertIn('ListOrders loads customer, products, which no column reads', logs.output[0])
+        self.assertEqual(len(list(queryset)), 8)
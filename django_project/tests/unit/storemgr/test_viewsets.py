@@ -1,5 +1,8 @@
+import base64
 import django
+import json
 import os
+import unittest
 
 from model_bakery import baker
 
@@ -7,11 +10,20 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 os.environ.setdefault("ENV_PATH", "../envs/.env.test")
 django.setup()
 
+from django.core.cache import cache
 from django.shortcuts import reverse
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from unittest.mock import patch
 
+from storemgr.exports import pyarrow
+from storemgr.models import Brand, Invoice, Order
+from storemgr.planner import build_plan
+from storemgr.serializers import InvoiceSerializer
+
 
 def create_custom_client(group_name):
     """create a client user in a specified group and return a client for object for that user"""
@@ -26,6 +38,7 @@ def create_custom_client(group_name):
 
 class UserSetupMixin:
     def setUp(self):
+        cache.clear()
         self.user = baker.make("auth.User", username="tester_basic")
         self.token = baker.make("authtoken.Token", user=self.user)
         self.client = APIClient()
@@ -64,6 +77,74 @@ class BrandTests(UserSetupMixin, APITestCase):
         self.assertGreater(len(response.json()), 0)
         self.assertIn(str(product), response.content.decode("utf-8"))
 
+    def test_brand_bulk_create(self):
+        """verify the brand-bulk-create endpoint writes rows and audit entries in a fixed number of queries"""
+        from auditlog.models import LogEntry
+
+        manufacturer = baker.make("storemgr.Manufacturer")
+        url = reverse("storemgr:brand-bulk-create")
+        data = [{"name": f"bulk-{i}", "manufacturer": manufacturer.pk, "enabled": i % 2 == 0} for i in range(50)]
+        # a first batch seeds the counters so they do not add to the query count
+        self.client.post(url, [{"name": "seed", "manufacturer": manufacturer.pk}], format="json")
+        # token authentication, name and manufacturer checks, savepoint, brands, audit entries, counter,
+        # search documents (2), release
+        with self.assertNumQueries(10):
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([i["name"] for i in response.json()], [i["name"] for i in data])
+        self.assertTrue(all(i["id"] for i in response.json()))
+        self.assertEqual(LogEntry.objects.get_for_model(Brand).filter(action=LogEntry.Action.CREATE).count(), 52)
+
+    def test_brand_bulk_create_errors(self):
+        """verify the brand-bulk-create endpoint rejects the whole list and reports errors per row"""
+        manufacturer = baker.make("storemgr.Manufacturer")
+        data = [
+            {"name": "new", "manufacturer": manufacturer.pk},
+            {"name": self.row.name, "manufacturer": manufacturer.pk},
+            {"name": "new", "manufacturer": 0},
+            {"manufacturer": manufacturer.pk},
+        ]
+        response = self.client.post(reverse("storemgr:brand-bulk-create"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertIn("name", errors[1])
+        self.assertEqual(sorted(errors[2]), ["manufacturer", "name"])
+        self.assertIn("name", errors[3])
+        self.assertFalse(Brand.objects.filter(name="new").exists())
+
+    def test_brand_bulk_create_coerced_values(self):
+        """verify string manufacturer ids and padded names are checked as the fields coerce them"""
+        manufacturer = baker.make("storemgr.Manufacturer")
+        data = [
+            {"name": "x", "manufacturer": "999999"},
+            {"name": f" {self.row.name} ", "manufacturer": str(manufacturer.pk)},
+        ]
+        response = self.client.post(reverse("storemgr:brand-bulk-create"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()
+        self.assertEqual(errors[0], {"manufacturer": ["unknown manufacturer: 999999"]})
+        self.assertEqual(list(errors[1]), ["name"])
+
+    def test_brand_bulk_update(self):
+        """verify the brand-bulk-update endpoint updates rows, audit entries and counters"""
+        from auditlog.models import LogEntry
+        from storemgr.counters import count_totals, get_counters, rebuild_counters
+
+        rebuild_counters()
+        other = baker.make("storemgr.Brand")
+        data = [{"id": self.row.pk, "enabled": False}, {"id": other.pk, "name": "renamed"}]
+        response = self.client.patch(reverse("storemgr:brand-bulk-update"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[1]["name"], "renamed")
+        self.assertFalse(Brand.objects.get(pk=self.row.pk).enabled)
+        self.assertEqual(get_counters("total")["brand"], count_totals()["brand"])
+        entry = LogEntry.objects.get_for_object(other).filter(action=LogEntry.Action.UPDATE).get()
+        self.assertEqual(entry.changes_dict["name"][1], "renamed")
+
+        response = self.client.patch(reverse("storemgr:brand-bulk-update"), [{"id": 0}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class CustomerTests(UserSetupMixin, APITestCase):
     """test API endpoints provided by the CustomerViewSet viewset"""
@@ -120,6 +201,20 @@ class InvoiceTests(UserSetupMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(response.json()["id"]), getattr(self.row, "pk")
 
+    def test_invoice_export(self):
+        """verify the invoice-export endpoint streams every row as csv by default"""
+        baker.make("storemgr.Invoice", _quantity=4)
+        url = reverse("storemgr:invoice-export")
+        with self.settings(STOREMGR_EXPORT_CHUNK_SIZE=2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(lines[0], "id,order,product,created_at,updated_at")
+        self.assertEqual(len(lines), 6)
+        self.assertIn(f"{self.row.pk},{self.row.order_id},{self.row.product_id},", lines[-1])
+
 
 class OrderTests(UserSetupMixin, APITestCase):
     """test API endpoints provided by the OrderViewSet viewset"""
@@ -164,6 +259,56 @@ class OrderTests(UserSetupMixin, APITestCase):
         self.assertGreater(len(response.json()), 0)
         self.assertIn(str(product), response.content.decode("utf-8"))
 
+    def test_order_bulk_create(self):
+        """verify the order-bulk-create endpoint creates orders and invoices in a fixed number of queries"""
+        product = baker.make("storemgr.Product")
+        data = [
+            {"status": self.row.status.name, "customer": self.row.customer.pk, "products": [product.pk, product.pk]}
+            for _ in range(20)
+        ]
+        url = reverse("storemgr:order-bulk-create")
+        # a first batch seeds the order sequence and counters so they do not add to the query count
+        self.client.post(url, data[:1], format="json")
+        with self.assertNumQueries(15):
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.json()["created"]), 20)
+        self.assertEqual(response.json()["errors"], [])
+        self.assertEqual(product.invoice_set.count(), 42)
+
+    def test_order_bulk_create_errors(self):
+        """verify the order-bulk-create endpoint reports per-item errors and creates the valid items"""
+        data = [
+            {"status": self.row.status.name, "customer": self.row.customer.pk, "products": []},
+            {"status": "unknown", "customer": self.row.customer.pk, "products": ["SKU-unknown"]},
+            "not an order",
+        ]
+        url = reverse("storemgr:order-bulk-create")
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.json()["created"]), 1)
+        errors = response.json()["errors"]
+        self.assertEqual([i["index"] for i in errors], [1, 2])
+        self.assertEqual(sorted(errors[0]["errors"]), ["products", "status"])
+        self.assertEqual(errors[0]["errors"]["products"], ["unknown products: SKU-unknown"])
+        self.assertEqual(errors[1]["errors"], {"non_field_errors": ["expected an object"]})
+
+    def test_order_export_ndjson(self):
+        """verify the order-export endpoint honors the filterset and matches the list serialization"""
+        baker.make("storemgr.Order", _quantity=2)
+        url = reverse("storemgr:order-export")
+        response = self.client.get(url, {"export_format": "ndjson", "order_id": self.row.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(i) for i in b"".join(response.streaming_content).decode("utf-8").splitlines()]
+        detail = self.client.get(reverse("storemgr:order-detail", args=[self.row.pk]), format="json").json()
+        self.assertEqual(rows, [detail])
+
+    def test_order_export_invalid_format(self):
+        """verify the order-export endpoint returns a 400 for an unknown format"""
+        response = self.client.get(reverse("storemgr:order-export"), {"export_format": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class OrderStatusTests(UserSetupMixin, APITestCase):
     """test API endpoints provided by the OrderStatusViewSet viewset"""
@@ -220,6 +365,24 @@ class ProductTests(UserSetupMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(response.json()["sku"]), getattr(self.row, "pk")
 
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_product_export_parquet(self):
+        """verify the product-export endpoint streams a parquet file with one row group per chunk"""
+        import io
+        import pyarrow.parquet
+
+        baker.make("storemgr.Product", _quantity=4)
+        url = reverse("storemgr:product-export")
+        with self.settings(STOREMGR_EXPORT_CHUNK_SIZE=2):
+            response = self.client.get(url, {"export_format": "parquet"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        parquet_file = pyarrow.parquet.ParquetFile(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(parquet_file.metadata.num_rows, 5)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 3)
+        table = parquet_file.read()
+        self.assertIn(self.row.sku, table.column("sku").to_pylist())
+        self.assertEqual(table.column_names, ["sku", "brand", "description", "enabled", "created_at", "updated_at"])
+
     def test_product_attributes(self):
         """verify the product-attributes endpoint returns a 200 and the row content is found"""
         # M2M
@@ -285,3 +448,452 @@ class ProductAttributeTests(UserSetupMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertGreater(len(response.json()), 0)
         self.assertIn(str(productattribute), response.content.decode("utf-8"))
+
+
+class KeysetPaginationTests(UserSetupMixin, APITestCase):
+    """test the cursor (keyset) pagination mode of the list endpoints"""
+
+    def setUp(self):
+        super(KeysetPaginationTests, self).setUp()
+        self.rows = baker.make("storemgr.Order", _quantity=7)
+        # put several rows on the same created_at to exercise the pk tie-breaker
+        Order.objects.filter(pk__in=[i.pk for i in self.rows[:4]]).update(created_at=self.rows[0].created_at)
+
+    def walk(self, url):
+        """follow next links from url and return the order_ids seen"""
+        seen = []
+        while url:
+            response = self.client.get(url, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.json())
+            seen += [i["order_id"] for i in response.json()["results"]]
+            url = response.json()["next"]
+        return seen
+
+    def test_order_list_keyset(self):
+        """verify walking the order list by cursor returns every row once, newest first"""
+        seen = self.walk(reverse("storemgr:order-list") + "?cursor=&limit=2")
+        expected = list(Order.objects.order_by("-created_at", "-pk").values_list("pk", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_order_list_keyset_concurrent_insert(self):
+        """verify rows inserted during a walk do not shift later pages"""
+        url = reverse("storemgr:order-list") + "?cursor=&limit=3"
+        response = self.client.get(url, format="json")
+        first_page = [i["order_id"] for i in response.json()["results"]]
+        baker.make("storemgr.Order", _quantity=3)
+        seen = first_page + self.walk(response.json()["next"])
+        self.assertEqual(sorted(seen), sorted(i.pk for i in self.rows))
+
+    def test_order_list_keyset_filtered(self):
+        """verify filtersets apply in cursor mode"""
+        url = reverse("storemgr:order-list") + f"?cursor=&limit=2&status={self.rows[0].status_id}"
+        self.assertEqual(self.walk(url), [self.rows[0].pk])
+
+    def test_order_list_keyset_since(self):
+        """verify a sync client walking oldest first resumes from its saved cursor with only the new rows"""
+        url = reverse("storemgr:order-list") + "?cursor=&limit=3&direction=asc"
+        expected = list(Order.objects.order_by("created_at", "pk").values_list("pk", flat=True))
+        self.assertEqual(self.walk(url), expected)
+        response = self.client.get(url.replace("limit=3", "limit=100"), format="json")
+        saved = response.json()["cursor"]
+        self.assertIsNone(response.json()["next"])
+
+        url = reverse("storemgr:order-list") + f"?direction=asc&cursor={saved}"
+        response = self.client.get(url, format="json")
+        self.assertEqual(response.json()["results"], [])
+        self.assertEqual(response.json()["cursor"], saved)
+        new_rows = baker.make("storemgr.Order", _quantity=2)
+        self.assertEqual(self.walk(url), [i.pk for i in new_rows])
+
+    def test_invalid_cursor(self):
+        """verify an invalid cursor or direction returns a 404"""
+        url = reverse("storemgr:order-list")
+
+        def encode(position):
+            return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+        created_at = self.rows[0].created_at.isoformat()
+        for cursor in (
+            "bogus",
+            encode([created_at]),
+            encode([created_at, None]),
+            encode([created_at, ["OR-1"]]),
+            encode([created_at, "x" * 17]),
+            encode([None, self.rows[0].pk]),
+            encode(["2024-01-01T00:00:00", self.rows[0].pk]),
+        ):
+            response = self.client.get(f"{url}?cursor={cursor}", format="json")
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, cursor)
+        response = self.client.get(f"{url}?cursor={encode([created_at, self.rows[0].pk])}", format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f"{url}?cursor=&direction=up", format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(STOREMGR_RESPONSE_CACHE=False)
+class ValuesSerializationTests(UserSetupMixin, APITestCase):
+    """test that list endpoints served from values_list() rows match the model serializers byte for byte"""
+
+    def setUp(self):
+        super(ValuesSerializationTests, self).setUp()
+        baker.make("storemgr.Invoice", _quantity=3)
+        baker.make("storemgr.Product", description=None)
+
+    def assertListMatches(self, url_name, params=""):
+        """compare a list response with and without the values serializer"""
+        url = reverse(url_name) + params
+        response = self.client.get(url, format="json")
+        with self.settings(STOREMGR_VALUES_SERIALIZATION=False):
+            expected = self.client.get(url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, expected.content)
+
+    def test_values_list_matches(self):
+        """verify the invoice, order and product lists are unchanged, including paginated and cursor modes"""
+        for url_name in ["storemgr:invoice-list", "storemgr:order-list", "storemgr:product-list"]:
+            self.assertListMatches(url_name)
+            self.assertListMatches(url_name, "?limit=2&offset=1")
+            self.assertListMatches(url_name, "?cursor=&limit=2")
+
+    def test_values_list_query_count(self):
+        """verify the order list is served in a count query and a single joined select"""
+        # token authentication, count, select
+        with self.assertNumQueries(3):
+            self.client.get(reverse("storemgr:order-list"), format="json")
+
+    def test_expand_uses_serializer(self):
+        """verify expand requests still use the model serializer"""
+        response = self.client.get(reverse("storemgr:order-list"), {"expand": "status"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.json()["results"][0]["status"], dict)
+
+
+class ConditionalGetTests(UserSetupMixin, APITestCase):
+    """test ETag / Last-Modified handling of the list and detail endpoints"""
+
+    def setUp(self):
+        super(ConditionalGetTests, self).setUp()
+        self.rows = baker.make("storemgr.Product", _quantity=3)
+
+    def assertNotModified(self, url, **headers):
+        """verify url answers 304 for the given conditional headers"""
+        response = self.client.get(url, format="json", **headers)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_list_etag(self):
+        """verify the product list answers 304 until a row is updated or deleted"""
+        url = reverse("storemgr:product-list")
+        response = self.client.get(url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+        # token authentication, user groups; the validators take no query
+        with self.assertNumQueries(2):
+            self.assertNotModified(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertNotModified(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+
+        self.rows[0].delete()
+        response = self.client.get(url, format="json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_list_etag_survives_response_cache(self):
+        """verify the validators are kept apart from the response cache, so clearing or culling it keeps the etag"""
+        from storemgr.caching import get_cache
+
+        url = reverse("storemgr:product-list")
+        etag = self.client.get(url, format="json")["ETag"]
+        get_cache().clear()
+        self.assertNotModified(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_list_etag_related_change(self):
+        """verify renaming a brand changes the etag of the product list that shows its name"""
+        url = reverse("storemgr:product-list")
+        etag = self.client.get(url, format="json")["ETag"]
+        brand = self.rows[0].brand
+        brand.name = "renamed"
+        brand.save()
+        self.assertNotEqual(self.client.get(url, format="json")["ETag"], etag)
+
+    def test_list_etag_varies(self):
+        """verify the etag depends on the query string"""
+        url = reverse("storemgr:product-list")
+        etag = self.client.get(url, format="json")["ETag"]
+        self.assertNotEqual(self.client.get(url, {"limit": 1}, format="json")["ETag"], etag)
+
+    def test_detail_etag(self):
+        """verify the product detail answers 304 until that row changes"""
+        url = reverse("storemgr:product-detail", args=[self.rows[0].pk])
+        etag = self.client.get(url, format="json")["ETag"]
+        self.assertNotModified(url, HTTP_IF_NONE_MATCH=etag)
+        self.rows[0].description = "changed"
+        self.rows[0].save()
+        self.assertEqual(self.client.get(url, format="json", HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+
+class ResponseCacheTests(UserSetupMixin, APITestCase):
+    """test the response cache of the list and detail endpoints"""
+
+    def setUp(self):
+        super(ResponseCacheTests, self).setUp()
+        self.order = baker.make("storemgr.Order")
+        self.invoice = baker.make("storemgr.Invoice", order=self.order)
+
+    def test_cache_hit(self):
+        """verify a repeated request is served from the cache without database queries beyond authentication"""
+        url = reverse("storemgr:order-list")
+        response = self.client.get(url, format="json")
+        self.assertEqual(response["X-Cache"], "MISS")
+        # token authentication, user groups
+        with self.assertNumQueries(2):
+            cached = self.client.get(url, format="json")
+        self.assertEqual(cached["X-Cache"], "HIT")
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached["ETag"], response["ETag"])
+        self.assertEqual(self.client.get(url, format="json", HTTP_IF_NONE_MATCH=cached["ETag"]).status_code, 304)
+
+    def test_cache_key_normalization(self):
+        """verify parameter order and expand order share an entry, while other parameters do not"""
+        url = reverse("storemgr:order-list")
+        self.client.get(url + "?expand=status,customer&limit=5", format="json")
+        self.assertEqual(self.client.get(url + "?limit=5&expand=customer,status", format="json")["X-Cache"], "HIT")
+        self.assertEqual(self.client.get(url + "?limit=6&expand=customer,status", format="json")["X-Cache"], "MISS")
+
+    def test_cache_scope(self):
+        """verify users in different groups do not share entries"""
+        url = reverse("storemgr:order-list")
+        self.client.get(url, format="json")
+        self.assertEqual(create_custom_client("orderers").get(url, format="json")["X-Cache"], "MISS")
+
+    def test_cache_host(self):
+        """verify requests for another scheme or host, whose hyperlinks differ, do not share entries"""
+        url = reverse("storemgr:order-list")
+        self.client.get(url, format="json")
+        self.assertEqual(self.client.get(url, format="json", secure=True)["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(url, format="json", HTTP_HOST="127.0.0.1")["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(url, format="json")["X-Cache"], "HIT")
+
+    def test_cache_invalidation(self):
+        """verify saves and deletes of dependent models invalidate entries, including invoices for orders"""
+        order_url = reverse("storemgr:order-detail", args=[self.order.pk])
+        product_url = reverse("storemgr:product-list")
+        brand_url = reverse("storemgr:brand-list")
+        for url in (order_url, product_url, brand_url):
+            self.client.get(url, format="json")
+
+        self.order.status.name = "renamed"
+        self.order.status.save()
+        response = self.client.get(order_url, format="json")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["status"], "renamed")
+
+        self.invoice.delete()
+        self.assertEqual(self.client.get(order_url, format="json")["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(product_url, format="json")["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(brand_url, format="json")["X-Cache"], "HIT")
+
+    @override_settings(STOREMGR_RESPONSE_CACHE_STATS_INTERVAL=3600)
+    def test_cache_stats(self):
+        """verify hits and misses are counted per endpoint, without a cache write per request"""
+        from storemgr.caching import get_cache, get_stats, get_stats_key, reset_stats
+
+        reset_stats(["brand"])
+        url = reverse("storemgr:brand-list")
+        self.client.get(url, format="json")
+        self.client.get(url, format="json")
+        self.client.get(url, format="json")
+        self.assertIsNone(get_cache().get(get_stats_key("brand", "hit")))
+        self.assertEqual(get_stats(["brand"]), {"brand": {"hit": 2, "miss": 1}})
+        self.client.get(url, format="json")
+        self.assertEqual(get_stats(["brand"]), {"brand": {"hit": 3, "miss": 1}})
+
+
+class RelatedListTests(UserSetupMixin, APITestCase):
+    """test the paginated nested relation actions"""
+
+    def setUp(self):
+        super(RelatedListTests, self).setUp()
+        self.product = baker.make("storemgr.Product")
+        self.invoices = baker.make("storemgr.Invoice", product=self.product, _quantity=5)
+
+    def test_related_list_paginated(self):
+        """verify a nested action is paginated and filtered like the related list endpoint"""
+        url = reverse("storemgr:product-invoice-set", args=[self.product.pk])
+        response = self.client.get(url, {"limit": 2}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["count"], 5)
+        self.assertEqual(len(response.json()["results"]), 2)
+        self.assertIsNotNone(response.json()["next"])
+        response = self.client.get(url, {"order": self.invoices[0].order_id}, format="json")
+        self.assertEqual([i["id"] for i in response.json()["results"]], [self.invoices[0].pk])
+
+    def test_related_list_query_count(self):
+        """verify a nested action takes one count and one data query, with or without expand"""
+        url = reverse("storemgr:product-invoice-set", args=[self.product.pk])
+        # token authentication, product, count, select
+        with self.assertNumQueries(4):
+            self.client.get(url, format="json")
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {"expand": "order,product"}, format="json")
+        self.assertEqual(response.json()["results"][0]["order"]["status"], self.invoices[4].order.status.name)
+
+    def test_related_list_empty(self):
+        """verify a nested action returns a 404 for an unknown or unrelated instance"""
+        url = reverse("storemgr:customer-order-set", args=["CU-unknown"])
+        self.assertEqual(self.client.get(url, format="json").status_code, status.HTTP_404_NOT_FOUND)
+        url = reverse("storemgr:brand-product-set", args=["x"])
+        self.assertEqual(self.client.get(url, format="json").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_related_list_object_permissions(self):
+        """verify a nested action checks the object permissions of its instance before listing related rows"""
+        from rest_framework.exceptions import PermissionDenied
+        from storemgr.views.rest import ProductViewSet
+
+        url = reverse("storemgr:product-invoice-set", args=[self.product.pk])
+        with patch.object(ProductViewSet, "check_object_permissions", side_effect=PermissionDenied):
+            response = self.client.get(url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertNotIn("results", response.json())
+
+
+class BatchRetrieveTests(UserSetupMixin, APITestCase):
+    """test the batch retrieve actions"""
+
+    def setUp(self):
+        super(BatchRetrieveTests, self).setUp()
+        self.orders = baker.make("storemgr.Order", _quantity=4)
+
+    def test_batch_get(self):
+        """verify ?ids= returns rows in the order given, once per key, and reports missing keys"""
+        keys = [self.orders[2].pk, "OR-missing", self.orders[0].pk, self.orders[2].pk]
+        url = reverse("storemgr:order-batch")
+        # token authentication, select
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {"ids": ",".join(keys)}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([i["order_id"] for i in response.json()["results"]], [keys[0], keys[2], keys[3]])
+        self.assertEqual(response.json()["missing"], ["OR-missing"])
+        detail = self.client.get(reverse("storemgr:order-detail", args=[keys[0]]), format="json").json()
+        self.assertEqual(response.json()["results"][0], detail)
+
+    def test_batch_post(self):
+        """verify a POST body of ids, beyond the backend parameter limit, is resolved with expand handling"""
+        products = baker.make("storemgr.Product", _quantity=3)
+        keys = [i.pk for i in products] + [f"SKU-missing-{i}" for i in range(1200)]
+        url = reverse("storemgr:product-batch") + "?expand=brand"
+        response = self.client.post(url, {"ids": keys}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([i["sku"] for i in response.json()["results"]], keys[:3])
+        self.assertEqual(response.json()["results"][0]["brand"]["id"], products[0].brand_id)
+        self.assertEqual(len(response.json()["missing"]), 1200)
+
+    def test_batch_invalid(self):
+        """verify missing or too many ids return a 400"""
+        url = reverse("storemgr:customer-batch")
+        self.assertEqual(self.client.get(url, format="json").status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(STOREMGR_BATCH_MAX_KEYS=2):
+            response = self.client.post(url, ["CU-1", "CU-2", "CU-3"], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(STOREMGR_RESPONSE_CACHE=False)
+class QueryPlanTests(UserSetupMixin, APITestCase):
+    """test the querysets planned from the serializers and the expand, fields and omit parameters"""
+
+    def setUp(self):
+        super(QueryPlanTests, self).setUp()
+        baker.make("storemgr.Invoice", _quantity=8)
+
+    def test_nested_expand_query_count(self):
+        """verify nested expansions take the same number of queries for any page size"""
+        url = reverse("storemgr:invoice-list")
+        params = {"expand": "order.customer,order.status,product.brand"}
+        for limit in [1, 8]:
+            # token authentication, count, select
+            with self.assertNumQueries(3):
+                response = self.client.get(url, dict(params, limit=limit), format="json")
+            self.assertEqual(len(response.json()["results"]), limit)
+        row = response.json()["results"][0]
+        self.assertIsInstance(row["order"]["customer"], dict)
+        self.assertIsInstance(row["product"]["brand"], dict)
+
+    def test_plan(self):
+        """verify only the relations a response reads are joined"""
+        plan = build_plan(Invoice, InvoiceSerializer)
+        self.assertEqual(plan.select_related, ["order", "product"])
+        plan = build_plan(Invoice, InvoiceSerializer, expand=["~all"], omit=["product"])
+        self.assertEqual(plan.select_related, ["order", "order__customer", "order__status"])
+        plan = build_plan(Invoice, InvoiceSerializer, fields=["id", "created_at"])
+        self.assertEqual(plan.select_related, [])
+
+    def test_sparse_fields_columns(self):
+        """verify fields and omit narrow the selected columns, including those of joined models, without extra queries"""
+        url = reverse("storemgr:invoice-list")
+        params = {"expand": "order", "fields": "id,order.order_id,order.customer"}
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params, format="json")
+        self.assertEqual(len(context.captured_queries), 3)
+        sql = context.captured_queries[-1]["sql"].split(" FROM ")[0]
+        self.assertIn('"storemgr_order"."customer_id"', sql)
+        self.assertNotIn('"storemgr_invoice"."created_at"', sql)
+        self.assertNotIn('"storemgr_order"."status_id"', sql)
+        self.assertNotIn("storemgr_product", sql)
+        row = response.json()["results"][0]
+        invoice = Invoice.objects.get(pk=row["id"])
+        self.assertEqual(
+            row, {"id": invoice.pk, "order": {"order_id": invoice.order_id, "customer": invoice.order.customer_id}}
+        )
+        with self.settings(STOREMGR_DEFER_COLUMNS=False):
+            self.assertEqual(self.client.get(url, params, format="json").content, response.content)
+
+
+@override_settings(STOREMGR_RESPONSE_CACHE=False, STOREMGR_EXACT_COUNT_THRESHOLD=2)
+class EstimatedCountTests(UserSetupMixin, APITestCase):
+    """test list counts above the exact count threshold"""
+
+    def setUp(self):
+        super(EstimatedCountTests, self).setUp()
+        baker.make("storemgr.Order", _quantity=5)
+        self.url = reverse("storemgr:order-list")
+
+    def get_count(self, response):
+        """get the (count, count_exact) of a list response; count_exact is only present, and false, for estimates"""
+        return response.json()["count"], response.json().get("count_exact", True)
+
+    def test_estimated_count(self):
+        """verify a count above the threshold is computed once, then served from the cache as an estimate"""
+        response = self.client.get(self.url, {"limit": 2}, format="json")
+        self.assertEqual(self.get_count(response), (5, True))
+        self.assertNotIn("count_exact", response.json())
+        response = self.client.get(self.url, {"limit": 2}, format="json")
+        self.assertEqual(self.get_count(response), (5, False))
+        self.assertIsNotNone(response.json()["next"])
+
+    def test_estimated_count_not_invalidated(self):
+        """verify writes leave the cached count in place until it expires, rather than recounting on every request"""
+        self.client.get(self.url, {"limit": 2}, format="json")
+        baker.make("storemgr.Order")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {"limit": 2}, format="json")
+        self.assertEqual(self.get_count(response), (5, False))
+        self.assertEqual(len([i for i in queries if "COUNT(" in i["sql"]]), 1)
+        cache.clear()
+        response = self.client.get(self.url, {"limit": 2}, format="json")
+        self.assertEqual(self.get_count(response), (6, True))
+
+    def test_estimated_count_last_page(self):
+        """verify the last page corrects an estimated count and has no next link"""
+        self.client.get(self.url, {"limit": 2}, format="json")
+        with patch("storemgr.pagination.get_cached_count", return_value=(50, False)):
+            response = self.client.get(self.url, {"limit": 2}, format="json")
+            self.assertEqual(self.get_count(response), (50, False))
+            response = self.client.get(self.url, {"limit": 2, "offset": 4}, format="json")
+        self.assertEqual(self.get_count(response), (5, True))
+        self.assertIsNone(response.json()["next"])
+        self.assertEqual(len(response.json()["results"]), 1)
+
+    def test_small_count_exact(self):
+        """verify results within the threshold are counted exactly"""
+        response = self.client.get(self.url, {"customer": Order.objects.first().customer_id}, format="json")
+        self.assertEqual(self.get_count(response), (1, True))